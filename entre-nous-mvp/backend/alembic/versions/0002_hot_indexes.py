@@ -0,0 +1,69 @@
+"""hot query indexes
+
+Revision ID: 0002_hot_indexes
+Revises: 0001_init
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_hot_indexes"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+VISIBLE = sa.text("status = 'visible'")
+
+
+def upgrade() -> None:
+    # Built CONCURRENTLY so the migration can run against live tables without blocking writes.
+    with op.get_context().autocommit_block():
+        # feed: WHERE status='visible' ORDER BY created_at DESC LIMIT n
+        op.create_index(
+            "ix_posts_visible_created_at",
+            "posts",
+            [sa.text("created_at DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        # thread view: WHERE post_id=? AND status='visible' ORDER BY created_at ASC
+        op.create_index(
+            "ix_replies_visible_post_created_at",
+            "replies",
+            ["post_id", "created_at"],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        # DM page: WHERE conversation_id=? AND status='visible' ORDER BY created_at DESC
+        op.create_index(
+            "ix_dm_messages_visible_conv_created_at",
+            "dm_messages",
+            ["conversation_id", sa.text("created_at DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        # membership check: WHERE conversation_id=? AND user_id=? (index-only)
+        op.create_index(
+            "ix_conv_participants_conv_user",
+            "conversation_participants",
+            ["conversation_id", "user_id"],
+            postgresql_concurrently=True,
+        )
+        # export / erasure walk a user's replies; there was no author index at all
+        op.create_index(
+            "ix_replies_author_id",
+            "replies",
+            ["author_id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_replies_author_id", table_name="replies", postgresql_concurrently=True)
+        op.drop_index("ix_conv_participants_conv_user", table_name="conversation_participants", postgresql_concurrently=True)
+        op.drop_index("ix_dm_messages_visible_conv_created_at", table_name="dm_messages", postgresql_concurrently=True)
+        op.drop_index("ix_replies_visible_post_created_at", table_name="replies", postgresql_concurrently=True)
+        op.drop_index("ix_posts_visible_created_at", table_name="posts", postgresql_concurrently=True)
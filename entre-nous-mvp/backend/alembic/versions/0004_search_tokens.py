@@ -0,0 +1,34 @@
+"""blind search index
+
+Revision ID: 0004_search_tokens
+Revises: 0003_jobs
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004_search_tokens"
+down_revision = "0003_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_tokens",
+        sa.Column("token_hmac", sa.String(length=32), nullable=False),
+        sa.Column("target_type", sa.String(length=16), nullable=False),
+        sa.Column("target_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("token_hmac", "target_type", "target_id"),
+    )
+    # de-indexing a content item
+    op.create_index("ix_search_tokens_target", "search_tokens", ["target_type", "target_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_search_tokens_target", table_name="search_tokens")
+    op.drop_table("search_tokens")
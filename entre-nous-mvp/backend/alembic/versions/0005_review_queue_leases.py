@@ -0,0 +1,52 @@
+"""review queue leases, one pending item per target
+
+Revision ID: 0005_review_queue_leases
+Revises: 0004_search_tokens
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_review_queue_leases"
+down_revision = "0004_search_tokens"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("moderation_queue", sa.Column("claimed_by", sa.String(length=64), nullable=True))
+    op.add_column("moderation_queue", sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True))
+    # collapse duplicate pending items (keep the most urgent, then the oldest) before enforcing uniqueness
+    op.execute(
+        """
+        DELETE FROM moderation_queue q
+        USING (
+            SELECT id, row_number() OVER (PARTITION BY target_type, target_id ORDER BY priority, created_at, id) AS rn
+            FROM moderation_queue WHERE status = 'pending'
+        ) d
+        WHERE q.id = d.id AND d.rn > 1
+        """
+    )
+    op.create_index(
+        "uq_moderation_queue_pending_target",
+        "moderation_queue",
+        ["target_type", "target_id"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    # claim: most urgent, oldest pending first
+    op.create_index(
+        "ix_moderation_queue_pending_priority",
+        "moderation_queue",
+        ["priority", "created_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_moderation_queue_pending_priority", table_name="moderation_queue")
+    op.drop_index("uq_moderation_queue_pending_target", table_name="moderation_queue")
+    op.drop_column("moderation_queue", "lease_expires_at")
+    op.drop_column("moderation_queue", "claimed_by")
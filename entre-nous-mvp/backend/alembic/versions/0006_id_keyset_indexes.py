@@ -0,0 +1,61 @@
+"""keyset indexes on time-ordered ids
+
+Revision ID: 0006_id_keyset_indexes
+Revises: 0005_review_queue_leases
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_id_keyset_indexes"
+down_revision = "0005_review_queue_leases"
+branch_labels = None
+depends_on = None
+
+VISIBLE = sa.text("status = 'visible'")
+
+
+def upgrade() -> None:
+    # New ids are UUIDv7 (app.db.ids), so thread and DM pages are ordered and paged on the id itself;
+    # the created_at variants from 0002 are no longer used by any read path.
+    with op.get_context().autocommit_block():
+        # thread view: WHERE post_id=? AND status='visible' AND id > ? ORDER BY id ASC
+        op.create_index(
+            "ix_replies_visible_post_id",
+            "replies",
+            ["post_id", "id"],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        # DM page: WHERE conversation_id=? AND status='visible' AND id < ? ORDER BY id DESC
+        op.create_index(
+            "ix_dm_messages_visible_conv_id",
+            "dm_messages",
+            ["conversation_id", sa.text("id DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_replies_visible_post_created_at", table_name="replies", postgresql_concurrently=True)
+        op.drop_index("ix_dm_messages_visible_conv_created_at", table_name="dm_messages", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_dm_messages_visible_conv_created_at",
+            "dm_messages",
+            ["conversation_id", sa.text("created_at DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_replies_visible_post_created_at",
+            "replies",
+            ["post_id", "created_at"],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_dm_messages_visible_conv_id", table_name="dm_messages", postgresql_concurrently=True)
+        op.drop_index("ix_replies_visible_post_id", table_name="replies", postgresql_concurrently=True)
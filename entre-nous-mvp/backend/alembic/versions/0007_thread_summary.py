@@ -0,0 +1,50 @@
+"""per-post thread summary counters
+
+Revision ID: 0007_thread_summary
+Revises: 0006_id_keyset_indexes
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007_thread_summary"
+down_revision = "0006_id_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("posts", sa.Column("reply_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("posts", sa.Column("last_reply_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("posts", sa.Column("top_reply_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column("posts", sa.Column("top_reply_votes", sa.Integer(), nullable=False, server_default="0"))
+    # backfill from visible replies (same definition as app.services.threads.refresh_summaries)
+    op.execute(
+        """
+        UPDATE posts p SET
+            reply_count = s.n,
+            last_reply_at = s.last_at,
+            top_reply_id = t.id,
+            top_reply_votes = coalesce(t.kindness_votes, 0)
+        FROM (
+            SELECT post_id, count(*) AS n, max(created_at) AS last_at
+            FROM replies WHERE status = 'visible' GROUP BY post_id
+        ) s
+        LEFT JOIN LATERAL (
+            SELECT id, kindness_votes FROM replies r
+            WHERE r.post_id = s.post_id AND r.status = 'visible'
+            ORDER BY kindness_votes DESC, id ASC LIMIT 1
+        ) t ON true
+        WHERE p.id = s.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("posts", "top_reply_votes")
+    op.drop_column("posts", "top_reply_id")
+    op.drop_column("posts", "last_reply_at")
+    op.drop_column("posts", "reply_count")
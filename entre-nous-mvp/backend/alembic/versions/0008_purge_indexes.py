@@ -0,0 +1,33 @@
+"""indexes for the retention purge
+
+Revision ID: 0008_purge_indexes
+Revises: 0007_thread_summary
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_purge_indexes"
+down_revision = "0007_thread_summary"
+branch_labels = None
+depends_on = None
+
+REMOVED = sa.text("status = 'removed'")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # purge walk: WHERE status='removed' AND id > ? ORDER BY id (only covers removed rows, stays small)
+        for table in ("posts", "replies", "dm_messages"):
+            op.create_index(f"ix_{table}_removed_id", table, ["id"], postgresql_where=REMOVED, postgresql_concurrently=True)
+        # queue items of purged content, whatever their status
+        op.create_index("ix_moderation_queue_target", "moderation_queue", ["target_type", "target_id"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_moderation_queue_target", table_name="moderation_queue", postgresql_concurrently=True)
+        for table in ("dm_messages", "replies", "posts"):
+            op.drop_index(f"ix_{table}_removed_id", table_name=table, postgresql_concurrently=True)
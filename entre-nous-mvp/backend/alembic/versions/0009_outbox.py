@@ -0,0 +1,38 @@
+"""transactional outbox
+
+Revision ID: 0009_outbox
+Revises: 0008_purge_indexes
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0009_outbox"
+down_revision = "0008_purge_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("event_type", sa.String(length=48), nullable=False),
+        sa.Column("aggregate_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("published_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # relay: oldest unpublished first (only the backlog is indexed)
+    op.create_index("ix_outbox_events_unpublished", "outbox_events", ["id"], postgresql_where=sa.text("published_at IS NULL"))
+    # pruning of published events past retention
+    op.create_index("ix_outbox_events_published_at", "outbox_events", ["published_at"], postgresql_where=sa.text("published_at IS NOT NULL"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_events_published_at", table_name="outbox_events")
+    op.drop_index("ix_outbox_events_unpublished", table_name="outbox_events")
+    op.drop_table("outbox_events")
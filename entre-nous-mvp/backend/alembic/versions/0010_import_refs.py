@@ -0,0 +1,30 @@
+"""bulk import reference map
+
+Revision ID: 0010_import_refs
+Revises: 0009_outbox
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0010_import_refs"
+down_revision = "0009_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "import_refs",
+        sa.Column("source", sa.String(length=64), primary_key=True),
+        sa.Column("kind", sa.String(length=8), primary_key=True),
+        sa.Column("ref", sa.String(length=128), primary_key=True),
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("import_refs")
@@ -0,0 +1,36 @@
+"""user / IP prefix co-occurrence for ban-evasion detection
+
+Revision ID: 0011_ip_user_edges
+Revises: 0010_import_refs
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0011_ip_user_edges"
+down_revision = "0010_import_refs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ip_user_edges",
+        sa.Column("ip_lookup_hmac", sa.String(length=64), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("events", sa.Integer(), nullable=False),
+        sa.Column("first_seen", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_seen", sa.DateTime(timezone=True), nullable=False),
+    )
+    # pruning of pairs not seen within the lookback; a user's pairs (erasure)
+    op.create_index("ix_ip_user_edges_last_seen", "ip_user_edges", ["last_seen"])
+    op.create_index("ix_ip_user_edges_user_id", "ip_user_edges", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ip_user_edges_user_id", table_name="ip_user_edges")
+    op.drop_index("ix_ip_user_edges_last_seen", table_name="ip_user_edges")
+    op.drop_table("ip_user_edges")
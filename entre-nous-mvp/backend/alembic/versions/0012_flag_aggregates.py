@@ -0,0 +1,88 @@
+"""per-target flag aggregates for moderation triage
+
+Revision ID: 0012_flag_aggregates
+Revises: 0011_ip_user_edges
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0012_flag_aggregates"
+down_revision = "0011_ip_user_edges"
+branch_labels = None
+depends_on = None
+
+# reason weights as of this revision (app.services.flags.REASON_WEIGHTS), for the backfill
+_WEIGHT = (
+    "CASE lower(reason) WHEN 'threat' THEN 5 WHEN 'self_harm' THEN 5 WHEN 'hate' THEN 3 WHEN 'harassment' THEN 3 "
+    "WHEN 'sexual' THEN 3 WHEN 'abuse' THEN 2 ELSE 1 END"
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "flag_aggregates",
+        sa.Column("target_type", sa.String(length=16), primary_key=True),
+        sa.Column("target_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("flags", sa.Integer(), nullable=False),
+        sa.Column("reporters", sa.Integer(), nullable=False),
+        sa.Column("reasons", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("severity", sa.Float(), nullable=False),
+        sa.Column("first_flag_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_flag_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("resolved_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # triage order over open targets only
+    op.create_index(
+        "ix_flag_aggregates_open_severity",
+        "flag_aggregates",
+        [sa.text("severity DESC"), sa.text("last_flag_at DESC")],
+        postgresql_where=sa.text("resolved_at IS NULL"),
+    )
+
+    # backfill from existing flags; flags unlinked from an erased reporter count as distinct reporters
+    op.execute(
+        f"""
+        INSERT INTO flag_aggregates (target_type, target_id, flags, reporters, reasons, severity, first_flag_at, last_flag_at)
+        SELECT r.target_type, r.target_id, r.flags, s.reporters, r.reasons, s.severity, r.first_flag_at, r.last_flag_at
+        FROM (
+            SELECT target_type, target_id, sum(n) AS flags, jsonb_object_agg(reason, n) AS reasons,
+                   min(first_at) AS first_flag_at, max(last_at) AS last_flag_at
+            FROM (
+                SELECT target_type, target_id, reason, count(*) AS n, min(created_at) AS first_at, max(created_at) AS last_at
+                FROM moderation_flags GROUP BY target_type, target_id, reason
+            ) per_reason
+            GROUP BY target_type, target_id
+        ) r
+        JOIN (
+            SELECT target_type, target_id, count(*) AS reporters, sum({_WEIGHT}) AS severity
+            FROM (
+                SELECT DISTINCT ON (target_type, target_id, coalesce(reporter_id, id)) target_type, target_id, reason
+                FROM moderation_flags
+                ORDER BY target_type, target_id, coalesce(reporter_id, id), created_at
+            ) firsts
+            GROUP BY target_type, target_id
+        ) s ON s.target_type = r.target_type AND s.target_id = r.target_id
+        """
+    )
+    # already reviewed (a decided queue item and none pending) or removed: resolved
+    op.execute(
+        """
+        UPDATE flag_aggregates a SET resolved_at = now()
+        WHERE EXISTS (SELECT 1 FROM moderation_queue q WHERE q.target_type = a.target_type AND q.target_id = a.target_id AND q.status <> 'pending')
+          AND NOT EXISTS (SELECT 1 FROM moderation_queue q WHERE q.target_type = a.target_type AND q.target_id = a.target_id AND q.status = 'pending')
+        """
+    )
+    for target_type, table in (("post", "posts"), ("reply", "replies"), ("dm", "dm_messages")):
+        op.execute(
+            f"UPDATE flag_aggregates a SET resolved_at = now() FROM {table} t "
+            f"WHERE a.target_type = '{target_type}' AND t.id = a.target_id AND t.status = 'removed' AND a.resolved_at IS NULL"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_flag_aggregates_open_severity", table_name="flag_aggregates")
+    op.drop_table("flag_aggregates")
@@ -0,0 +1,35 @@
+"""author / reporter indexes for the erasure steps
+
+Revision ID: 0013_erasure_indexes
+Revises: 0012_flag_aggregates
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_erasure_indexes"
+down_revision = "0012_flag_aggregates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Erasure (and export) walk a user's DM messages and the flags they reported, one chunk per transaction;
+    # without these every chunk was a full scan. Built CONCURRENTLY so live tables keep taking writes.
+    with op.get_context().autocommit_block():
+        op.create_index("ix_dm_messages_author_id", "dm_messages", ["author_id"], postgresql_concurrently=True)
+        op.create_index(
+            "ix_moderation_flags_reporter_id",
+            "moderation_flags",
+            ["reporter_id"],
+            postgresql_where=sa.text("reporter_id IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_moderation_flags_reporter_id", table_name="moderation_flags", postgresql_concurrently=True)
+        op.drop_index("ix_dm_messages_author_id", table_name="dm_messages", postgresql_concurrently=True)
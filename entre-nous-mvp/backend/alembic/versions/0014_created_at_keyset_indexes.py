@@ -0,0 +1,61 @@
+"""(created_at, id) keyset indexes for thread and DM pages
+
+Revision ID: 0014_created_at_keyset_indexes
+Revises: 0013_erasure_indexes
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014_created_at_keyset_indexes"
+down_revision = "0013_erasure_indexes"
+branch_labels = None
+depends_on = None
+
+VISIBLE = sa.text("status = 'visible'")
+
+
+def upgrade() -> None:
+    # Pre-UUIDv7 rows have random ids, so paging on the id alone (0006) scrambled every existing thread and
+    # conversation: pages are ordered on (created_at, id) again, the id only breaking ties.
+    with op.get_context().autocommit_block():
+        # thread view: WHERE post_id=? AND status='visible' AND (created_at, id) > (?, ?) ORDER BY created_at, id
+        op.create_index(
+            "ix_replies_visible_post_created_id",
+            "replies",
+            ["post_id", "created_at", "id"],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        # DM page: WHERE conversation_id=? AND status='visible' AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+        op.create_index(
+            "ix_dm_messages_visible_conv_created_id",
+            "dm_messages",
+            ["conversation_id", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_replies_visible_post_id", table_name="replies", postgresql_concurrently=True)
+        op.drop_index("ix_dm_messages_visible_conv_id", table_name="dm_messages", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_dm_messages_visible_conv_id",
+            "dm_messages",
+            ["conversation_id", sa.text("id DESC")],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_replies_visible_post_id",
+            "replies",
+            ["post_id", "id"],
+            postgresql_where=VISIBLE,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_dm_messages_visible_conv_created_id", table_name="dm_messages", postgresql_concurrently=True)
+        op.drop_index("ix_replies_visible_post_created_id", table_name="replies", postgresql_concurrently=True)
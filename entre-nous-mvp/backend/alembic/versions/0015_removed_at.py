@@ -0,0 +1,30 @@
+"""removed_at on content, the start of the purge window
+
+Revision ID: 0015_removed_at
+Revises: 0014_created_at_keyset_indexes
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015_removed_at"
+down_revision = "0014_created_at_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+TABLES = ("posts", "replies", "dm_messages")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("removed_at", sa.DateTime(timezone=True), nullable=True))
+        # when already-removed rows were removed is unknown: start their window now rather than purge them on the next run
+        op.execute(f"UPDATE {table} SET removed_at = now() WHERE status = 'removed'")
+    # the purge walk keeps using ix_{table}_removed_id (0008); removed_at is only a filter on those few rows
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_column(table, "removed_at")
@@ -0,0 +1,43 @@
+"""keyset order for the flag triage view
+
+Revision ID: 0016_triage_keyset_index
+Revises: 0015_removed_at
+Create Date: 2026-10-19
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016_triage_keyset_index"
+down_revision = "0015_removed_at"
+branch_labels = None
+depends_on = None
+
+OPEN = sa.text("resolved_at IS NULL")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # triage page: WHERE resolved_at IS NULL AND (severity, last_flag_at, target_type, target_id) < (?, ?, ?, ?)
+        # ORDER BY all four DESC; the ids make the order total, so a cursor neither skips nor repeats a target
+        op.create_index(
+            "ix_flag_aggregates_open_keyset",
+            "flag_aggregates",
+            [sa.text("severity DESC"), sa.text("last_flag_at DESC"), sa.text("target_type DESC"), sa.text("target_id DESC")],
+            postgresql_where=OPEN,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_flag_aggregates_open_severity", table_name="flag_aggregates", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_flag_aggregates_open_severity",
+            "flag_aggregates",
+            [sa.text("severity DESC"), sa.text("last_flag_at DESC")],
+            postgresql_where=OPEN,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_flag_aggregates_open_keyset", table_name="flag_aggregates", postgresql_concurrently=True)
@@ -1 +1 @@
-from . import auth, posts, feed, moderation, gdpr, admin, dm
+from . import auth, posts, feed, moderation, gdpr, admin, dm, search
@@ -1,15 +1,26 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import func, select, desc, tuple_
+from collections import defaultdict
 from datetime import datetime, timezone
+from typing import Literal
+from uuid import UUID
+import asyncio
+import base64
+import os
 import statistics
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.core.settings import settings
 from app.core.redis import get_redis
-from app.models import ModerationQueueItem, ModerationFlag, IpBan, Post, Reply
+from app.db.ids import uuid7
+from app.models import ModerationQueueItem, ModerationFlag, FlagAggregate, IpBan, Job
+from app.api.schemas import SearchHitOut
+from app.services.search import search
+from app.services.jobs import enqueue
+from app.services.review_queue import CONTENT_MODELS
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -18,12 +29,18 @@ def require_admin(token: str | None):
         raise HTTPException(status_code=403, detail="Forbidden")
 
 @router.get("/overview")
-async def overview(x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+async def overview(x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_read_db)):
     require_admin(x_admin_token)
-    # counts
-    pending = (await db.execute(select(ModerationQueueItem).where(ModerationQueueItem.status == "pending"))).scalars().all()
-    last_flags = (await db.execute(select(ModerationFlag).order_by(desc(ModerationFlag.created_at)).limit(50))).scalars().all()
-    bans = (await db.execute(select(IpBan).order_by(desc(IpBan.created_at)).limit(100))).scalars().all()
+    # counts + column projections (no entities, no ban ciphertexts)
+    q = ModerationQueueItem
+    pending_count = (await db.execute(select(func.count()).select_from(q).where(q.status == "pending"))).scalar_one()
+    pending = (await db.execute(
+        select(q.id, q.target_type, q.target_id, q.priority, q.created_at).where(q.status == "pending").order_by(q.priority.asc(), q.created_at.asc()).limit(50)
+    )).all()
+    last_flags = (await db.execute(
+        select(ModerationFlag.id, ModerationFlag.target_type, ModerationFlag.target_id, ModerationFlag.reason, ModerationFlag.created_at).order_by(desc(ModerationFlag.created_at)).limit(50)
+    )).all()
+    bans = (await db.execute(select(IpBan.id, IpBan.created_at, IpBan.reason).order_by(desc(IpBan.created_at)).limit(100))).all()
 
     # latency stats from redis
     r = get_redis()
@@ -33,6 +50,13 @@ async def overview(x_admin_token: str | None = Header(default=None), db: AsyncSe
     p95 = statistics.quantiles(vals, n=20)[-1] if len(vals) >= 40 else (max(vals) if vals else None)
     counts = r.hgetall("metrics:counts") or {}
     status = r.hgetall("metrics:status") or {}
+    events = r.hgetall("metrics:events") or {}
+    # per API worker (host:slot): requests served, current pid and when it last served one
+    workers = {w: {"requests": int(n), "pid": None, "last_seen": None} for w, n in (r.hgetall("metrics:worker:requests") or {}).items()}
+    for w, seen in (r.hgetall("metrics:worker:seen") or {}).items():
+        if w in workers:
+            pid, ts = seen.split()
+            workers[w].update(pid=int(pid), last_seen=int(ts))
 
     return {
         "metrics": {
@@ -40,24 +64,210 @@ async def overview(x_admin_token: str | None = Header(default=None), db: AsyncSe
             "latency_ms_p95": p95,
             "requests_total": int(counts.get("requests", 0)),
             "status_counts": {k: int(v) for k, v in status.items()},
+            "events": {k: int(v) for k, v in sorted(events.items())},  # counted by the "stats" consumer group
+            "workers": dict(sorted(workers.items())),
         },
         "moderation": {
-            "pending_count": len(pending),
-            "pending": [{"id": str(i.id), "target_type": i.target_type, "target_id": str(i.target_id), "priority": i.priority, "created_at": i.created_at} for i in pending[:50]],
+            "pending_count": pending_count,
+            "pending": [{"id": str(i.id), "target_type": i.target_type, "target_id": str(i.target_id), "priority": i.priority, "created_at": i.created_at} for i in pending],
             "last_flags": [{"id": str(f.id), "target_type": f.target_type, "target_id": str(f.target_id), "reason": f.reason, "created_at": f.created_at} for f in last_flags],
         },
         "bans": [{"id": str(b.id), "created_at": b.created_at, "reason": b.reason} for b in bans],
     }
 
+def _aggregate_out(a) -> dict:
+    return {
+        "flags": a.flags,
+        "reporters": a.reporters,
+        "reasons": a.reasons,
+        "severity": a.severity,
+        "first_flag_at": a.first_flag_at,
+        "last_flag_at": a.last_flag_at,
+    }
+
+_AGGREGATE_COLUMNS = (
+    FlagAggregate.target_type, FlagAggregate.target_id, FlagAggregate.flags, FlagAggregate.reporters, FlagAggregate.reasons,
+    FlagAggregate.severity, FlagAggregate.first_flag_at, FlagAggregate.last_flag_at, FlagAggregate.resolved_at,
+)
+
 @router.get("/content/{target_type}/{target_id}")
-async def get_content(target_type: str, target_id: str, x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+async def get_content(
+    target_type: Literal["post", "reply", "dm"], target_id: UUID, x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)
+):
     require_admin(x_admin_token)
-    # Only metadata; do not decrypt content here by default (reduce insider risk). Return status + flags.
-    if target_type == "post":
-        obj = (await db.execute(select(Post).where(Post.id == target_id))).scalar_one_or_none()
-    else:
-        obj = (await db.execute(select(Reply).where(Reply.id == target_id))).scalar_one_or_none()
+    # Only metadata; do not decrypt content here by default (reduce insider risk). Return status + flag aggregate.
+    model = CONTENT_MODELS[target_type]
+    obj = (await db.execute(select(model.id, model.status, model.created_at).where(model.id == target_id))).one_or_none()
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
-    return {"id": str(obj.id), "status": obj.status, "flags_count": obj.flags_count, "created_at": obj.created_at}
+    agg = (
+        await db.execute(select(*_AGGREGATE_COLUMNS).where(FlagAggregate.target_type == target_type, FlagAggregate.target_id == target_id))
+    ).one_or_none()
+    return {
+        "id": str(obj.id),
+        "status": obj.status,
+        "flags_count": agg.flags if agg else 0,
+        "created_at": obj.created_at,
+        "flags": dict(_aggregate_out(agg), resolved_at=agg.resolved_at) if agg else None,
+    }
+
+# Triage keyset: the sort values of the last row seen. Severity and last_flag_at move with every flag, so the
+# cursor carries them instead of pointing at a row that may have moved since.
+def _triage_cursor(r) -> str:
+    raw = f"{r.severity!r}|{r.last_flag_at.isoformat()}|{r.target_type}|{r.target_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii")
+
+def _triage_after(cursor: str) -> tuple:
+    try:
+        severity, last_flag_at, target_type, target_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(severity), datetime.fromisoformat(last_flag_at), target_type, UUID(target_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+@router.get("/triage")
+async def triage(
+    target_type: Literal["post", "reply", "dm"] | None = Query(default=None),
+    cursor: str | None = Query(default=None, max_length=256),
+    page_size: int = Query(default=50, ge=1, le=200),
+    x_admin_token: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    require_admin(x_admin_token)
+    # Open flagged targets, most severe first (see app.services.flags): a keyset page of flag_aggregates off its
+    # partial index, then one projection per content type on the page and one for their pending queue items. No
+    # decryption. ?cursor=<next_cursor of the previous page>.
+    a = FlagAggregate
+    key = tuple_(a.severity, a.last_flag_at, a.target_type, a.target_id)
+    stmt = select(*_AGGREGATE_COLUMNS).where(a.resolved_at.is_(None))
+    if target_type:
+        stmt = stmt.where(a.target_type == target_type)
+    if cursor:
+        stmt = stmt.where(key < tuple_(*_triage_after(cursor)))
+    rows = (
+        await db.execute(stmt.order_by(a.severity.desc(), a.last_flag_at.desc(), a.target_type.desc(), a.target_id.desc()).limit(page_size))
+    ).all()
+
+    ids_by_type: dict[str, list] = defaultdict(list)
+    for r in rows:
+        ids_by_type[r.target_type].append(r.target_id)
+    content: dict[tuple, dict] = {}
+    for t, ids in ids_by_type.items():
+        model = CONTENT_MODELS[t]
+        for c in (await db.execute(select(model.id, model.status, model.created_at).where(model.id.in_(ids)))).all():
+            content[(t, c.id)] = {"status": c.status, "created_at": c.created_at}
+    queued: dict[tuple, dict] = {}
+    if rows:
+        q = ModerationQueueItem
+        pending = await db.execute(
+            select(q.id, q.target_type, q.target_id, q.priority).where(q.status == "pending", q.target_id.in_([r.target_id for r in rows]))
+        )
+        for i in pending.all():
+            queued[(i.target_type, i.target_id)] = {"id": str(i.id), "priority": i.priority}
+
+    return {
+        "page_size": page_size,
+        "next_cursor": _triage_cursor(rows[-1]) if len(rows) == page_size else None,
+        "items": [
+            {
+                "target_type": r.target_type,
+                "target_id": str(r.target_id),
+                **_aggregate_out(r),
+                "content": content.get((r.target_type, r.target_id)),  # None once purged
+                "queue_item": queued.get((r.target_type, r.target_id)),
+            }
+            for r in rows
+        ],
+    }
+
+@router.get("/search", response_model=list[SearchHitOut])
+async def admin_search(
+    q: str = Query(min_length=2, max_length=200),
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=50, ge=1, le=200),
+    x_admin_token: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    require_admin(x_admin_token)
+    # Moderators also see content auto-hidden pending review, and content of banned authors.
+    hits = await search(db, q, statuses=("visible", "hidden"), limit=page_size, offset=(page - 1) * page_size, active_authors_only=False)
+    return [SearchHitOut(**h) for h in hits]
+
+@router.post("/search/reindex", status_code=202)
+async def search_reindex(x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+    require_admin(x_admin_token)
+    # Backfill runs in `python -m app.worker` (it walks every post and reply).
+    job = await enqueue(db, "search_reindex")
+    await db.commit()
+    return {"job_id": str(job.id)}
+
+@router.post("/crypto/reencrypt", status_code=202)
+async def crypto_reencrypt(x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+    require_admin(x_admin_token)
+    # Rewrites every ciphertext not yet in the current envelope under the active key; runs in the worker.
+    job = await enqueue(db, "reencrypt")
+    await db.commit()
+    return {"job_id": str(job.id)}
+
+@router.post("/purge", status_code=202)
+async def purge_removed(
+    retention_days: int | None = Query(default=None, ge=1),
+    x_admin_token: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    require_admin(x_admin_token)
+    # Hard-deletes removed content past retention (plus flags, queue items, index entries); runs in the worker.
+    job = await enqueue(db, "purge", params={"retention_days": retention_days} if retention_days else None)
+    await db.commit()
+    return {"job_id": str(job.id)}
+
+@router.post("/evasion/scan", status_code=202)
+async def evasion_scan(
+    lookback_days: int | None = Query(default=None, ge=1),
+    x_admin_token: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    require_admin(x_admin_token)
+    # Folds new session events into the IP co-occurrence graph and queues suspicious accounts; runs in the worker.
+    job = await enqueue(db, "ban_evasion", params={"lookback_days": lookback_days} if lookback_days else None)
+    await db.commit()
+    return {"job_id": str(job.id)}
+
+IMPORT_WRITE_BYTES = 1 << 20
+
+@router.post("/import", status_code=202)
+async def bulk_import(
+    request: Request,
+    source: str = Query(min_length=1, max_length=64, pattern=r"^[A-Za-z0-9_.-]+$"),
+    x_admin_token: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    require_admin(x_admin_token)
+    # Streams the NDJSON body (plain or gzipped) to IMPORT_DIR without holding it in memory; the import itself
+    # runs in the worker (python -m app.worker --kind import), see app.services.importer.
+    os.makedirs(settings.import_dir, exist_ok=True)
+    path = os.path.join(settings.import_dir, f"{uuid7()}.ndjson")
+    size, buf = 0, bytearray()
+    with open(path, "wb") as fh:
+        async for chunk in request.stream():
+            buf += chunk
+            if len(buf) >= IMPORT_WRITE_BYTES:
+                await asyncio.to_thread(fh.write, bytes(buf))
+                size += len(buf)
+                buf.clear()
+        await asyncio.to_thread(fh.write, bytes(buf))
+        size += len(buf)
+    if not size:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="empty body")
+    job = await enqueue(db, "import", params={"path": path, "source": source})
+    await db.commit()
+    return {"job_id": str(job.id), "bytes": size, "status_url": f"/admin/import/{job.id}"}
+
+@router.get("/import/{job_id}")
+async def bulk_import_status(job_id: UUID, x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_read_db)):
+    require_admin(x_admin_token)
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.kind == "import"))).scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Not found")
+    # progress: line reached, staged/inserted/rejected counts per kind, lines_per_s, prepare_ms vs load_ms
+    return {"job_id": str(job.id), "status": job.status, "attempts": job.attempts, "progress": job.progress, "error": job.error}
@@ -1,20 +1,24 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi import Request
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from uuid import uuid4
 from datetime import datetime, timezone
+from uuid import UUID
 
+from app.db.ids import uuid7
 from app.db.session import get_db
-from app.api.schemas import RegisterIn, LoginIn, TokenOut
+from app.api.deps import rate_limit
+from app.api.schemas import RegisterIn, LoginIn, ResetIn, TokenOut
 from app.models import User, SessionEvent
-from app.services.auth import hash_password, verify_password, create_access_token
+from app.services.auth import hash_password, verify_password, create_access_token, decode_reset_token, password_fingerprint
 from app.services.crypto import crypto
+from app.core.client import client_identity
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/register", response_model=dict)
+@router.post("/register", response_model=dict, dependencies=[Depends(rate_limit("auth", by_user=False))])
 async def register(data: RegisterIn, request: Request, db: AsyncSession = Depends(get_db)):
     # No pseudo/username. Access key is email (stored encrypted + HMAC lookup).
     email_lookup = crypto.email_lookup(data.email)
@@ -22,11 +26,11 @@ async def register(data: RegisterIn, request: Request, db: AsyncSession = Depend
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=409, detail="Account already exists")
     ct, nonce = crypto.encrypt_text(data.email)
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip)
-    ip_ct, ip_nonce = crypto.encrypt_text(client_ip)
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
     user = User(
-        id=uuid4(),
+        id=uuid7(),
         password_hash=hash_password(data.password),
         email_lookup_hmac=email_lookup,
         email_ciphertext=ct,
@@ -39,11 +43,11 @@ async def register(data: RegisterIn, request: Request, db: AsyncSession = Depend
         is_banned=False,
     )
     db.add(user)
-    db.add(SessionEvent(id=uuid4(), user_id=user.id, event_type="register", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="register", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
     await db.commit()
     return {"ok": True}
 
-@router.post("/login", response_model=TokenOut)
+@router.post("/login", response_model=TokenOut, dependencies=[Depends(rate_limit("auth", by_user=False))])
 async def login(data: LoginIn, request: Request, db: AsyncSession = Depends(get_db)):
     email_lookup = crypto.email_lookup(data.email)
     res = await db.execute(select(User).where(User.email_lookup_hmac == email_lookup, User.deleted_at.is_(None)))
@@ -52,15 +56,37 @@ async def login(data: LoginIn, request: Request, db: AsyncSession = Depends(get_
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if not verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip)
-    ip_ct, ip_nonce = crypto.encrypt_text(client_ip)
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
     user.last_ip_lookup_hmac = ip_key
     user.last_ip_ciphertext = ip_ct
     user.last_ip_nonce = ip_nonce
-    db.add(SessionEvent(id=uuid4(), user_id=user.id, event_type="login", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="login", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
     await db.commit()
     token = create_access_token(str(user.id))
     return TokenOut(access_token=token)
 
-
+@router.post("/reset", response_model=TokenOut, dependencies=[Depends(rate_limit("auth", by_user=False))])
+async def reset_password(data: ResetIn, request: Request, db: AsyncSession = Depends(get_db)):
+    # Sets the password from a reset token (claim tokens of imported accounts, see app.services.importer) and logs in.
+    try:
+        claims = decode_reset_token(data.token)
+        uid = UUID(claims["sub"])
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+    # row lock: two requests with the same token cannot both pass the fingerprint check
+    res = await db.execute(select(User).where(User.id == uid, User.deleted_at.is_(None)).with_for_update())
+    user = res.scalar_one_or_none()
+    if not user or user.is_banned or claims.get("pwh") != password_fingerprint(user.password_hash):
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
+    user.password_hash = hash_password(data.password)
+    user.last_ip_lookup_hmac = ip_key
+    user.last_ip_ciphertext = ip_ct
+    user.last_ip_nonce = ip_nonce
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="password_reset", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+    await db.commit()
+    return TokenOut(access_token=create_access_token(str(user.id)))
@@ -1,12 +1,14 @@
 from __future__ import annotations
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
 
 from app.db.session import get_db
+from app.core.ratelimit import POLICIES, limiter
 from app.services.auth import decode_token
+from app.core.client import client_identity
 from app.models import User
 
 bearer = HTTPBearer(auto_error=False)
@@ -27,3 +29,24 @@ async def get_current_user(
     if not user or user.is_banned:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return user
+
+
+def _raise_limited(retry_after: float):
+    raise HTTPException(status_code=429, detail="rate limit exceeded", headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+
+def rate_limit(policy_name: str, by_user: bool = True):
+    # Route dependency. Authenticated routes are keyed by user id (get_current_user is cached per request,
+    # so this adds no query); anonymous ones by the HMAC'd IP prefix, never the raw IP.
+    policy = POLICIES[policy_name]
+    if by_user:
+        async def check_user(user: User = Depends(get_current_user)) -> None:
+            d = await limiter.check(policy, f"u:{user.id}")
+            if not d.allowed:
+                _raise_limited(d.retry_after_seconds)
+        return check_user
+
+    async def check_ip(request: Request) -> None:
+        d = await limiter.check(policy, f"ip:{client_identity(request).lookup}")
+        if not d.allowed:
+            _raise_limited(d.retry_after_seconds)
+    return check_ip
@@ -1,14 +1,16 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from uuid import uuid4, UUID
+from sqlalchemy import select, desc, tuple_
+from uuid import UUID
 from datetime import datetime, timezone
 
-from app.db.session import get_db
-from app.api.deps import get_current_user
+from app.db.ids import uuid7
+from app.db.session import get_db, get_read_db
+from app.api.deps import get_current_user, rate_limit
 from app.models import User, Post, Conversation, ConversationParticipant, DMMessage, SessionEvent
 from app.services.crypto import crypto
+from app.core.client import client_identity
 from pydantic import BaseModel, Field
 
 router = APIRouter(prefix="/dm", tags=["dm"])
@@ -37,16 +39,16 @@ async def start_from_post(data: DMStartFromPostIn, request: Request, user: User
         if other:
             return {"conversation_id": str(other)}
 
-    conv = Conversation(id=uuid4(), created_at=datetime.now(timezone.utc))
+    conv = Conversation(id=uuid7(), created_at=datetime.now(timezone.utc))
     db.add(conv)
-    db.add(ConversationParticipant(id=uuid4(), conversation_id=conv.id, user_id=user.id, created_at=datetime.now(timezone.utc)))
-    db.add(ConversationParticipant(id=uuid4(), conversation_id=conv.id, user_id=post.author_id, created_at=datetime.now(timezone.utc)))
+    db.add(ConversationParticipant(id=uuid7(), conversation_id=conv.id, user_id=user.id, created_at=datetime.now(timezone.utc)))
+    db.add(ConversationParticipant(id=uuid7(), conversation_id=conv.id, user_id=post.author_id, created_at=datetime.now(timezone.utc)))
 
     # session event
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip)
-    ip_ct, ip_nonce = crypto.encrypt_text(client_ip)
-    db.add(SessionEvent(id=uuid4(), user_id=user.id, event_type="dm", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="dm", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
 
     await db.commit()
     return {"conversation_id": str(conv.id)}
@@ -62,7 +64,7 @@ async def list_conversations(user: User = Depends(get_current_user), db: AsyncSe
     )
     return [{"conversation_id": str(cid), "created_at": created_at} for cid, created_at in res.all()]
 
-@router.post("/{conversation_id}/send")
+@router.post("/{conversation_id}/send", dependencies=[Depends(rate_limit("dm_send"))])
 async def send(conversation_id: UUID, data: DMSendIn, request: Request, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # membership check
     mem = (await db.execute(select(ConversationParticipant.id).where(ConversationParticipant.conversation_id == conversation_id, ConversationParticipant.user_id == user.id))).scalar_one_or_none()
@@ -70,32 +72,44 @@ async def send(conversation_id: UUID, data: DMSendIn, request: Request, user: Us
         raise HTTPException(status_code=403, detail="Forbidden")
 
     ct, nonce = crypto.encrypt_text(data.body)
-    msg = DMMessage(id=uuid4(), conversation_id=conversation_id, author_id=user.id, body_ciphertext=ct, body_nonce=nonce, created_at=datetime.now(timezone.utc), status="visible")
+    msg = DMMessage(id=uuid7(), conversation_id=conversation_id, author_id=user.id, body_ciphertext=ct, body_nonce=nonce, created_at=datetime.now(timezone.utc), status="visible")
     db.add(msg)
 
     # session event
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip)
-    ip_ct, ip_nonce = crypto.encrypt_text(client_ip)
-    db.add(SessionEvent(id=uuid4(), user_id=user.id, event_type="dm", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="dm", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
 
     await db.commit()
     return {"ok": True, "message_id": str(msg.id)}
 
+def messages_stmt(conversation_id: UUID, before: UUID | None = None):
+    # newest first, keyset on (created_at, id): ?before=<oldest id of previous page>; columns only, no entities.
+    # Not the id alone: messages from before UUIDv7 have random uuid4 ids.
+    q = select(DMMessage.id, DMMessage.author_id, DMMessage.body_ciphertext, DMMessage.body_nonce, DMMessage.created_at).where(
+        DMMessage.conversation_id == conversation_id, DMMessage.status == "visible"
+    )
+    if before is not None:
+        cursor = select(DMMessage.created_at).where(DMMessage.id == before).scalar_subquery()
+        q = q.where(tuple_(DMMessage.created_at, DMMessage.id) < tuple_(cursor, before))
+    return q.order_by(desc(DMMessage.created_at), desc(DMMessage.id)).limit(200)
+
 @router.get("/{conversation_id}/messages")
-async def messages(conversation_id: UUID, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def messages(conversation_id: UUID, before: UUID | None = Query(default=None), user: User = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
     mem = (await db.execute(select(ConversationParticipant.id).where(ConversationParticipant.conversation_id == conversation_id, ConversationParticipant.user_id == user.id))).scalar_one_or_none()
     if not mem:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    res = await db.execute(select(DMMessage).where(DMMessage.conversation_id == conversation_id, DMMessage.status == "visible").order_by(desc(DMMessage.created_at)).limit(200))
-    msgs = []
-    for m in res.scalars().all():
-        msgs.append({
+    rows = (await db.execute(messages_stmt(conversation_id, before))).all()
+    msgs = [
+        {
             "id": str(m.id),
             "author_is_me": (m.author_id == user.id),
             "body": crypto.decrypt_text(m.body_ciphertext, m.body_nonce),
             "created_at": m.created_at,
-        })
+        }
+        for m in rows
+    ]
     msgs.reverse()
     return msgs
@@ -1,43 +1,95 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, select, desc, tuple_
+from sqlalchemy.orm import aliased
+from app.core.settings import settings
+from app.db.session import read_session_factory
 from app.api.deps import get_current_user
-from app.models import Post, User
-from app.api.schemas import FeedItem, PostOut
+from app.models import Post, Reply, User
+from app.api.schemas import FeedItem, PostOut, ThreadSummaryOut, TopReplyOut
+from app.services.cache import cached_reply_page
 from app.services.crypto import crypto
 from app.services.ranking import feed_score
+from app.services.singleflight import coalescer
 
 router = APIRouter(tags=["feed"])
 
-@router.get("/feed", response_model=list[FeedItem])
-async def get_feed(db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
-    # Fetch recent visible posts; compute ranking using author trust score.
-    res = await db.execute(
-        select(Post, User.trust_score)
+# Feed and thread pages are the same for every viewer, so concurrent requests share one load via the coalescer.
+# Loaders open their own (replica-aware) session and return JSON-ready data.
+
+FEED_KEY = "feed"
+
+# Read paths select column projections, not entities: rows are plain tuples (no identity map, no instrumentation)
+# carrying only what the response needs.
+
+def feed_stmt():
+    top = aliased(Reply)
+    # Recent visible posts with the author's trust score (ranking); the thread summary is denormalized on the post
+    # and only the top reply's body is joined in (by primary key).
+    return (
+        select(
+            Post.id, Post.body_ciphertext, Post.body_nonce, Post.created_at, Post.flags_count,
+            Post.reply_count, Post.last_reply_at, Post.top_reply_id, User.trust_score,
+            top.body_ciphertext.label("top_ct"), top.body_nonce.label("top_nonce"), top.kindness_votes.label("top_votes"),
+        )
         .join(User, User.id == Post.author_id)
+        .outerjoin(top, and_(top.id == Post.top_reply_id, top.status == "visible"))
         .where(Post.status == "visible", User.deleted_at.is_(None), User.is_banned.is_(False))
         .order_by(desc(Post.created_at))
         .limit(100)
     )
+
+async def _load_feed() -> list[dict]:
+    factory = await read_session_factory()
+    async with factory() as db:
+        rows = (await db.execute(feed_stmt())).all()
     items = []
-    for post, trust in res.all():
-        body = crypto.decrypt_text(post.body_ciphertext, post.body_nonce)
-        score = feed_score(trust, post.flags_count, post.created_at)
-        items.append(FeedItem(post=PostOut(id=post.id, body=body, created_at=post.created_at, flags_count=post.flags_count), score=score))
+    for r in rows:
+        body = crypto.decrypt_text(r.body_ciphertext, r.body_nonce)
+        score = feed_score(r.trust_score, r.flags_count, r.created_at)
+        top_reply = None
+        if r.top_ct is not None:
+            top_reply = TopReplyOut(id=r.top_reply_id, body=crypto.decrypt_text(r.top_ct, r.top_nonce), kindness_votes=r.top_votes)
+        thread = ThreadSummaryOut(reply_count=r.reply_count, last_reply_at=r.last_reply_at, top_reply=top_reply)
+        items.append(FeedItem(post=PostOut(id=r.id, body=body, created_at=r.created_at, flags_count=r.flags_count), score=score, thread=thread))
     items.sort(key=lambda x: x.score, reverse=True)
-    return items
+    return [i.model_dump(mode="json") for i in items]
+
+@router.get("/feed", response_model=list[FeedItem])
+async def get_feed(user: User = Depends(get_current_user)):
+    return await coalescer.get(FEED_KEY, _load_feed, ttl_ms=settings.singleflight_feed_ttl_ms)
 
 from uuid import UUID
-from app.models import Reply
 from app.api.schemas import ReplyOut
 
+def replies_key(post_id: UUID) -> str:
+    return f"replies:{post_id}"
+
+REPLIES_PAGE_SIZE = 200
+
+def replies_stmt(post_id: UUID, after: UUID | None = None):
+    # Keyset on (created_at, id), oldest first: ?after=<last id of previous page>, whose created_at is looked up in the
+    # same statement. Not the id alone: rows from before UUIDv7 have random uuid4 ids.
+    q = select(
+        Reply.id, Reply.post_id, Reply.body_ciphertext, Reply.body_nonce, Reply.created_at, Reply.flags_count, Reply.kindness_votes
+    ).where(Reply.post_id == post_id, Reply.status == "visible")
+    if after is not None:
+        cursor = select(Reply.created_at).where(Reply.id == after).scalar_subquery()
+        q = q.where(tuple_(Reply.created_at, Reply.id) > tuple_(cursor, after))
+    return q.order_by(Reply.created_at.asc(), Reply.id.asc()).limit(REPLIES_PAGE_SIZE)
+
+async def _load_replies(post_id: UUID, after: UUID | None = None) -> list[dict]:
+    factory = await read_session_factory()
+    async with factory() as db:
+        rows = (await db.execute(replies_stmt(post_id, after))).all()
+    return [
+        ReplyOut(id=r.id, post_id=r.post_id, body=crypto.decrypt_text(r.body_ciphertext, r.body_nonce), created_at=r.created_at, flags_count=r.flags_count, kindness_votes=r.kindness_votes).model_dump(mode="json")
+        for r in rows
+    ]
+
 @router.get("/posts/{post_id}/replies", response_model=list[ReplyOut])
-async def get_replies(post_id: UUID, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
-    res = await db.execute(select(Reply).where(Reply.post_id == post_id, Reply.status == "visible").order_by(Reply.created_at.asc()).limit(200))
-    out = []
-    for r in res.scalars().all():
-        body = crypto.decrypt_text(r.body_ciphertext, r.body_nonce)
-        out.append(ReplyOut(id=r.id, post_id=r.post_id, body=body, created_at=r.created_at, flags_count=r.flags_count, kindness_votes=r.kindness_votes))
-    return out
+async def get_replies(post_id: UUID, after: UUID | None = Query(default=None), user: User = Depends(get_current_user)):
+    # in-process coalescing in front of the shared (Redis, versioned) page cache in front of the database
+    key = replies_key(post_id) if after is None else f"{replies_key(post_id)}:{after}"
+    load = lambda: cached_reply_page(post_id, after, lambda: _load_replies(post_id, after))
+    return await coalescer.get(key, load, ttl_ms=settings.singleflight_replies_ttl_ms)
@@ -1,37 +1,82 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, desc
 from datetime import datetime, timezone
+from uuid import UUID
 
 from app.db.session import get_db
 from app.api.deps import get_current_user
-from app.models import User, Post, Reply
-from app.services.crypto import crypto
+from app.core.settings import settings
+from app.models import User, Job
+from app.services.jobs import abandon, enqueue, is_stale, run_job
+from app.services.export import export_expired
+from app.services.cache import invalidate_feed
+from app.services.outbox import emit
+from app.services import erasure  # noqa: F401  (registers the erasure job handler)
 
 router = APIRouter(tags=["gdpr"])
 
-@router.get("/me/export")
-async def export_me(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    posts = (await db.execute(select(Post).where(Post.author_id == user.id))).scalars().all()
-    replies = (await db.execute(select(Reply).where(Reply.author_id == user.id))).scalars().all()
-    return {
-        "user": {"id": str(user.id), "created_at": user.created_at, "trust_score": user.trust_score},
-        "posts": [
-            {"id": str(p.id), "created_at": p.created_at, "status": p.status, "body": crypto.decrypt_text(p.body_ciphertext, p.body_nonce)}
-            for p in posts
-        ],
-        "replies": [
-            {"id": str(r.id), "post_id": str(r.post_id), "created_at": r.created_at, "status": r.status, "body": crypto.decrypt_text(r.body_ciphertext, r.body_nonce)}
-            for r in replies
-        ],
-    }
-
-@router.delete("/me")
-async def delete_me(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Soft delete user + remove their content from public surfaces.
+def _export_status(job: Job) -> dict:
+    out = {"job_id": str(job.id), "status": job.status, "progress": job.progress, "created_at": job.created_at, "finished_at": job.finished_at}
+    if job.status == "done":
+        out["expired"] = export_expired(job)
+        if not out["expired"]:
+            out["download_url"] = f"/me/export/{job.id}/download"
+    return out
+
+@router.post("/me/export", status_code=202)
+async def export_me(background: BackgroundTasks, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Reuse an export that is still in flight instead of starting another one; one whose runner is gone (no
+    # heartbeat within the lease) is marked failed and replaced.
+    job = (await db.execute(
+        select(Job).where(Job.user_id == user.id, Job.kind == "export", Job.status.in_(("queued", "running"))).order_by(desc(Job.created_at)).limit(1)
+    )).scalar_one_or_none()
+    if job is not None and is_stale(job):
+        await abandon(db, job)
+        job = None
+    if job is None:
+        job = await enqueue(db, "export", user_id=user.id)
+        await db.commit()
+        if settings.jobs_run_inline:
+            background.add_task(run_job, job.id)
+    return _export_status(job)
+
+@router.get("/me/export/{job_id}")
+async def export_status(job_id: UUID, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user.id, Job.kind == "export"))).scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _export_status(job)
+
+@router.get("/me/export/{job_id}/download")
+async def export_download(job_id: UUID, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user.id, Job.kind == "export"))).scalar_one_or_none()
+    if not job or job.status != "done" or not job.result_path or export_expired(job) or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(job.result_path, media_type="application/gzip", filename=f"entre-nous-export-{job.id}.ndjson.gz")
+
+@router.delete("/me", status_code=202)
+async def delete_me(background: BackgroundTasks, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Mark deleted now (login + token use stop, posts leave the feed); content is erased by the erasure job in chunks.
     await db.execute(update(User).where(User.id == user.id).values(deleted_at=datetime.now(timezone.utc), is_banned=True))
-    await db.execute(update(Post).where(Post.author_id == user.id).values(status="removed"))
-    await db.execute(update(Reply).where(Reply.author_id == user.id).values(status="removed"))
+    job = await enqueue(db, "erasure", user_id=user.id)
+    await emit(db, "user.deleted", user.id, job_id=job.id)
     await db.commit()
-    return {"ok": True}
+    invalidate_feed()
+    if settings.jobs_run_inline:
+        background.add_task(run_job, job.id)
+    return {"ok": True, "job_id": str(job.id), "status_url": f"/erasure/{job.id}"}
+
+@router.get("/erasure/{job_id}")
+async def erasure_status(job_id: UUID, background: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    # Unauthenticated on purpose: the account's tokens stop working once DELETE /me returns. The job id is the capability.
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.kind == "erasure"))).scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Not found")
+    if settings.jobs_run_inline and is_stale(job):
+        # its runner is gone: resume it from its checkpoint rather than wait for the next sweep
+        background.add_task(run_job, job.id)
+    return {"job_id": str(job.id), "status": job.status, "progress": job.progress, "created_at": job.created_at, "finished_at": job.finished_at}
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from uuid import UUID, uuid4
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request
-from sqlalchemy import select, update
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user
-from app.api.schemas import FlagIn
+from app.api.deps import get_current_user, rate_limit
+from app.api.schemas import FlagIn, ReviewDecisionIn
+from app.core.client import client_identity
 from app.core.settings import settings
+from app.db.ids import uuid7
 from app.db.session import get_db
 from app.models import (
     DMMessage,
@@ -20,14 +22,18 @@ from app.models import (
     SessionEvent,
     User,
 )
-from app.services.crypto import crypto
+from app.services.cache import invalidate_posts
+from app.services.flags import record_flag
+from app.services.outbox import emit
+from app.services.review_queue import apply_decisions, claim, enqueue_review
+from app.services.threads import refresh_summaries
 
 router = APIRouter(prefix="/moderation", tags=["moderation"])
 
 AUTO_HIDE_FLAGS = 3
 
 
-@router.post("/flag")
+@router.post("/flag", dependencies=[Depends(rate_limit("flag"))])
 async def flag_item(
     data: FlagIn,
     request: Request,
@@ -36,7 +42,7 @@ async def flag_item(
 ):
     # Store flag
     flag = ModerationFlag(
-        id=uuid4(),
+        id=uuid7(),
         reporter_id=user.id,
         target_type=data.target_type,
         target_id=data.target_id,
@@ -45,63 +51,46 @@ async def flag_item(
         created_at=datetime.now(timezone.utc),
     )
     db.add(flag)
+    await record_flag(db, flag)
 
     # Apply lightweight actions
+    hidden_in = None  # post whose thread lost a reply
+    auto_hidden = False
     if data.target_type == "post":
         await db.execute(update(Post).where(Post.id == data.target_id).values(flags_count=Post.flags_count + 1))
         res = await db.execute(select(Post.flags_count).where(Post.id == data.target_id))
         fc = res.scalar_one_or_none()
         if fc is not None and fc + 1 >= AUTO_HIDE_FLAGS:
             await db.execute(update(Post).where(Post.id == data.target_id).values(status="hidden"))
-            db.add(
-                ModerationQueueItem(
-                    id=uuid4(),
-                    target_type="post",
-                    target_id=data.target_id,
-                    priority=1,
-                    status="pending",
-                    created_at=datetime.now(timezone.utc),
-                )
-            )
+            auto_hidden = True
+            await enqueue_review(db, "post", data.target_id, priority=1)
 
     elif data.target_type == "reply":
         await db.execute(update(Reply).where(Reply.id == data.target_id).values(flags_count=Reply.flags_count + 1))
-        res = await db.execute(select(Reply.flags_count).where(Reply.id == data.target_id))
-        fc = res.scalar_one_or_none()
-        if fc is not None and fc + 1 >= AUTO_HIDE_FLAGS:
+        res = await db.execute(select(Reply.flags_count, Reply.post_id).where(Reply.id == data.target_id))
+        row = res.one_or_none()
+        if row is not None and row.flags_count + 1 >= AUTO_HIDE_FLAGS:
             await db.execute(update(Reply).where(Reply.id == data.target_id).values(status="hidden"))
-            db.add(
-                ModerationQueueItem(
-                    id=uuid4(),
-                    target_type="reply",
-                    target_id=data.target_id,
-                    priority=1,
-                    status="pending",
-                    created_at=datetime.now(timezone.utc),
-                )
-            )
+            await refresh_summaries(db, [row.post_id])
+            hidden_in = row.post_id
+            auto_hidden = True
+            await enqueue_review(db, "reply", data.target_id, priority=1)
 
     else:
         # DM: on flag -> remove immediately (MVP) + enqueue
-        await db.execute(update(DMMessage).where(DMMessage.id == data.target_id).values(status="removed"))
-        db.add(
-            ModerationQueueItem(
-                id=uuid4(),
-                target_type="dm",
-                target_id=data.target_id,
-                priority=1,
-                status="pending",
-                created_at=datetime.now(timezone.utc),
-            )
-        )
+        await db.execute(update(DMMessage).where(DMMessage.id == data.target_id).values(status="removed", removed_at=func.now()))
+        auto_hidden = True
+        await enqueue_review(db, "dm", data.target_id, priority=1)
+
+    await emit(db, "content.flagged", data.target_id, target_type=data.target_type, reason=data.reason, auto_hidden=auto_hidden)
 
     # Session event (IP encrypted)
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip) if client_ip else None
-    ip_ct, ip_nonce = (crypto.encrypt_text(client_ip) if client_ip else (None, None))
+    client = client_identity(request)
+    ip_key = client.lookup if client.ip else None
+    ip_ct, ip_nonce = (client.encrypted_ip() if client.ip else (None, None))
     db.add(
         SessionEvent(
-            id=uuid4(),
+            id=uuid7(),
             user_id=user.id,
             event_type="flag",
             ip_lookup_hmac=ip_key,
@@ -112,6 +101,8 @@ async def flag_item(
     )
 
     await db.commit()
+    if hidden_in is not None:
+        invalidate_posts([hidden_in])
     return {"ok": True}
 
 
@@ -129,34 +120,69 @@ async def queue(x_admin_token: str | None = Header(default=None), db: AsyncSessi
         .order_by(ModerationQueueItem.priority.asc(), ModerationQueueItem.created_at.asc())
         .limit(200)
     )
-    return [
-        {"id": str(i.id), "target_type": i.target_type, "target_id": str(i.target_id), "priority": i.priority, "created_at": i.created_at}
-        for i in res.scalars().all()
-    ]
+    return [_item_out(i) for i in res.scalars().all()]
+
+
+def _item_out(i: ModerationQueueItem) -> dict:
+    return {
+        "id": str(i.id),
+        "target_type": i.target_type,
+        "target_id": str(i.target_id),
+        "priority": i.priority,
+        "notes": i.notes,
+        "created_at": i.created_at,
+        "claimed_by": i.claimed_by,
+        "lease_expires_at": i.lease_expires_at,
+    }
+
+
+@router.post("/queue/claim")
+async def claim_items(
+    n: int = Query(default=20, ge=1),
+    x_admin_token: str | None = Header(default=None),
+    x_reviewer: str = Header(min_length=1, max_length=64),
+    db: AsyncSession = Depends(get_db),
+):
+    # Leases the next n pending items to this reviewer; concurrent claims skip each other's rows.
+    _require_admin(x_admin_token)
+    items = await claim(db, x_reviewer, min(n, settings.moderation_claim_max))
+    await db.commit()
+    return [_item_out(i) for i in items]
+
+
+@router.post("/queue/decisions")
+async def decide_many(
+    data: list[ReviewDecisionIn],
+    x_admin_token: str | None = Header(default=None),
+    x_reviewer: str | None = Header(default=None, max_length=64),
+    db: AsyncSession = Depends(get_db),
+):
+    # All decisions in one transaction; items no longer pending or leased to someone else are reported as skipped.
+    _require_admin(x_admin_token)
+    if len(data) > settings.moderation_claim_max:
+        raise HTTPException(status_code=400, detail=f"at most {settings.moderation_claim_max} decisions per request")
+    out, threads = await apply_decisions(db, {d.item_id: d.decision for d in data}, x_reviewer)
+    await db.commit()
+    invalidate_posts(threads)
+    return out
 
 
 @router.post("/queue/{item_id}/decision")
-async def decide(item_id: UUID, decision: str, x_admin_token: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+async def decide(
+    item_id: UUID,
+    decision: str,
+    x_admin_token: str | None = Header(default=None),
+    x_reviewer: str | None = Header(default=None, max_length=64),
+    db: AsyncSession = Depends(get_db),
+):
     _require_admin(x_admin_token)
     if decision not in ("approve", "reject"):
         raise HTTPException(status_code=400, detail="decision must be approve|reject")
 
-    item = (await db.execute(select(ModerationQueueItem).where(ModerationQueueItem.id == item_id))).scalar_one_or_none()
-    if not item:
-        raise HTTPException(status_code=404, detail="not found")
-
-    # Apply decision
-    if item.target_type == "post":
-        await db.execute(update(Post).where(Post.id == item.target_id).values(status="visible" if decision == "approve" else "removed"))
-    elif item.target_type == "reply":
-        await db.execute(update(Reply).where(Reply.id == item.target_id).values(status="visible" if decision == "approve" else "removed"))
-    else:
-        await db.execute(update(DMMessage).where(DMMessage.id == item.target_id).values(status="visible" if decision == "approve" else "removed"))
-
-    await db.execute(
-        update(ModerationQueueItem)
-        .where(ModerationQueueItem.id == item_id)
-        .values(status="approved" if decision == "approve" else "rejected", decided_at=datetime.now(timezone.utc))
-    )
+    out, threads = await apply_decisions(db, {item_id: decision}, x_reviewer)
+    if not out["applied"]:
+        reason = out["skipped"][0]["reason"]
+        raise HTTPException(status_code=409 if reason == "leased_to_other_reviewer" else 404, detail=reason)
     await db.commit()
+    invalidate_posts(threads)
     return {"ok": True}
@@ -2,26 +2,35 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
-from uuid import UUID, uuid4
+from uuid import UUID
 from datetime import datetime, timezone
 
+from app.db.ids import uuid7
 from app.db.session import get_db
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, rate_limit
 from app.api.schemas import PostCreateIn, ReplyCreateIn, PostOut, ReplyOut
-from app.models import User, Post, Reply, ModerationQueueItem, SessionEvent
+from app.models import User, Post, Reply, SessionEvent
+from app.services.cache import invalidate_posts
 from app.services.crypto import crypto
+from app.core.client import client_identity
 from app.services.moderation import quick_moderation
+from app.services.outbox import emit
+from app.services.review_queue import enqueue_review
+from app.services.search import index_content
+from app.services.singleflight import coalescer
+from app.services.threads import on_kindness_vote, on_reply_created
+from app.api.feed import FEED_KEY, replies_key
 
 router = APIRouter(tags=["content"])
 
-@router.post("/posts", response_model=PostOut)
+@router.post("/posts", response_model=PostOut, dependencies=[Depends(rate_limit("post"))])
 async def create_post(data: PostCreateIn, request: Request, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     mod = quick_moderation(data.body)
     if not mod.allow:
         raise HTTPException(status_code=400, detail={"blocked": mod.reasons})
     ct, nonce = crypto.encrypt_text(data.body)
     post = Post(
-        id=uuid4(),
+        id=uuid7(),
         author_id=user.id,
         body_ciphertext=ct,
         body_nonce=nonce,
@@ -33,23 +42,18 @@ async def create_post(data: PostCreateIn, request: Request, user: User = Depends
     db.add(post)
     # If risk high enough, enqueue for human review (layer 3)
     if mod.risk >= 0.6:
-        q = ModerationQueueItem(
-            id=uuid4(),
-            target_type="post",
-            target_id=post.id,
-            priority=3,
-            status="pending",
-            created_at=datetime.now(timezone.utc),
-        )
-        db.add(q)
-    client_ip = request.client.host if request.client else ""
-    ip_key = crypto.ip_lookup(client_ip)
-    ip_ct, ip_nonce = crypto.encrypt_text(client_ip)
-    db.add(SessionEvent(id=uuid4(), user_id=user.id, event_type="post", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
+        await enqueue_review(db, "post", post.id, priority=3)
+    await index_content(db, "post", post.id, data.body, post.created_at)
+    await emit(db, "post.created", post.id, author_id=user.id, risk=round(mod.risk, 3))
+    client = client_identity(request)
+    ip_key = client.lookup
+    ip_ct, ip_nonce = client.encrypted_ip()
+    db.add(SessionEvent(id=uuid7(), user_id=user.id, event_type="post", ip_lookup_hmac=ip_key, ip_ciphertext=ip_ct, ip_nonce=ip_nonce, created_at=datetime.now(timezone.utc)))
     await db.commit()
+    coalescer.forget(FEED_KEY)
     return PostOut(id=post.id, body=data.body, created_at=post.created_at, flags_count=0)
 
-@router.post("/posts/{post_id}/reply", response_model=ReplyOut)
+@router.post("/posts/{post_id}/reply", response_model=ReplyOut, dependencies=[Depends(rate_limit("reply"))])
 async def reply(post_id: UUID, data: ReplyCreateIn, request: Request, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     res = await db.execute(select(Post).where(Post.id == post_id, Post.status == "visible"))
     post = res.scalar_one_or_none()
@@ -60,7 +64,7 @@ async def reply(post_id: UUID, data: ReplyCreateIn, request: Request, user: User
         raise HTTPException(status_code=400, detail={"blocked": mod.reasons})
     ct, nonce = crypto.encrypt_text(data.body)
     reply = Reply(
-        id=uuid4(),
+        id=uuid7(),
         post_id=post.id,
         author_id=user.id,
         body_ciphertext=ct,
@@ -72,17 +76,14 @@ async def reply(post_id: UUID, data: ReplyCreateIn, request: Request, user: User
         kindness_votes=0,
     )
     db.add(reply)
+    await on_reply_created(db, post.id, reply.created_at)
     if mod.risk >= 0.6:
-        q = ModerationQueueItem(
-            id=uuid4(),
-            target_type="reply",
-            target_id=reply.id,
-            priority=3,
-            status="pending",
-            created_at=datetime.now(timezone.utc),
-        )
-        db.add(q)
+        await enqueue_review(db, "reply", reply.id, priority=3)
+    await index_content(db, "reply", reply.id, data.body, reply.created_at)
+    await emit(db, "reply.created", reply.id, post_id=post.id, author_id=user.id, risk=round(mod.risk, 3))
     await db.commit()
+    coalescer.forget(replies_key(post.id))
+    invalidate_posts([post.id])
     return ReplyOut(id=reply.id, post_id=reply.post_id, body=data.body, created_at=reply.created_at, flags_count=0, kindness_votes=0)
 
 @router.post("/replies/{reply_id}/kindness")
@@ -93,7 +94,10 @@ async def vote_kindness(reply_id: UUID, user: User = Depends(get_current_user),
     if not r:
         raise HTTPException(status_code=404, detail="Reply not found")
     await db.execute(update(Reply).where(Reply.id == reply_id).values(kindness_votes=Reply.kindness_votes + 1))
+    await on_kindness_vote(db, r.post_id, reply_id)
     # Simple trust bump for author (bounded)
     await db.execute(update(User).where(User.id == r.author_id).values(trust_score=User.trust_score + 0.02))
+    await emit(db, "reply.voted", reply_id, post_id=r.post_id, author_id=r.author_id)
     await db.commit()
+    invalidate_posts([r.post_id])
     return {"ok": True}
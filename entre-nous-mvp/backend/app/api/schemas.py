@@ -12,6 +12,10 @@ class LoginIn(BaseModel):
     email: str
     password: str
 
+class ResetIn(BaseModel):
+    token: str
+    password: str = Field(min_length=8, max_length=128)
+
 class TokenOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -42,6 +46,29 @@ class ReplyOut(BaseModel):
     flags_count: int
     kindness_votes: int
 
+class TopReplyOut(BaseModel):
+    id: UUID
+    body: str
+    kindness_votes: int
+
+class ThreadSummaryOut(BaseModel):
+    reply_count: int = 0
+    last_reply_at: Optional[datetime] = None
+    top_reply: Optional[TopReplyOut] = None
+
 class FeedItem(BaseModel):
     post: PostOut
     score: float
+    thread: ThreadSummaryOut = ThreadSummaryOut()
+
+class SearchHitOut(BaseModel):
+    type: Literal["post", "reply"]
+    id: UUID
+    post_id: UUID
+    body: str
+    created_at: datetime
+    status: str
+
+class ReviewDecisionIn(BaseModel):
+    item_id: UUID
+    decision: Literal["approve", "reject"]
@@ -0,0 +1,22 @@
+from __future__ import annotations
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_read_db
+from app.api.deps import get_current_user
+from app.api.schemas import SearchHitOut
+from app.models import User
+from app.services.search import search
+
+router = APIRouter(tags=["search"])
+
+@router.get("/search", response_model=list[SearchHitOut])
+async def search_content(
+    q: str = Query(min_length=2, max_length=200),
+    page: int = Query(default=1, ge=1, le=50),
+    page_size: int = Query(default=20, ge=1, le=50),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    hits = await search(db, q, statuses=("visible",), limit=page_size, offset=(page - 1) * page_size)
+    return [SearchHitOut(**h) for h in hits]
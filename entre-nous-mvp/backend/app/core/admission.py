@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from collections import Counter
+
+from app.core.settings import settings
+
+# Admission control. Three overload signals, all cheap to read per request:
+# - event-loop lag: how late a periodic tick wakes up (CPU-bound work or a blocked loop),
+# - in-flight requests in this process,
+# - DB pool wait: time spent getting a pooled connection (recorded by the engine's pool class).
+# Each signal is compared to its limit; the worst ratio gives the pressure level:
+#   0 = normal, 1 (>= 1x a limit) = shed LOW priority routes, 2 (>= 2x) = shed LOW and NORMAL.
+# CRITICAL routes (login, DM send, probes) are never shed here. Shed requests get an immediate 503 with
+# Retry-After instead of queueing behind the pool and timing out late.
+
+CRITICAL, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {CRITICAL: "critical", NORMAL: "normal", LOW: "low"}
+
+# (method or None for any, path regex, priority); first match wins, default NORMAL
+ROUTE_PRIORITIES: list[tuple[str | None, re.Pattern, int]] = [
+    (None, re.compile(r"^/(health|ready)$"), CRITICAL),
+    ("POST", re.compile(r"^/auth/(login|register)$"), CRITICAL),
+    ("POST", re.compile(r"^/dm/[^/]+/send$"), CRITICAL),
+    (None, re.compile(r"^/admin/"), LOW),
+    (None, re.compile(r"^/me/export"), LOW),
+]
+# deeper pages of threads / DMs / search (first pages stay NORMAL)
+_CURSOR_PARAMS = re.compile(rb"(^|&)(after|before)=|(^|&)page=([2-9]|\d\d)")
+
+
+def route_priority(method: str, path: str, query_string: bytes = b"") -> int:
+    for m, pattern, prio in ROUTE_PRIORITIES:
+        if (m is None or m == method) and pattern.match(path):
+            return prio
+    if method == "GET" and query_string and _CURSOR_PARAMS.search(query_string):
+        return LOW
+    return NORMAL
+
+
+class AdmissionController:
+    TICK_SECONDS = 0.1
+    DECAY = 0.8  # per tick, for the EWMAs
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.loop_lag_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.shed: Counter = Counter()
+        self._task: asyncio.Task | None = None
+
+    # --- signals ---
+    def observe_pool_wait(self, ms: float) -> None:
+        # keep the worse of the decayed average and the new sample's share so a burst of waits shows up at once
+        self.pool_wait_ms = max(self.pool_wait_ms * self.DECAY + ms * (1 - self.DECAY), ms * 0.5)
+
+    async def _monitor(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.TICK_SECONDS)
+            late_ms = max(0.0, (time.perf_counter() - start - self.TICK_SECONDS) * 1000.0)
+            self.loop_lag_ms = self.loop_lag_ms * self.DECAY + late_ms * (1 - self.DECAY)
+            self.pool_wait_ms *= self.DECAY
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # --- decisions ---
+    def pressure(self) -> float:
+        ratios = []
+        if settings.admission_loop_lag_ms > 0:
+            ratios.append(self.loop_lag_ms / settings.admission_loop_lag_ms)
+        if settings.admission_max_in_flight > 0:
+            ratios.append(self.in_flight / settings.admission_max_in_flight)
+        if settings.admission_pool_wait_ms > 0:
+            ratios.append(self.pool_wait_ms / settings.admission_pool_wait_ms)
+        return max(ratios, default=0.0)
+
+    def level(self) -> int:
+        p = self.pressure()
+        return 2 if p >= 2.0 else (1 if p >= 1.0 else 0)
+
+    def admit(self, priority: int) -> bool:
+        if not settings.admission_enabled or priority == CRITICAL:
+            return True
+        lvl = self.level()
+        if lvl == 0 or (lvl == 1 and priority != LOW):
+            return True
+        self.shed[PRIORITY_NAMES[priority]] += 1
+        return False
+
+    def snapshot(self) -> dict:
+        return {
+            "level": self.level(),
+            "pressure": round(self.pressure(), 3),
+            "in_flight": self.in_flight,
+            "loop_lag_ms": round(self.loop_lag_ms, 2),
+            "pool_wait_ms": round(self.pool_wait_ms, 2),
+            "shed": dict(self.shed),
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import ipaddress
+from functools import lru_cache
+
+from starlette.requests import Request
+
+from app.core.settings import settings
+from app.services.crypto import crypto
+
+# Request-scoped client identity. ClientContextMiddleware resolves the client address once per request
+# (honouring X-Forwarded-For only from trusted proxies); the ban/rate-limit lookup HMAC and the encrypted IP
+# stored on session events are derived lazily and at most once, however many layers ask for them.
+
+IPNetwork = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+@lru_cache(maxsize=1)
+def trusted_proxies() -> tuple[IPNetwork, ...]:
+    return tuple(ipaddress.ip_network(n.strip(), strict=False) for n in settings.trusted_proxies.split(",") if n.strip())
+
+
+def _parse(ip: str):
+    try:
+        return ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+
+
+def _is_trusted(addr, nets: tuple[IPNetwork, ...]) -> bool:
+    return addr is not None and any(addr in n for n in nets)
+
+
+def resolve_client_ip(peer: str, forwarded_for: str | None) -> str:
+    nets = trusted_proxies()
+    if not forwarded_for or not _is_trusted(_parse(peer), nets):
+        return peer
+    # Walk right to left: every hop appended by our own proxies is trusted; the first one that isn't is the client.
+    hops = [h.strip() for h in forwarded_for.split(",") if h.strip()]
+    for hop in reversed(hops):
+        addr = _parse(hop)
+        if addr is None:
+            return peer
+        if not _is_trusted(addr, nets):
+            return str(addr)
+    return hops[0] if hops else peer
+
+
+class ClientIdentity:
+    __slots__ = ("ip", "_lookup", "_encrypted")
+
+    def __init__(self, ip: str) -> None:
+        self.ip = ip
+        self._lookup: str | None = None
+        self._encrypted: tuple[bytes, bytes] | None = None
+
+    @classmethod
+    def from_scope(cls, scope) -> "ClientIdentity":
+        client = scope.get("client")
+        peer = client[0] if client else ""
+        xff = None
+        for k, v in scope.get("headers", ()):
+            if k == b"x-forwarded-for":
+                xff = v.decode("latin-1")
+                break
+        return cls(resolve_client_ip(peer, xff))
+
+    @property
+    def lookup(self) -> str:
+        # HMAC of the /24 (IPv4) or /64 (IPv6) prefix; used for bans, rate limits and session events.
+        if self._lookup is None:
+            self._lookup = crypto.ip_lookup(self.ip)
+        return self._lookup
+
+    def encrypted_ip(self) -> tuple[bytes, bytes]:
+        if self._encrypted is None:
+            self._encrypted = crypto.encrypt_text(self.ip)
+        return self._encrypted
+
+
+def client_identity(request: Request) -> ClientIdentity:
+    ident = getattr(request.state, "client", None)
+    if ident is None:
+        # Not behind ClientContextMiddleware (scripts, bare routers): resolve now and keep it for the request.
+        ident = ClientIdentity.from_scope(request.scope)
+        request.state.client = ident
+    return ident
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import gzip
+import threading
+
+import zstandard
+
+from app.core.settings import settings
+
+try:  # optional: pip install -e ".[compression]"
+    import brotli
+except ImportError:  # pragma: no cover - depends on the install
+    brotli = None
+
+# HTTP response compression (used by CompressionMiddleware). The client's Accept-Encoding picks among the
+# encodings we support, in our order of preference (COMPRESSION_ENCODINGS, best ratio/CPU first); identity when
+# nothing acceptable is on offer. zstd contexts are per thread (large bodies are compressed in worker threads).
+
+_local = threading.local()
+
+
+def _zstd(body: bytes) -> bytes:
+    c = getattr(_local, "cctx", None)
+    if c is None:
+        c = _local.cctx = zstandard.ZstdCompressor(level=settings.compression_zstd_level)
+    return c.compress(body)
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)
+
+
+def _br(body: bytes) -> bytes:
+    return brotli.compress(body, mode=brotli.MODE_TEXT, quality=settings.compression_br_quality)
+
+
+CODECS = {"zstd": _zstd, "gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = _br
+
+
+def supported() -> list[str]:
+    return [e for e in (x.strip() for x in settings.compression_encodings.split(",")) if e in CODECS]
+
+
+def accepted(header: str) -> dict[str, float]:
+    """Accept-Encoding -> {coding: q}; codings with q=0 are kept (they are explicit refusals)."""
+    out: dict[str, float] = {}
+    for part in header.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        out[coding] = q
+    return out
+
+
+def negotiate(header: str, offered: list[str]) -> str | None:
+    # highest q wins, ties go to our preference order; "*" covers codings not listed
+    prefs = accepted(header)
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = prefs.get(coding, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(coding: str, body: bytes) -> bytes:
+    return CODECS[coding](body)
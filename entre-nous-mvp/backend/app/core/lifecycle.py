@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI
+
+from app.api.feed import FEED_KEY, _load_feed
+from app.core.admission import admission
+from app.core.client import trusted_proxies
+from app.core.logging import log
+from app.core.process import worker_id
+from app.core.redis import close_redis, get_async_redis, get_redis
+from app.core.settings import settings
+from app.db.session import dispose_engines, engine, read_engine, warm_pool
+from app.services.crypto import crypto
+from app.services.jobs import sweep
+from app.services.singleflight import coalescer
+
+# Process lifecycle for the API (wired as the FastAPI lifespan by app.main.create_app).
+# Startup warms everything the first requests would otherwise pay for -- DB connections (primary and replica),
+# the Redis pools, the content crypto/zstd contexts, the trusted-proxy table and the coalesced feed page -- and only
+# then marks the process ready. If a dependency is down at boot the warm-up keeps retrying in the background and
+# /ready stays 503 until it succeeds (liveness, /health, is unaffected). /ready also reports admission control
+# state and turns 503 while the process sheds normal traffic. In inline job mode the process also sweeps for erasure jobs
+# left behind by a crashed process. Shutdown closes pools gracefully.
+
+
+class Readiness:
+    def __init__(self) -> None:
+        self.ready = False
+        self.warmed: dict[str, object] = {}
+        self.error: str | None = None
+        self.started_at = time.monotonic()
+        self.ready_after_ms: float | None = None
+
+    def snapshot(self) -> dict:
+        load = admission.snapshot()
+        overloaded = settings.admission_unready_on_overload and load["level"] >= 2
+        return {"ready": self.ready and not overloaded, "worker": worker_id(), "warmed": self.warmed, "error": self.error, "ready_after_ms": self.ready_after_ms, "admission": load}
+
+
+async def warm_up(state: Readiness) -> None:
+    n = max(1, min(settings.warmup_db_connections, settings.db_pool_size))
+    state.warmed["db_connections"] = await warm_pool(engine, n)
+    if read_engine is not None:
+        state.warmed["replica_connections"] = await warm_pool(read_engine, n)
+    await get_async_redis().ping()
+    await asyncio.to_thread(get_redis().ping)
+    state.warmed["redis"] = True
+    # first SecretBox/zstd use allocates per-thread contexts
+    crypto.decrypt_text(crypto.encrypt_text("warm-up " * 8)[0])
+    state.warmed["trusted_proxies"] = len(trusted_proxies())
+    if settings.warmup_prefill_feed:
+        state.warmed["feed_items"] = len(await coalescer.get(FEED_KEY, _load_feed, ttl_ms=settings.singleflight_feed_ttl_ms))
+
+
+async def _attempt(state: Readiness) -> bool:
+    try:
+        await asyncio.wait_for(warm_up(state), timeout=settings.warmup_timeout_seconds)
+    except Exception as e:
+        state.error = f"{type(e).__name__}: {e}"[:200]
+        log.warning("warmup_failed", error=state.error)
+        return False
+    state.error = None
+    state.ready = True
+    state.ready_after_ms = round((time.monotonic() - state.started_at) * 1000.0, 1)
+    log.info("ready", **state.warmed, ready_after_ms=state.ready_after_ms)
+    return True
+
+
+async def _retry_until_ready(state: Readiness) -> None:
+    delay = 0.5
+    while not await _attempt(state):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 10.0)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    state: Readiness = app.state.readiness
+    admission.start()
+    retry = None if await _attempt(state) else asyncio.create_task(_retry_until_ready(state))
+    # erasure has to complete even when the process that ran it died and no worker is deployed
+    sweeper = asyncio.create_task(sweep(["erasure"])) if settings.jobs_run_inline else None
+    try:
+        yield
+    finally:
+        # stop advertising readiness first, then release pools
+        state.ready = False
+        if retry is not None:
+            retry.cancel()
+        if sweeper is not None:
+            sweeper.cancel()
+        await admission.stop()
+        await dispose_engines()
+        await close_redis()
+        log.info("shutdown_complete")
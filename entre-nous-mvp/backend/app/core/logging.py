@@ -1,11 +1,18 @@
 import structlog
 import logging
 
+from app.core.process import worker_id
+
+def _add_worker(logger, method_name, event_dict):
+    event_dict.setdefault("worker", worker_id())
+    return event_dict
+
 def configure_logging() -> None:
     logging.basicConfig(level=logging.INFO, format="%(message)s")
     structlog.configure(
         processors=[
             structlog.processors.add_log_level,
+            _add_worker,
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.JSONRenderer(),
         ]
@@ -18,37 +18,169 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import AsyncSessionLocal
-from app.services.crypto import crypto
+from app.core.client import ClientIdentity, client_identity
 from app.models import IpBan
 
+class ClientContextMiddleware:
+    # Pure ASGI (no extra task per request): resolve the client identity once, before anything else needs it.
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            scope.setdefault("state", {})["client"] = ClientIdentity.from_scope(scope)
+        await self.app(scope, receive, send)
+
 class IPBanMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        # Compute privacy-friendly lookup (prefix-based) and block if banned.
-        client_host = request.client.host if request.client else ""
-        ip_key = crypto.ip_lookup(client_host)
+        # Privacy-friendly lookup (prefix-based HMAC, computed once per request) and block if banned.
+        ip_key = client_identity(request).lookup
         async with AsyncSessionLocal() as db:  # short-lived session for ban check
             res = await db.execute(select(IpBan.id).where(IpBan.ip_lookup_hmac == ip_key))
             if res.scalar_one_or_none():
                 return Response(status_code=403, content="Forbidden")
         return await call_next(request)
 
+import os
 import time
+from app.core.process import worker_id
 from app.core.redis import get_redis
+from app.core.settings import settings
+from app.core.timing import track_request, server_timing
+from app.core.logging import log
+
+def route_key(request: Request) -> str:
+    # Route template (not the raw path) so ids don't explode metric cardinality.
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', 'unmatched')}"
 
 class MetricsMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        start = time.perf_counter()
-        response: Response = await call_next(request)
-        ms = (time.perf_counter() - start) * 1000.0
+        with track_request() as stats:
+            start = time.perf_counter()
+            response: Response = await call_next(request)
+            ms = (time.perf_counter() - start) * 1000.0
+        route = route_key(request)
         try:
-            r = get_redis()
+            pipe = get_redis().pipeline(transaction=False)
             key = "metrics:latency_ms:last500"
-            r.lpush(key, f"{ms:.3f}")
-            r.ltrim(key, 0, 499)
-            r.hincrby("metrics:counts", "requests", 1)
-            r.hincrby("metrics:status", str(response.status_code), 1)
+            pipe.lpush(key, f"{ms:.3f}")
+            pipe.ltrim(key, 0, 499)
+            pipe.hincrby("metrics:counts", "requests", 1)
+            pipe.hincrby("metrics:status", str(response.status_code), 1)
+            pipe.hincrby("metrics:route:requests", route, 1)
+            pipe.hincrby("metrics:route:queries", route, stats.queries)
+            pipe.hincrbyfloat("metrics:route:total_ms", route, round(ms, 3))
+            pipe.hincrbyfloat("metrics:route:db_ms", route, round(stats.db_ms, 3))
+            pipe.hincrbyfloat("metrics:route:crypto_ms", route, round(stats.crypto_ms, 3))
+            pipe.hincrby("metrics:worker:requests", worker_id(), 1)
+            pipe.hset("metrics:worker:seen", worker_id(), f"{os.getpid()} {time.time():.0f}")
+            pipe.execute()
         except Exception:
             # metrics must never break the API
             pass
-        response.headers["Server-Timing"] = f"app;dur={ms:.2f}"
+        if settings.slow_request_log_ms and ms >= settings.slow_request_log_ms:
+            log.warning(
+                "slow_request",
+                route=route,
+                status=response.status_code,
+                ms=round(ms, 2),
+                queries=stats.queries,
+                db_ms=round(stats.db_ms, 2),
+                crypto_ms=round(stats.crypto_ms, 2),
+                render_ms=round(stats.render_ms, 2),
+                statements=stats.top_statements(),
+            )
+        response.headers["Server-Timing"] = server_timing(stats, ms)
         return response
+
+from app.core.admission import admission, route_priority
+
+class AdmissionControlMiddleware:
+    # Pure ASGI and outside everything that touches Redis/Postgres, so a shed request costs almost nothing.
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not admission.admit(route_priority(scope["method"], scope["path"], scope.get("query_string", b""))):
+            response = Response(
+                status_code=503,
+                content=b'{"detail":"overloaded, retry shortly"}',
+                media_type="application/json",
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        admission.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.in_flight -= 1
+
+import asyncio
+from starlette.datastructures import MutableHeaders
+from app.core.compression import compress, negotiate, supported
+
+# never compressed: no body, or tiny fixed error bodies on the ban / rate-limit paths
+UNCOMPRESSED_STATUSES = {204, 304, 403, 429}
+
+class CompressionMiddleware:
+    # Pure ASGI, outside MetricsMiddleware so it sees the final headers (its own time is appended to Server-Timing
+    # as `compress`). Only complete JSON bodies with a known length >= COMPRESSION_MIN_BYTES are compressed; streamed
+    # and non-JSON responses (e.g. the already gzipped export download) pass through untouched.
+    def __init__(self, app) -> None:
+        self.app = app
+        self.offered = supported()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled or not self.offered:
+            await self.app(scope, receive, send)
+            return
+        header = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        coding = negotiate(header, self.offered) if header else None
+        start: dict | None = None
+        chunks: list[bytes] = []
+
+        async def send_compressed(message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                is_json = "json" in headers.get("content-type", "") and message["status"] not in UNCOMPRESSED_STATUSES
+                if is_json:
+                    headers.add_vary_header("Accept-Encoding")
+                size = int(headers.get("content-length") or -1)
+                if coding and is_json and "content-encoding" not in headers and size >= settings.compression_min_bytes:
+                    start = message  # hold it until the whole body is in
+                    return
+                await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            raw_len = len(body)
+            t0 = time.perf_counter()
+            if len(body) >= settings.compression_thread_min_bytes:
+                packed = await asyncio.to_thread(compress, coding, body)
+            else:
+                packed = compress(coding, body)
+            ms = (time.perf_counter() - t0) * 1000.0
+            headers = MutableHeaders(raw=start["headers"])
+            sent = "identity"  # not smaller: the raw body goes out, and the timing entry must not name the codec
+            if len(packed) < raw_len:
+                headers["Content-Encoding"] = sent = coding
+                headers["Content-Length"] = str(len(packed))
+                body = packed
+            entry = f'compress;dur={ms:.2f};desc="{sent} {raw_len}>{len(body)}"'
+            timing = headers.get("server-timing")
+            headers["Server-Timing"] = f"{timing}, {entry}" if timing else entry
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import math
+import os
+import socket
+
+# Identity of this API process, for per-worker metrics and log lines. Under `python -m app.serve` every worker
+# gets a slot number (0..N-1) in WORKER_SLOT; a recycled worker's replacement reuses the slot, so metrics keep a
+# bounded set of worker ids across restarts. A plain `uvicorn` process is slot 0.
+
+_cached: tuple[int, str] | None = None
+
+
+def worker_id() -> str:
+    # recomputed after a fork (the preloading master must not hand its own id down to the workers)
+    global _cached
+    pid = os.getpid()
+    if _cached is None or _cached[0] != pid:
+        _cached = (pid, f"{socket.gethostname()}:{os.environ.get('WORKER_SLOT', '0')}")
+    return _cached[1]
+
+
+def available_cores() -> int:
+    """CPUs this process may actually use: the affinity mask, capped by a cgroup v2 CPU quota (containers)."""
+    n = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()
+        if quota != "max":
+            n = min(n, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, n)
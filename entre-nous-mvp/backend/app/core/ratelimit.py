@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from app.core.logging import log
+from app.core.redis import get_async_redis
+from app.core.settings import settings
+
+# Sliding-window counter rate limiting in Redis (one Lua script = one atomic round trip per check).
+# The estimate weights the previous fixed window by how much of it still overlaps the sliding window,
+# which is accurate to within a few percent at two keys per (policy, subject).
+# A per-process deny cache remembers subjects Redis already rejected until their retry time, so a flood
+# from one subject is turned away locally without touching Redis (or Postgres) at all.
+
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local into = now % window
+local est = prev * (window - into) / window + cur
+if est + 1 > limit then
+  return {0, math.floor(est), window - into}
+end
+redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.floor(est) + 1, 0}
+"""
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    limit: int
+    window_seconds: int
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Policy":
+        # "<limit>/<window seconds>", e.g. "10/60"
+        limit, _, window = spec.partition("/")
+        return cls(name=name, limit=int(limit), window_seconds=int(window or 60))
+
+
+POLICIES: dict[str, Policy] = {
+    "auth": Policy.parse("auth", settings.rate_limit_auth),
+    "post": Policy.parse("post", settings.rate_limit_post),
+    "reply": Policy.parse("reply", settings.rate_limit_reply),
+    "dm_send": Policy.parse("dm_send", settings.rate_limit_dm_send),
+    "flag": Policy.parse("flag", settings.rate_limit_flag),
+}
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    count: int
+    retry_after_seconds: float
+
+
+class RateLimiter:
+    def __init__(self, local_max_entries: int = 10_000) -> None:
+        self._script = None
+        self._denied_until: dict[str, float] = {}
+        self._local_max_entries = local_max_entries
+
+    def _local_denied(self, key: str, now: float) -> float | None:
+        until = self._denied_until.get(key)
+        if until is None:
+            return None
+        if until <= now:
+            self._denied_until.pop(key, None)
+            return None
+        return until - now
+
+    def _remember_denied(self, key: str, until: float) -> None:
+        if len(self._denied_until) >= self._local_max_entries:
+            now = time.monotonic()
+            self._denied_until = {k: v for k, v in self._denied_until.items() if v > now}
+            if len(self._denied_until) >= self._local_max_entries:
+                self._denied_until.clear()
+        self._denied_until[key] = until
+
+    async def check(self, policy: Policy, subject: str) -> Decision:
+        key = f"rl:{policy.name}:{subject}"
+        mono = time.monotonic()
+        remaining = self._local_denied(key, mono)
+        if remaining is not None:
+            return Decision(False, policy.limit, remaining)
+
+        window_ms = policy.window_seconds * 1000
+        now_ms = int(time.time() * 1000)
+        bucket = now_ms // window_ms
+        try:
+            if self._script is None:
+                self._script = get_async_redis().register_script(SLIDING_WINDOW_LUA)
+            allowed, count, retry_ms = await self._script(keys=[f"{key}:{bucket}", f"{key}:{bucket - 1}"], args=[now_ms, window_ms, policy.limit])
+        except Exception as e:
+            # Fail open: an unavailable Redis must not take the API down with it.
+            log.warning("rate_limit_unavailable", policy=policy.name, error=type(e).__name__)
+            return Decision(True, 0, 0.0)
+        if not allowed:
+            retry = max(1, int(retry_ms)) / 1000.0
+            self._remember_denied(key, mono + retry)
+            return Decision(False, int(count), retry)
+        return Decision(True, int(count), 0.0)
+
+
+limiter = RateLimiter()
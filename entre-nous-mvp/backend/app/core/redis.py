@@ -1,8 +1,31 @@
 from __future__ import annotations
 
 import redis
+import redis.asyncio as aioredis
 from app.core.settings import settings
 
+_client: redis.Redis | None = None
+_async_client: aioredis.Redis | None = None
+
 def get_redis() -> redis.Redis:
-    # decode_responses False for bytes performance; we store small strings
-    return redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    # One client (and connection pool) per process; decode_responses since we store small strings
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _client
+
+def get_async_redis() -> aioredis.Redis:
+    # For hot paths inside request handling (rate limiting, caches) that must not block the event loop.
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _async_client
+
+async def close_redis() -> None:
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
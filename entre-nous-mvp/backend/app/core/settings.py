@@ -9,18 +9,144 @@ class Settings(BaseSettings):
     database_url: str
     redis_url: str
 
+    # DB pool (per process) and optional read replica for GET-heavy endpoints
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 10.0
+    db_pool_recycle_seconds: int = 1800
+    db_command_timeout_seconds: float = 30.0
+    db_statement_cache_size: int = 500
+    database_replica_url: str | None = None
+    db_replica_max_lag_seconds: float = 5.0
+    db_replica_check_interval_seconds: float = 2.0
+
     jwt_secret: str
     jwt_issuer: str = "entre-nous"
     access_token_minutes: int = 30
 
-    content_enc_key_b64: str
+    content_enc_key_b64: str  # key id 0
+    # extra keys for rotation, "1:<base64>,2:<base64>"; new ciphertexts use the active id
+    content_enc_keys: str = ""
+    content_enc_active_kid: int = 0
     admin_review_token: str
     admin_ui_token: str
 
     email_lookup_pepper: str
     ip_lookup_pepper: str
+    search_index_pepper: str
 
     cors_origins: str = "http://localhost:5173"
+    # comma-separated CIDRs of reverse proxies whose X-Forwarded-For is trusted (empty = use the peer address)
+    trusted_proxies: str = ""
+
+    # rate limits "<requests>/<window seconds>" (Redis sliding window, see app.core.ratelimit)
+    rate_limit_auth: str = "10/60"
+    rate_limit_post: str = "5/60"
+    rate_limit_reply: str = "20/60"
+    rate_limit_dm_send: str = "30/60"
+    rate_limit_flag: str = "20/600"
+
+    # single-flight coalescing of hot reads (app.services.singleflight)
+    singleflight_feed_ttl_ms: int = 1000
+    singleflight_replies_ttl_ms: int = 1000
+    singleflight_stale_ms: int = 5000
+    singleflight_max_entries: int = 2048
+    singleflight_redis_lease: bool = False
+    singleflight_lease_ms: int = 2000
+    # decrypted reply pages in Redis (sealed), invalidated by version bump on new replies / moderation
+    replies_cache_ttl_seconds: int = 600
+
+    # startup warm-up before /ready turns green (app.core.lifecycle); connections per engine, capped by the pool size
+    warmup_db_connections: int = 5
+    warmup_timeout_seconds: float = 15.0
+    warmup_prefill_feed: bool = True
+
+    # admission control / load shedding (app.core.admission); a limit of 0 disables that signal
+    admission_enabled: bool = True
+    admission_loop_lag_ms: float = 100.0
+    admission_max_in_flight: int = 256
+    admission_pool_wait_ms: float = 250.0
+    # /ready turns 503 while NORMAL traffic is being shed. Off by default: when every replica sheds at once (or there
+    # is only one) failing the probe pulls all capacity out of the load balancer and turns overload into an outage.
+    admission_unready_on_overload: bool = False
+
+    # production server (python -m app.serve); 0 workers = one per available core. Every worker has its own DB
+    # pool, so size db_pool_size/db_max_overflow for workers x pool against Postgres max_connections.
+    serve_workers: int = 0
+    serve_max_requests: int = 10000  # recycle a worker after this many requests (+ jitter); 0 disables
+    serve_max_requests_jitter: int = 1000
+    serve_graceful_timeout_seconds: int = 30
+    serve_keepalive_seconds: int = 5
+    serve_backlog: int = 2048
+
+    # HTTP response compression for JSON (CompressionMiddleware); preference order, "br" needs the compression extra
+    compression_enabled: bool = True
+    compression_encodings: str = "zstd,br,gzip"
+    compression_min_bytes: int = 1024
+    compression_thread_min_bytes: int = 262144  # bigger bodies are compressed off the event loop
+    compression_gzip_level: int = 6
+    compression_br_quality: int = 4
+    compression_zstd_level: int = 3
+
+    # opt-in slow request log (with SQL statement fingerprints); 0 disables
+    slow_request_log_ms: float = 0.0
+
+    # content envelope: compress-then-encrypt (zstd); first dictionary path compresses new writes
+    content_compression: bool = True
+    content_zstd_level: int = 6
+    content_zstd_dict_paths: str = ""
+    # background re-encryption (envelope upgrade / key rotation); 0 rows/s = unthrottled
+    reencrypt_chunk_size: int = 500
+    reencrypt_rows_per_second: int = 2000
+
+    # background jobs (app.services.jobs); inline = also run right away in the API process
+    jobs_run_inline: bool = True
+    jobs_lease_seconds: int = 120
+    jobs_max_attempts: int = 5
+    jobs_retry_backoff_seconds: float = 2.0  # inline retries: doubled per attempt, capped at half the lease
+
+    # GDPR export files (local file store)
+    export_dir: str = "/var/lib/entre-nous/exports"
+    export_chunk_size: int = 500
+    export_ttl_hours: int = 24
+
+    # right-to-erasure job: rows per short transaction, pause between chunks
+    erasure_chunk_size: int = 500
+    erasure_pause_ms: int = 50
+
+    # retention purge: hard-delete content removed by moderation/erasure once older than this
+    purge_retention_days: int = 30
+    purge_chunk_size: int = 500
+    purge_pause_ms: int = 50
+
+    # bulk NDJSON import (app.services.importer): rows per COPY transaction, preparation processes (0 = cores - 1)
+    import_dir: str = "/var/lib/entre-nous/imports"
+    import_batch_size: int = 5000
+    import_workers: int = 0
+    import_claim_token_days: int = 14  # lifetime of the claim (reset) tokens issued to imported accounts
+
+    # ban-evasion detection (app.services.evasion): session_events are aggregated in windows of this many hours;
+    # IP prefixes shared by more users than evasion_max_users_per_prefix (carrier NAT, campus) are ignored
+    evasion_window_hours: int = 6
+    evasion_lookback_days: int = 30
+    evasion_max_users_per_prefix: int = 20
+    evasion_max_cluster_size: int = 50  # bigger clusters are reported, not queued
+    evasion_min_score: float = 5.0
+
+    # transactional outbox relayed to Redis Streams, and its consumers (app.services.outbox / app.services.eventbus)
+    outbox_relay_batch: int = 500
+    outbox_relay_poll_ms: int = 200
+    outbox_retention_hours: int = 72  # published rows are pruned after this
+    outbox_unpublished_max_hours: int = 168  # unpublished rows (no relay running) are dropped after this, see purge
+    events_stream_maxlen: int = 100000  # approximate cap per stream
+    events_read_batch: int = 100
+    events_block_ms: int = 5000
+    events_retry_idle_ms: int = 30000  # unacked deliveries older than this are retried
+    events_max_deliveries: int = 5  # then dead-lettered to events:dead
+
+    # human review queue: claim lease per reviewer, max items per claim
+    moderation_lease_seconds: int = 300
+    moderation_claim_max: int = 100
 
     @property
     def cors_origins_list(self) -> List[str]:
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import JSONResponse
+
+# Per-request accounting: MetricsMiddleware opens a RequestStats, SQLAlchemy cursor events and
+# ContentCrypto add to it, and the middleware turns it into Server-Timing entries + per-route metrics.
+# Outside a request (jobs, scripts) the contextvar is unset and every hook is a no-op.
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_ms: float = 0.0
+    crypto_ms: float = 0.0
+    crypto_ops: int = 0
+    render_ms: float = 0.0
+    statements: dict[str, list] = field(default_factory=dict)  # fingerprint -> [count, ms, sample]
+
+    def top_statements(self, n: int = 10) -> list[dict]:
+        top = sorted(self.statements.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+        return [{"fingerprint": fp, "count": c, "ms": round(ms, 3), "sql": sample} for fp, (c, ms, sample) in top]
+
+
+_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+    return _stats.get()
+
+
+@contextmanager
+def track_request():
+    stats = RequestStats()
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:\$\d+(?:::\w+)?,?\s*)+\)")
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    # Statements are already parameterized ($n); collapse whitespace and IN-lists so variants group together.
+    norm = _IN_LIST.sub("IN (...)", _WS.sub(" ", statement).strip())
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()[:12], norm[:300]
+
+
+def instrument_engine(engine: Engine) -> None:
+    # Pass engine.sync_engine for async engines.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _stats.get() is not None:
+            conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _stats.get()
+        if stats is None:
+            return
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        ms = (time.perf_counter() - starts.pop()) * 1000.0
+        stats.queries += 1
+        stats.db_ms += ms
+        fp, norm = fingerprint(statement)
+        entry = stats.statements.get(fp)
+        if entry is None:
+            stats.statements[fp] = [1, ms, norm]
+        else:
+            entry[0] += 1
+            entry[1] += ms
+
+
+@contextmanager
+def crypto_span():
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.crypto_ms += (time.perf_counter() - start) * 1000.0
+        stats.crypto_ops += 1
+
+
+def server_timing(stats: RequestStats, total_ms: float) -> str:
+    return ", ".join(
+        [
+            f"app;dur={total_ms:.2f}",
+            f'db;dur={stats.db_ms:.2f};desc="q={stats.queries}"',
+            f'crypto;dur={stats.crypto_ms:.2f};desc="ops={stats.crypto_ops}"',
+            f"render;dur={stats.render_ms:.2f}",
+        ]
+    )
+
+
+class TimedJSONResponse(JSONResponse):
+    # App-wide default response class so JSON encoding shows up as the `render` span.
+    def render(self, content) -> bytes:
+        stats = _stats.get()
+        if stats is None:
+            return super().render(content)
+        start = time.perf_counter()
+        body = super().render(content)
+        stats.render_ms += (time.perf_counter() - start) * 1000.0
+        return body
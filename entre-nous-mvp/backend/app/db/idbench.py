@@ -0,0 +1,69 @@
+"""Insert benchmark: random (uuid4) vs time-ordered (UUIDv7) primary keys.
+
+Inserts the same number of rows into two temporary tables that only differ by
+how the id is generated, then reports insert throughput and the resulting
+primary-key index size / leaf density (pgstatindex when the pgstattuple
+extension is available). Needs a Postgres at ``DATABASE_URL``; nothing is left
+behind.
+
+    python -m app.db.idbench --rows 200000 --batch 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.db.ids import uuid7
+from app.db.session import engine
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+async def bench(kind: str, rows: int, batch: int) -> dict:
+    gen = GENERATORS[kind]
+    table = f"idbench_{kind}"
+    payload = os.urandom(64)  # roughly a short encrypted body
+    insert = text(f"INSERT INTO {table} (id, created_at, body) VALUES (:id, now(), :body)")
+    async with engine.connect() as conn:
+        await conn.execute(text(f"CREATE TEMP TABLE {table} (id uuid PRIMARY KEY, created_at timestamptz NOT NULL, body bytea NOT NULL)"))
+        started = time.perf_counter()
+        for _ in range(0, rows, batch):
+            await conn.execute(insert, [{"id": gen(), "body": payload} for _ in range(batch)])
+        await conn.commit()
+        elapsed = time.perf_counter() - started
+        size = (await conn.execute(text(f"SELECT pg_relation_size('{table}_pkey')"))).scalar_one()
+        out = {"kind": kind, "rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed), "pk_index_bytes": size}
+        try:
+            stat = (await conn.execute(text(f"SELECT avg_leaf_density, leaf_fragmentation FROM pgstatindex('{table}_pkey')"))).one()
+            out["avg_leaf_density"], out["leaf_fragmentation"] = float(stat[0]), float(stat[1])
+        except Exception:
+            await conn.rollback()  # pgstattuple not installed
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.commit()
+    return out
+
+
+async def run(rows: int, batch: int) -> list[dict]:
+    results = [await bench(kind, rows, batch) for kind in GENERATORS]
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="uuid4 vs UUIDv7 primary-key insert benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    for r in asyncio.run(run(args.rows, args.batch)):
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
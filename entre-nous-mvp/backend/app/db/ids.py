@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Time-ordered primary keys (UUIDv7, RFC 9562): 48-bit Unix milliseconds, version 7, 12-bit sequence, variant,
+# 62 random bits. New rows land at the right edge of the PK B-tree instead of on random leaf pages, and ids
+# sort by creation time, so keyset pagination can use the id alone.
+# The 12-bit field is a per-process counter within one millisecond (seeded randomly), so ids generated by this
+# process are strictly increasing; across processes they are ordered to the millisecond.
+
+_lock = threading.Lock()
+_last_ms = 0
+_seq = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _seq
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _seq = int.from_bytes(os.urandom(2), "big") & 0x7FF  # leave headroom before the counter wraps
+        else:
+            _seq += 1
+            if _seq > 0xFFF:
+                # counter exhausted (or clock went backwards): borrow the next millisecond
+                _last_ms += 1
+                _seq = 0
+        ms, seq = _last_ms, _seq
+    rand = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (seq << 64) | (0b10 << 62) | rand)
+
+
+def uuid7_floor(ts: datetime) -> uuid.UUID:
+    """Smallest UUIDv7 for the millisecond of `ts` (a `WHERE id >= ...` bound for time ranges)."""
+    ms = int(ts.timestamp() * 1000)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (0b10 << 62))
+
+
+def uuid7_time(u: uuid.UUID) -> datetime | None:
+    """Creation time encoded in a UUIDv7; None for other versions (e.g. rows created before the switch)."""
+    if u.version != 7:
+        return None
+    return datetime.fromtimestamp((u.int >> 80) / 1000, tz=timezone.utc)
+
+
+def uuid7_derived(ts: datetime, key: str) -> uuid.UUID:
+    """Deterministic UUIDv7 for the millisecond of `ts`: the other 74 bits are a hash of `key` (idempotent imports)."""
+    ms = int(ts.timestamp() * 1000)
+    h = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:10], "big")
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | ((h >> 62) & 0xFFF) << 64 | (0b10 << 62) | (h & 0x3FFF_FFFF_FFFF_FFFF))
@@ -0,0 +1,135 @@
+"""Query-plan regression check for the hot read paths.
+
+Runs EXPLAIN against a local Postgres (``DATABASE_URL``, migrated to head) and
+exits non-zero when a hot query plans a Seq Scan or an explicit Sort on one of
+its hot tables. Seq scans and sorts are disabled for the session so that the
+planner only falls back to them when no usable index exists, which keeps the
+check meaningful on small dev/CI tables.
+
+    python -m app.db.plans
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.session import engine
+
+
+@dataclass
+class HotQuery:
+    name: str
+    sql: str
+    params: dict
+    tables: tuple[str, ...]
+
+
+_ANY_ID = uuid.UUID(int=0)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_FAR_FUTURE = datetime(9999, 1, 1, tzinfo=timezone.utc)
+
+# Keep these in sync with the handlers in app/api (feed, replies, DM page, DM membership).
+HOT_QUERIES: list[HotQuery] = [
+    HotQuery(
+        name="feed",
+        sql=(
+            "SELECT posts.id, posts.body_ciphertext, posts.body_nonce, posts.created_at, posts.flags_count, posts.reply_count, "
+            "posts.last_reply_at, users.trust_score, top.body_ciphertext, top.body_nonce, top.kindness_votes "
+            "FROM posts JOIN users ON users.id = posts.author_id "
+            "LEFT OUTER JOIN replies AS top ON top.id = posts.top_reply_id AND top.status = 'visible' "
+            "WHERE posts.status = 'visible' AND users.deleted_at IS NULL AND users.is_banned IS false "
+            "ORDER BY posts.created_at DESC LIMIT 100"
+        ),
+        params={},
+        tables=("posts", "replies"),
+    ),
+    HotQuery(
+        name="replies",
+        sql=(
+            "SELECT id, post_id, body_ciphertext, body_nonce, created_at, flags_count, kindness_votes "
+            "FROM replies WHERE post_id = :post_id AND status = 'visible' AND (created_at, id) > (:after_created_at, :after) "
+            "ORDER BY created_at ASC, id ASC LIMIT 200"
+        ),
+        params={"post_id": _ANY_ID, "after_created_at": _EPOCH, "after": _ANY_ID},
+        tables=("replies",),
+    ),
+    HotQuery(
+        name="dm_messages",
+        sql=(
+            "SELECT id, author_id, body_ciphertext, body_nonce, created_at "
+            "FROM dm_messages WHERE conversation_id = :conversation_id AND status = 'visible' "
+            "AND (created_at, id) < (:before_created_at, :before) ORDER BY created_at DESC, id DESC LIMIT 200"
+        ),
+        params={"conversation_id": _ANY_ID, "before_created_at": _FAR_FUTURE, "before": uuid.UUID(int=2**128 - 1)},
+        tables=("dm_messages",),
+    ),
+    HotQuery(
+        name="dm_membership",
+        sql=(
+            "SELECT id FROM conversation_participants "
+            "WHERE conversation_id = :conversation_id AND user_id = :user_id"
+        ),
+        params={"conversation_id": _ANY_ID, "user_id": _ANY_ID},
+        tables=("conversation_participants",),
+    ),
+]
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []) or []:
+        yield from _walk(child)
+
+
+def plan_problems(plan: dict, tables: tuple[str, ...]) -> list[str]:
+    """Return human-readable problems found in an EXPLAIN (FORMAT JSON) plan."""
+    problems: list[str] = []
+    for node in _walk(plan["Plan"]):
+        kind = node.get("Node Type")
+        if kind == "Seq Scan" and node.get("Relation Name") in tables:
+            problems.append(f"seq scan on {node['Relation Name']}")
+        elif kind in ("Sort", "Incremental Sort"):
+            problems.append(f"{kind.lower()} on {', '.join(node.get('Sort Key', []))}")
+    return problems
+
+
+async def explain(conn: AsyncConnection, q: HotQuery) -> dict:
+    res = await conn.execute(text("EXPLAIN (FORMAT JSON) " + q.sql), q.params)
+    raw = res.scalar_one()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]
+
+
+async def check_all(queries: list[HotQuery] = HOT_QUERIES) -> dict[str, list[str]]:
+    out: dict[str, list[str]] = {}
+    async with engine.connect() as conn:
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+        await conn.execute(text("SET LOCAL enable_sort = off"))
+        for q in queries:
+            out[q.name] = plan_problems(await explain(conn, q), q.tables)
+        await conn.rollback()
+    await engine.dispose()
+    return out
+
+
+def main() -> int:
+    results = asyncio.run(check_all())
+    failed = 0
+    for name, problems in results.items():
+        if problems:
+            failed += 1
+            print(f"FAIL {name}: {'; '.join(problems)}")
+        else:
+            print(f"ok   {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,116 @@
 from __future__ import annotations
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.admission import admission
 from app.core.settings import settings
+from app.core.timing import instrument_engine
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Reports how long each checkout waited (queueing for a free connection, or opening an overflow one)
+    # to admission control.
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            admission.observe_pool_wait((time.perf_counter() - start) * 1000.0)
+
 
-engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+def _make_engine(url: str) -> AsyncEngine:
+    eng = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        connect_args={
+            "statement_cache_size": settings.db_statement_cache_size,
+            "command_timeout": settings.db_command_timeout_seconds,
+        },
+    )
+    instrument_engine(eng.sync_engine)
+    return eng
+
+
+engine = _make_engine(settings.database_url)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+read_engine = _make_engine(settings.database_replica_url) if settings.database_replica_url else None
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession) if read_engine else None
+
+# 0 when the replica has replayed everything it received (idle primary), else seconds since last replayed commit.
+_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaHealth:
+    """Cached replication-lag probe; reads go to the primary while the replica is lagging or unreachable."""
+
+    def __init__(self) -> None:
+        self.checked_at = 0.0
+        self.lag_seconds: float | None = None
+        self.healthy = False
+
+    async def usable(self) -> bool:
+        if read_engine is None:
+            return False
+        now = time.monotonic()
+        if now - self.checked_at < settings.db_replica_check_interval_seconds:
+            return self.healthy
+        self.checked_at = now
+        try:
+            async with read_engine.connect() as conn:
+                self.lag_seconds = float((await conn.execute(_LAG_SQL)).scalar() or 0.0)
+            self.healthy = self.lag_seconds <= settings.db_replica_max_lag_seconds
+        except Exception:
+            self.lag_seconds = None
+            self.healthy = False
+        return self.healthy
+
+
+replica_health = ReplicaHealth()
+
+
+async def warm_pool(eng: AsyncEngine, n: int) -> int:
+    # Open n connections at once (connect + auth + first round trip) so they sit in the pool before traffic.
+    async def one() -> None:
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(0.05)  # hold it so the others cannot reuse it and really open n
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    return eng.pool.checkedin()
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
+
+
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def read_session_factory() -> async_sessionmaker:
+    # Replica when configured and fresh enough, primary otherwise.
+    if ReadSessionLocal is not None and await replica_health.usable():
+        return ReadSessionLocal
+    return AsyncSessionLocal
+
+
+async def get_read_db() -> AsyncSession:
+    factory = await read_session_factory()
+    async with factory() as session:
+        yield session
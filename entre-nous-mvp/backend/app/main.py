@@ -1,48 +1,69 @@
 from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from starlette.responses import JSONResponse
-from starlette.requests import Request
-
-from app.core.settings import settings
-from app.core.logging import configure_logging, log
-from app.core.middleware import SecurityHeadersMiddleware, IPBanMiddleware, MetricsMiddleware
-from app.api import auth, posts, feed, moderation, gdpr, admin, dm
-
-configure_logging()
-
-# IMPORTANT: for anonymity, avoid persisting IPs. Rate-limit uses remote address in-memory/redis only.
-limiter = Limiter(key_func=get_remote_address)
-
-app = FastAPI(title="Entre Nous MVP API", version="0.1.0")
-app.state.limiter = limiter
-
-@app.exception_handler(RateLimitExceeded)
-async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    return JSONResponse({"detail": "rate limit exceeded"}, status_code=429)
-
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(IPBanMiddleware)
-app.add_middleware(MetricsMiddleware)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins_list,
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router)
-app.include_router(posts.router)
-app.include_router(feed.router)
-app.include_router(moderation.router)
-app.include_router(gdpr.router)
-app.include_router(admin.router)
-app.include_router(dm.router)
-
-@app.get("/health")
-async def health():
-    return {"ok": True}
+
+# Importing this module is cheap: the app (routers, models, crypto, engine) is only built by create_app().
+# `uvicorn app.main:app` still works through the module __getattr__ below; `uvicorn --factory app.main:create_app`
+# skips the module-level instance altogether.
+
+
+def create_app() -> FastAPI:
+    from app.core.settings import settings
+    from app.core.logging import configure_logging
+    from app.core.lifecycle import Readiness, lifespan
+    from app.core.middleware import SecurityHeadersMiddleware, IPBanMiddleware, MetricsMiddleware, ClientContextMiddleware, CompressionMiddleware, AdmissionControlMiddleware
+    from app.core.timing import TimedJSONResponse
+    from app.api import auth, posts, feed, moderation, gdpr, admin, dm, search
+
+    configure_logging()
+
+    app = FastAPI(title="Entre Nous MVP API", version="0.1.0", default_response_class=TimedJSONResponse, lifespan=lifespan)
+    app.state.readiness = Readiness()
+
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(IPBanMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(ClientContextMiddleware)
+    app.add_middleware(CompressionMiddleware)  # sees the final headers (Server-Timing) of everything inside it
+    app.add_middleware(AdmissionControlMiddleware)  # outermost app middleware: shed before any Redis/DB work
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins_list,
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.include_router(auth.router)
+    app.include_router(posts.router)
+    app.include_router(feed.router)
+    app.include_router(moderation.router)
+    app.include_router(gdpr.router)
+    app.include_router(admin.router)
+    app.include_router(dm.router)
+    app.include_router(search.router)
+
+    @app.get("/health")
+    async def health():
+        # liveness: the process is up and serving; says nothing about dependencies
+        return {"ok": True}
+
+    @app.get("/ready")
+    async def ready():
+        # readiness: warm-up finished, not shutting down, not shedding normal traffic
+        snap = app.state.readiness.snapshot()
+        return TimedJSONResponse(snap, status_code=200 if snap["ready"] else 503)
+
+    return app
+
+
+_app: FastAPI | None = None
+
+
+def __getattr__(name: str):
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(name)
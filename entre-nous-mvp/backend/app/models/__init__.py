@@ -1,6 +1,10 @@
 from .user import User
 from .post import Post
 from .reply import Reply
-from .moderation import ModerationFlag, ModerationQueueItem, IpBan
-from .session import SessionEvent
+from .moderation import ModerationFlag, FlagAggregate, ModerationQueueItem, IpBan
+from .session import SessionEvent, IpUserEdge
 from .dm import Conversation, ConversationParticipant, DMMessage
+from .job import Job
+from .search import SearchToken
+from .outbox import OutboxEvent
+from .importref import ImportRef
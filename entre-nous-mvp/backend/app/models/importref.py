@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class ImportRef(Base):
+    # External id (per import source) -> our id, so imported replies and posts can point at parents by their
+    # source-platform reference (app.services.importer).
+    __tablename__ = "import_refs"
+    source: Mapped[str] = mapped_column(String(64), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(8), primary_key=True)  # user|post|reply
+    ref: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import DateTime, String, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+from app.db.ids import uuid7
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # export|erasure|...
+    user_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")  # queued|running|done|failed
+    params: Mapped[dict] = mapped_column(JSONB(), nullable=False, default=dict)
+    progress: Mapped[dict] = mapped_column(JSONB(), nullable=False, default=dict)
+    checkpoint: Mapped[dict] = mapped_column(JSONB(), nullable=False, default=dict)  # resume cursor, handler-defined
+    result_path: Mapped[str | None] = mapped_column(String(300), nullable=True)
+    error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    started_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
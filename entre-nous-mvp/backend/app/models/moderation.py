@@ -2,13 +2,14 @@ from __future__ import annotations
 import uuid
 import sqlalchemy as sa
 from sqlalchemy import String, DateTime, Integer
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
+from app.db.ids import uuid7
 
 class ModerationFlag(Base):
     __tablename__ = "moderation_flags"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     reporter_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
     target_type: Mapped[str] = mapped_column(String(16), nullable=False)  # post|reply
     target_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
@@ -16,9 +17,22 @@ class ModerationFlag(Base):
     details: Mapped[str | None] = mapped_column(String(500), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
 
+class FlagAggregate(Base):
+    # per flagged target, maintained with each flag (app.services.flags); feeds the admin triage view
+    __tablename__ = "flag_aggregates"
+    target_type: Mapped[str] = mapped_column(String(16), primary_key=True)  # post|reply|dm
+    target_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    flags: Mapped[int] = mapped_column(Integer(), nullable=False)
+    reporters: Mapped[int] = mapped_column(Integer(), nullable=False)  # distinct
+    reasons: Mapped[dict] = mapped_column(JSONB(), nullable=False)  # reason -> flags
+    severity: Mapped[float] = mapped_column(sa.Float(), nullable=False)  # sum of reason weights, first flag per reporter
+    first_flag_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_flag_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    resolved_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # reviewed; reopened by a new flag
+
 class ModerationQueueItem(Base):
     __tablename__ = "moderation_queue"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     target_type: Mapped[str] = mapped_column(String(16), nullable=False)
     target_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     priority: Mapped[int] = mapped_column(Integer(), nullable=False, default=5)
@@ -26,10 +40,12 @@ class ModerationQueueItem(Base):
     notes: Mapped[str | None] = mapped_column(String(500), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
     decided_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    claimed_by: Mapped[str | None] = mapped_column(String(64), nullable=True)  # reviewer holding the lease
+    lease_expires_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
 class IpBan(Base):
     __tablename__ = "ip_bans"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     ip_lookup_hmac: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
     ip_ciphertext: Mapped[bytes] = mapped_column(sa.LargeBinary(), nullable=False)
     ip_nonce: Mapped[bytes] = mapped_column(sa.LargeBinary(), nullable=False)
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+from app.db.ids import uuid7
+
+class OutboxEvent(Base):
+    # Written in the transaction of the change it describes; relayed to Redis Streams (app.services.outbox).
+    # Payloads carry ids and small facts only, never content or network metadata.
+    __tablename__ = "outbox_events"
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    event_type: Mapped[str] = mapped_column(String(48), nullable=False)  # post.created|reply.created|reply.voted|...
+    aggregate_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB(), nullable=False, default=dict)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    published_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
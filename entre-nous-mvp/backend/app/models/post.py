@@ -4,10 +4,11 @@ from sqlalchemy import String, DateTime, ForeignKey, Float, Integer, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
+from app.db.ids import uuid7
 
 class Post(Base):
     __tablename__ = "posts"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     author_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     body_ciphertext: Mapped[bytes] = mapped_column(LargeBinary(), nullable=False)
@@ -15,5 +16,12 @@ class Post(Base):
 
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="visible")  # visible|hidden|removed
+    removed_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # start of the purge window
     toxicity_score: Mapped[float | None] = mapped_column(Float(), nullable=True)
     flags_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+
+    # thread summary over visible replies, maintained by app.services.threads
+    reply_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    last_reply_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    top_reply_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    top_reply_votes: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
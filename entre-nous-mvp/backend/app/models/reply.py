@@ -4,10 +4,11 @@ from sqlalchemy import String, DateTime, ForeignKey, Float, Integer, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
+from app.db.ids import uuid7
 
 class Reply(Base):
     __tablename__ = "replies"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     post_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
     author_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
@@ -16,6 +17,7 @@ class Reply(Base):
 
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="visible")
+    removed_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # start of the purge window
     toxicity_score: Mapped[float | None] = mapped_column(Float(), nullable=True)
     flags_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
     kindness_votes: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class SearchToken(Base):
+    # Blind inverted index: one row per (keyed token hash, content item). No plaintext is stored.
+    __tablename__ = "search_tokens"
+    token_hmac: Mapped[str] = mapped_column(String(32), primary_key=True)
+    target_type: Mapped[str] = mapped_column(String(16), primary_key=True)  # post|reply
+    target_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
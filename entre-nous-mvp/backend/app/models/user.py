@@ -4,10 +4,11 @@ from sqlalchemy import String, DateTime, Boolean, Float, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
+from app.db.ids import uuid7
 
 class User(Base):
     __tablename__ = "users"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     password_hash: Mapped[str] = mapped_column(String(256), nullable=False)
     email_lookup_hmac: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
     email_ciphertext: Mapped[bytes] = mapped_column(LargeBinary(), nullable=False)
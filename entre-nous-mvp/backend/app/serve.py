@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+from app.core.logging import configure_logging, log
+from app.core.process import available_cores
+from app.core.settings import settings
+
+# Production server: python -m app.serve [--workers N] [--port 8000]
+# A gunicorn master supervises N uvicorn workers (uvloop + httptools) sharing one listening socket.
+# - The app is imported and built once in the master (preload) and forked, so workers start fast and share the
+#   imported code pages; nothing opens a connection before the fork (engines and Redis clients are lazy), and
+#   each worker warms its own pools in the lifespan.
+# - SIGTERM drains: workers stop accepting, finish in-flight requests and run the lifespan shutdown, within the
+#   graceful timeout.
+# - Workers are recycled after SERVE_MAX_REQUESTS (+ jitter, so they do not all restart at once).
+# - Each worker has a stable slot (WORKER_SLOT) for per-worker metrics and logs (app.core.process).
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def pre_fork(server, worker) -> None:
+    # master side: lowest slot not held by a live worker (a replacement inherits the slot of the one it replaces)
+    used = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+    worker.slot = next(i for i in range(len(used) + 1) if i not in used)
+
+
+def post_fork(server, worker) -> None:
+    os.environ["WORKER_SLOT"] = str(worker.slot)
+    # never share pooled sockets with the master or siblings (nothing should be pooled yet; this makes sure)
+    from app.core import redis as redis_mod
+    from app.db.session import engine, read_engine
+
+    redis_mod._client = None
+    redis_mod._async_client = None
+    for eng in (engine, read_engine):
+        if eng is not None:
+            eng.sync_engine.dispose(close=False)
+
+
+def worker_exit(server, worker) -> None:
+    log.info("worker_exit", slot=getattr(worker, "slot", None), pid=worker.pid)
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import create_app
+
+        return create_app()
+
+
+def options(workers: int, bind: str, preload: bool) -> dict:
+    return {
+        "bind": bind,
+        "workers": workers,
+        "worker_class": "app.serve.Worker",
+        "preload_app": preload,
+        "max_requests": settings.serve_max_requests,
+        "max_requests_jitter": settings.serve_max_requests_jitter if settings.serve_max_requests else 0,
+        "graceful_timeout": settings.serve_graceful_timeout_seconds,
+        "keepalive": settings.serve_keepalive_seconds,
+        "backlog": settings.serve_backlog,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "accesslog": None,  # MetricsMiddleware + slow request log instead of one line per request
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entre Nous API server (gunicorn + uvicorn workers)")
+    parser.add_argument("--workers", type=int, default=settings.serve_workers, help="0 = one per available core")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--no-preload", action="store_true", help="import the app in each worker instead")
+    args = parser.parse_args()
+    os.environ["WORKER_SLOT"] = "master"  # post_fork sets the real slot in each worker
+    configure_logging()
+
+    workers = args.workers or available_cores()
+    per_worker = settings.db_pool_size + settings.db_max_overflow
+    log.info("serve_start", workers=workers, bind=f"{args.host}:{args.port}", preload=not args.no_preload, max_db_connections=workers * per_worker)
+    Server(options(workers, f"{args.host}:{args.port}", not args.no_preload)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,23 @@
 from __future__ import annotations
+import hashlib
 from datetime import datetime, timedelta, timezone
-from jose import jwt
+from jose import JWTError, jwt
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
 from app.core.settings import settings
 
 ph = PasswordHasher()
 
+# Accounts created by the bulk importer have no password until they claim the account with a reset token.
+UNUSABLE_PASSWORD = "!imported"
+
 def hash_password(password: str) -> str:
     return ph.hash(password)
 
 def verify_password(password: str, password_hash: str) -> bool:
     try:
         return ph.verify(password_hash, password)
-    except VerifyMismatchError:
+    except (VerifyMismatchError, InvalidHashError):
         return False
 
 def create_access_token(sub: str) -> str:
@@ -27,4 +31,30 @@ def create_access_token(sub: str) -> str:
     return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
 
 def decode_token(token: str) -> dict:
-    return jwt.decode(token, settings.jwt_secret, algorithms=["HS256"], issuer=settings.jwt_issuer)
+    payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"], issuer=settings.jwt_issuer)
+    if "purpose" in payload:
+        raise JWTError("not an access token")
+    return payload
+
+# Reset tokens are single use without server state: they carry a fingerprint of the password hash they were
+# issued against, and setting a password (new salt, new hash) invalidates them.
+def password_fingerprint(password_hash: str) -> str:
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:32]
+
+def create_reset_token(sub: str, password_hash: str, ttl: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    payload = {
+        "iss": settings.jwt_issuer,
+        "sub": sub,
+        "purpose": "reset",
+        "pwh": password_fingerprint(password_hash),
+        "iat": int(now.timestamp()),
+        "exp": int((now + ttl).timestamp()),
+    }
+    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+
+def decode_reset_token(token: str) -> dict:
+    payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"], issuer=settings.jwt_issuer)
+    if payload.get("purpose") != "reset":
+        raise JWTError("not a reset token")
+    return payload
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import base64
+from typing import Any, Awaitable, Callable, Iterable
+from uuid import UUID
+
+import orjson
+
+from app.core.logging import log
+from app.core.redis import get_async_redis, get_redis
+from app.core.settings import settings
+from app.services.crypto import crypto
+
+# Versioned cache keys: readers embed the current version in their cache key, writers bump it.
+# Bumping is O(1) per post regardless of how many cached pages exist for it.
+
+FEED_VERSION_KEY = "cache:v:feed"
+
+
+def replies_version_key(post_id: UUID | str) -> str:
+    return f"cache:v:replies:{post_id}"
+
+
+def invalidate_feed() -> None:
+    try:
+        get_redis().incr(FEED_VERSION_KEY)
+    except Exception:
+        # caches are best-effort; a stale entry expires on its own TTL
+        pass
+
+
+def invalidate_posts(post_ids: Iterable[UUID | str]) -> None:
+    keys = [replies_version_key(p) for p in set(post_ids)]
+    if not keys:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for k in keys:
+            pipe.incr(k)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+# Decrypted reply pages, per post and cursor, under the post's replies version. The page is stored sealed with
+# the content key (one envelope for the whole page, compressed), so Redis never holds plaintext bodies and a hit
+# costs one decrypt instead of one per reply. Version lookup and page fetch are a single round trip.
+REPLY_PAGE_LUA = """
+local v = redis.call('GET', KEYS[1]) or '0'
+return {v, redis.call('GET', ARGV[1] .. v .. ':' .. ARGV[2]) or false}
+"""
+
+_reply_page_script = None
+
+
+def reply_page_key(post_id: UUID | str, version: str, after: UUID | str | None) -> str:
+    return f"cache:replies:{post_id}:{version}:{after or ''}"
+
+
+async def cached_reply_page(post_id: UUID, after: UUID | None, load: Callable[[], Awaitable[list[dict[str, Any]]]]) -> list[dict[str, Any]]:
+    global _reply_page_script
+    r = get_async_redis()
+    try:
+        if _reply_page_script is None:
+            _reply_page_script = r.register_script(REPLY_PAGE_LUA)
+        version, hit = await _reply_page_script(keys=[replies_version_key(post_id)], args=[f"cache:replies:{post_id}:", after or ""])
+    except Exception as e:
+        # caches are best-effort: serve from the database
+        log.warning("reply_cache_unavailable", error=type(e).__name__)
+        return await load()
+    if hit:
+        try:
+            return orjson.loads(crypto.decrypt_text(base64.b64decode(hit)))
+        except Exception as e:
+            # corrupt, or sealed under a key since rotated out: a miss; drop it (the refill below overwrites it too)
+            log.warning("reply_cache_bad_entry", error=type(e).__name__)
+            try:
+                await r.delete(reply_page_key(post_id, version, after))
+            except Exception:
+                pass
+    page = await load()
+    try:
+        ct, _ = crypto.encrypt_text(orjson.dumps(page).decode("utf-8"))
+        await r.set(reply_page_key(post_id, version, after), base64.b64encode(ct).decode("ascii"), ex=settings.replies_cache_ttl_seconds)
+    except Exception:
+        pass
+    return page
@@ -3,41 +3,93 @@ from __future__ import annotations
 import base64
 import hmac
 import hashlib
+import ipaddress
 from nacl.secret import SecretBox
 from nacl.utils import random as nacl_random
 
 from app.core.settings import settings
+from app.core.timing import crypto_span
+from app.services.envelope import ContentCodec, ENVELOPE_V1, ENVELOPE_V2
+
+# Stored layouts:
+#   legacy: ciphertext column = SecretBox(raw UTF-8), nonce in its own *_nonce column
+#   v1:     ciphertext column = [0x01][codec][nonce][box], *_nonce column left empty (b"")
+#   v2:     ciphertext column = [0x02][key id][codec][nonce][box], *_nonce column left empty (b"")
+# legacy and v1 rows were all written with key id 0 (CONTENT_ENC_KEY_B64). decrypt_text() reads every layout
+# and picks the key straight from the header; encrypt_text() always writes v2 with the active key.
+
+LEGACY_KID = 0
+
+
+def _load_key(b64: str, name: str) -> SecretBox:
+    key = base64.b64decode(b64)
+    if len(key) != SecretBox.KEY_SIZE:
+        raise ValueError(f"{name} must decode to 32 bytes")
+    return SecretBox(key)
+
+
+def load_keyring() -> dict[int, SecretBox]:
+    # CONTENT_ENC_KEYS = "1:<base64>,2:<base64>" (ids 1..255); id 0 is always CONTENT_ENC_KEY_B64.
+    ring = {LEGACY_KID: _load_key(settings.content_enc_key_b64, "CONTENT_ENC_KEY_B64")}
+    for entry in (e.strip() for e in settings.content_enc_keys.split(",") if e.strip()):
+        kid, _, b64 = entry.partition(":")
+        if not kid.isdigit() or not 1 <= int(kid) <= 255:
+            raise ValueError("CONTENT_ENC_KEYS ids must be integers in 1..255")
+        ring[int(kid)] = _load_key(b64, f"CONTENT_ENC_KEYS[{kid}]")
+    return ring
 
 
 class ContentCrypto:
     def __init__(self) -> None:
-        key = base64.b64decode(settings.content_enc_key_b64)
-        if len(key) != SecretBox.KEY_SIZE:
-            raise ValueError("CONTENT_ENC_KEY_B64 must decode to 32 bytes")
-        self.box = SecretBox(key)
+        self.boxes = load_keyring()
+        if settings.content_enc_active_kid not in self.boxes:
+            raise ValueError("CONTENT_ENC_ACTIVE_KID must be one of the configured key ids")
+        self.active_kid = settings.content_enc_active_kid
+        self.box = self.boxes[self.active_kid]
+        self.codec = ContentCodec()
 
     def encrypt_text(self, text: str) -> tuple[bytes, bytes]:
-        nonce = nacl_random(SecretBox.NONCE_SIZE)
-        ct = self.box.encrypt(text.encode("utf-8"), nonce).ciphertext
-        return ct, nonce
+        # Returns (envelope, b"") so callers keep filling the (now vestigial) nonce column.
+        with crypto_span():
+            codec, payload = self.codec.compress(text.encode("utf-8"))
+            nonce = nacl_random(SecretBox.NONCE_SIZE)
+            ct = self.box.encrypt(payload, nonce).ciphertext
+        return bytes((ENVELOPE_V2, self.active_kid, codec)) + nonce + ct, b""
 
-    def decrypt_text(self, ciphertext: bytes, nonce: bytes) -> str:
-        pt = self.box.decrypt(ciphertext, nonce)
-        return pt.decode("utf-8")
+    def decrypt_text(self, ciphertext: bytes, nonce: bytes | None = None) -> str:
+        with crypto_span():
+            if nonce:
+                return self.boxes[LEGACY_KID].decrypt(ciphertext, nonce).decode("utf-8")
+            version = ciphertext[0]
+            if version == ENVELOPE_V2:
+                kid, codec, off = ciphertext[1], ciphertext[2], 3
+            elif version == ENVELOPE_V1:
+                kid, codec, off = LEGACY_KID, ciphertext[1], 2
+            else:
+                raise ValueError(f"unknown envelope version {version}")
+            box = self.boxes.get(kid)
+            if box is None:
+                raise ValueError(f"content key {kid} is not configured")
+            n = SecretBox.NONCE_SIZE
+            payload = box.decrypt(ciphertext[off + n:], ciphertext[off:off + n])
+            return self.codec.decompress(codec, payload).decode("utf-8")
 
     def _ip_prefix(self, ip: str) -> str:
         # Privacy-friendly ban key: IPv4 /24 or IPv6 /64 prefix.
+        # Rendered as "a.b.c" / "h1:h2:h3:h4" (first hextets, no zero padding) to keep existing ban HMACs valid.
         ip = (ip or "").strip()
         if not ip:
             return ""
-        if ":" in ip:  # IPv6 (rough /64)
-            parts = ip.split(":")
-            return ":".join(parts[:4])
-        # IPv4 (/24)
-        parts = ip.split(".")
-        if len(parts) == 4:
-            return ".".join(parts[:3])
-        return ip
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return ip
+        if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped is not None:
+            addr = addr.ipv4_mapped
+        if isinstance(addr, ipaddress.IPv4Address):
+            return ".".join(str(b) for b in addr.packed[:3])
+        net = int(addr) >> 64
+        return ":".join(format((net >> shift) & 0xFFFF, "x") for shift in (48, 32, 16, 0))
 
     def ip_lookup(self, ip: str) -> str:
         prefix = self._ip_prefix(ip).encode("utf-8")
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+from pathlib import Path
+
+import zstandard
+
+from app.core.settings import settings
+
+# Plaintext codec for the versioned content envelope (see ContentCrypto for the full layouts):
+#   v1 = [0x01][codec][24-byte nonce][SecretBox(codec(plaintext))]
+#   v2 = [0x02][key id][codec][24-byte nonce][SecretBox(codec(plaintext))]
+# codec 0 = raw UTF-8, 1 = zstd (frame carries the dictionary id when a trained dictionary was used).
+# Compression happens before encryption (ciphertext does not compress) and is skipped when it does not pay.
+
+ENVELOPE_V1 = 1
+ENVELOPE_V2 = 2
+CODEC_RAW = 0
+CODEC_ZSTD = 1
+
+MIN_COMPRESS_BYTES = 32
+
+
+class ContentCodec:
+    def __init__(self) -> None:
+        self.level = settings.content_zstd_level
+        self.enabled = settings.content_compression
+        self.dicts: dict[int, zstandard.ZstdCompressionDict] = {}
+        self.current: zstandard.ZstdCompressionDict | None = None
+        for i, p in enumerate(x.strip() for x in settings.content_zstd_dict_paths.split(",") if x.strip()):
+            d = zstandard.ZstdCompressionDict(Path(p).read_bytes())
+            self.dicts[d.dict_id()] = d
+            if i == 0:
+                self.current = d  # first listed dictionary compresses new writes; the others only decompress
+        # zstd contexts are not thread-safe and chunks are decrypted in worker threads (export, re-encryption)
+        self._local = threading.local()
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        c = getattr(self._local, "cctx", None)
+        if c is None:
+            c = self._local.cctx = zstandard.ZstdCompressor(level=self.level, dict_data=self.current)
+        return c
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        cache = getattr(self._local, "dctx", None)
+        if cache is None:
+            cache = self._local.dctx = {}
+        d = cache.get(dict_id)
+        if d is None:
+            if dict_id and dict_id not in self.dicts:
+                raise ValueError(f"zstd dictionary {dict_id} is not configured")
+            d = cache[dict_id] = zstandard.ZstdDecompressor(dict_data=self.dicts.get(dict_id))
+        return d
+
+    def compress(self, raw: bytes) -> tuple[int, bytes]:
+        if not self.enabled or len(raw) < MIN_COMPRESS_BYTES:
+            return CODEC_RAW, raw
+        packed = self._compressor().compress(raw)
+        if len(packed) >= len(raw):
+            return CODEC_RAW, raw
+        return CODEC_ZSTD, packed
+
+    def decompress(self, codec: int, data: bytes) -> bytes:
+        if codec == CODEC_RAW:
+            return data
+        if codec == CODEC_ZSTD:
+            dict_id = zstandard.get_frame_parameters(data).dict_id
+            return self._decompressor(dict_id).decompress(data)
+        raise ValueError(f"unknown content codec {codec}")
+
+
+async def _sample_bodies(limit: int) -> list[bytes]:
+    from sqlalchemy import select
+    from app.db.session import AsyncSessionLocal
+    from app.models import Post, Reply, DMMessage
+    from app.services.crypto import crypto
+
+    samples: list[bytes] = []
+    async with AsyncSessionLocal() as db:
+        for model in (Post, Reply, DMMessage):
+            q = select(model.body_ciphertext, model.body_nonce).order_by(model.created_at.desc()).limit(limit // 3)
+            for ct, nonce in (await db.execute(q)).all():
+                samples.append(crypto.decrypt_text(ct, nonce).encode("utf-8"))
+    return samples
+
+
+def main() -> None:
+    # python -m app.services.envelope train-dict --out /secrets/content-v1.zdict
+    # The dictionary is derived from plaintext: store it like a key (secret manager / restricted volume).
+    parser = argparse.ArgumentParser(description="content envelope tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("train-dict", help="train a zstd dictionary from recent posts, replies and DMs")
+    t.add_argument("--out", required=True)
+    t.add_argument("--samples", type=int, default=30000)
+    t.add_argument("--size", type=int, default=64 * 1024, help="dictionary size in bytes")
+    args = parser.parse_args()
+    samples = asyncio.run(_sample_bodies(args.samples))
+    d = zstandard.train_dictionary(args.size, samples)
+    Path(args.out).write_bytes(d.as_bytes())
+    print(f"trained dictionary id={d.dict_id()} size={len(d.as_bytes())} from {len(samples)} samples -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
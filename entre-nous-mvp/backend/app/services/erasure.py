@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy import func, select, update, delete
+from sqlalchemy.sql import Executable
+
+from app.core.settings import settings
+from app.db.session import AsyncSessionLocal
+from app.models import Job, User, Post, Reply, DMMessage, SessionEvent, IpUserEdge, ConversationParticipant, ModerationFlag
+from app.services.cache import invalidate_feed, invalidate_posts
+from app.services.jobs import JobContext, job_handler
+from app.services.outbox import emit
+from app.services.search import deindex
+from app.services.threads import refresh_summaries
+
+# Right-to-erasure pipeline. DELETE /me only marks the user deleted (which already drops their posts from the
+# feed) and enqueues this job; the job then walks every table referencing the user in bounded chunks, one
+# short transaction per chunk. Each step's predicate only matches rows not yet processed, so a crashed
+# job simply resumes from its checkpointed step.
+
+
+def _ids(model, *where, n: int):
+    return select(model.id).where(*where).limit(n).scalar_subquery()
+
+
+# (step, statement builder, content type) -- for post/reply steps RETURNING is (id, post_id), used to drop the
+# items from the search index in the same transaction and to invalidate the affected threads' caches.
+STEPS: list[tuple[str, Callable[[UUID, int], Executable], str | None]] = [
+    ("posts", lambda uid, n: update(Post).where(Post.id.in_(_ids(Post, Post.author_id == uid, Post.status != "removed", n=n))).values(status="removed", removed_at=func.now()).returning(Post.id, Post.id.label("post_id")), "post"),
+    ("replies", lambda uid, n: update(Reply).where(Reply.id.in_(_ids(Reply, Reply.author_id == uid, Reply.status != "removed", n=n))).values(status="removed", removed_at=func.now()).returning(Reply.id, Reply.post_id), "reply"),
+    ("dm_messages", lambda uid, n: update(DMMessage).where(DMMessage.id.in_(_ids(DMMessage, DMMessage.author_id == uid, DMMessage.status != "removed", n=n))).values(status="removed", removed_at=func.now()).returning(DMMessage.id), None),
+    ("session_events", lambda uid, n: delete(SessionEvent).where(SessionEvent.id.in_(_ids(SessionEvent, SessionEvent.user_id == uid, n=n))).returning(SessionEvent.id), None),
+    ("ip_user_edges", lambda uid, n: delete(IpUserEdge).where(IpUserEdge.user_id == uid, IpUserEdge.ip_lookup_hmac.in_(select(IpUserEdge.ip_lookup_hmac).where(IpUserEdge.user_id == uid).limit(n).scalar_subquery())).returning(IpUserEdge.ip_lookup_hmac), None),
+    ("conversation_participants", lambda uid, n: delete(ConversationParticipant).where(ConversationParticipant.id.in_(_ids(ConversationParticipant, ConversationParticipant.user_id == uid, n=n))).returning(ConversationParticipant.id), None),
+    ("moderation_flags", lambda uid, n: update(ModerationFlag).where(ModerationFlag.id.in_(_ids(ModerationFlag, ModerationFlag.reporter_id == uid, n=n))).values(reporter_id=None).returning(ModerationFlag.id), None),
+]
+
+
+async def _run_chunk(stmt: Executable, content_type: str | None) -> list:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(stmt.execution_options(synchronize_session=False))).all()
+        if content_type and rows:
+            await deindex(db, content_type, [r[0] for r in rows])
+        if content_type == "reply" and rows:
+            await refresh_summaries(db, [r[1] for r in rows])
+        await db.commit()
+    return rows
+
+
+async def _finish_user(uid: UUID) -> int:
+    # Last step: scrub the user row's network metadata and drop any export files they left behind.
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.id == uid).values(last_ip_lookup_hmac=None, last_ip_ciphertext=None, last_ip_nonce=None))
+        paths = (await db.execute(select(Job.result_path).where(Job.user_id == uid, Job.kind == "export", Job.result_path.is_not(None)))).scalars().all()
+        await db.execute(update(Job).where(Job.user_id == uid, Job.kind == "export").values(result_path=None))
+        await emit(db, "user.erased", uid)
+        await db.commit()
+    for p in paths:
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+    return len(paths)
+
+
+@job_handler("erasure")
+async def run_erasure(job: Job, ctx: JobContext) -> None:
+    uid = job.user_id
+    n = settings.erasure_chunk_size
+    pause = settings.erasure_pause_ms / 1000.0
+    progress = dict(ctx.progress)
+    done_steps = set(ctx.checkpoint.get("done", []))
+    touched_feed = False
+
+    for step, build, content_type in STEPS:
+        if step in done_steps:
+            continue
+        progress.setdefault(step, 0)
+        while True:
+            rows = await _run_chunk(build(uid, n), content_type)
+            if content_type and rows:
+                invalidate_posts(r[1] for r in rows)
+                touched_feed = True
+            progress[step] += len(rows)
+            await ctx.save(progress=dict(progress, step=step))
+            if len(rows) < n:
+                break
+            await asyncio.sleep(pause)
+        done_steps.add(step)
+        await ctx.save(progress=dict(progress, step=step), checkpoint={"done": sorted(done_steps)})
+
+    progress["export_files"] = await _finish_user(uid)
+    progress["step"] = "done"
+    ctx.progress = progress
+    if touched_feed:
+        invalidate_feed()
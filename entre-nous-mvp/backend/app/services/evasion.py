@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import configure_logging, log
+from app.core.settings import settings
+from app.db.session import AsyncSessionLocal
+from app.models import Job
+from app.services.jobs import JobContext, enqueue, job_handler, run_job
+from app.services.review_queue import enqueue_review
+
+# Ban-evasion / multi-account detection, as a periodic job (cron: python -m app.services.evasion).
+# 1. Aggregate: session_events are folded, one time window (EVASION_WINDOW_HOURS) per transaction, into
+#    ip_user_edges, one row per (IP prefix HMAC, user) with event count and first/last seen. Each window is one
+#    GROUP BY over the created_at index; the watermark (end of the last window folded) is committed with the
+#    window in the job's checkpoint, and the next run starts from the highest watermark of any run. The checkpoint
+#    also records the floor ("from", start of the folded range); a run whose lookback reaches further back first
+#    folds [start, floor) backwards, window by window, and pruning raises the floor to the lookback it pruned to.
+# 2. Score: users sharing a prefix are linked; prefixes with more than EVASION_MAX_USERS_PER_PREFIX users (carrier
+#    NAT, campus networks) carry no signal and are skipped. Connected components of that graph are built with a
+#    union-find over the edges streamed once, grouped by prefix. Each cluster is scored from signals fetched with
+#    one set query each: banned members, members seen on a banned prefix, hidden/removed content and flags of
+#    its members. Active members of clusters scoring EVASION_MIN_SCORE or more get a "user" review item
+#    (priority 1 with a ban signal, else 2); rejecting the item bans the account.
+# Work and memory are linear in events (aggregate) and in linked users (score); no per-user queries.
+
+KIND = "ban_evasion"
+SAFETY_LAG = timedelta(minutes=1)  # events of in-flight requests can still commit with an earlier created_at
+WEIGHTS = {"banned": 5.0, "banned_ip": 3.0, "moderated": 1.0, "flags": 0.2}
+ENQUEUE_CHUNK = 500
+STREAM_CHUNK = 10000
+
+_FOLD = """
+    INSERT INTO ip_user_edges (ip_lookup_hmac, user_id, events, first_seen, last_seen)
+    SELECT ip_lookup_hmac, user_id, count(*), min(created_at), max(created_at)
+    FROM session_events
+    WHERE created_at >= :lo AND created_at < :hi AND ip_lookup_hmac IS NOT NULL
+    GROUP BY ip_lookup_hmac, user_id
+    ON CONFLICT (ip_lookup_hmac, user_id) DO UPDATE SET
+        events = {events},
+        first_seen = least(ip_user_edges.first_seen, excluded.first_seen),
+        last_seen = greatest(ip_user_edges.last_seen, excluded.last_seen)
+"""
+_AGGREGATE = text(_FOLD.format(events="ip_user_edges.events + excluded.events"))
+# below the floor, an edge that survived an earlier prune may already count these events: add missing edges and
+# widen first_seen, but leave its count alone
+_BACKFILL = text(_FOLD.format(events="ip_user_edges.events"))
+
+_PRUNE = text("DELETE FROM ip_user_edges WHERE last_seen < :since")
+
+_PREFIX_GROUPS = text(
+    """
+    SELECT ip_lookup_hmac, array_agg(user_id) AS users
+    FROM ip_user_edges
+    WHERE last_seen >= :since
+    GROUP BY ip_lookup_hmac
+    HAVING count(*) BETWEEN 2 AND :max_users
+    """
+)
+
+# user sets, one query each
+_USER_SETS = {
+    "banned": "SELECT id FROM users WHERE is_banned AND deleted_at IS NULL",
+    "deleted": "SELECT id FROM users WHERE deleted_at IS NOT NULL",
+    "banned_ip": "SELECT DISTINCT e.user_id FROM ip_user_edges e JOIN ip_bans b ON b.ip_lookup_hmac = e.ip_lookup_hmac "
+    "WHERE e.last_seen >= :since",
+    "cleared": "SELECT target_id FROM moderation_queue WHERE target_type = 'user' AND status = 'approved'",
+}
+
+# hidden/removed items and flags received, per author
+_CONTENT = text(
+    """
+    SELECT author_id, sum(moderated) AS moderated, sum(flags) AS flags FROM (
+        SELECT author_id, count(*) FILTER (WHERE status <> 'visible') AS moderated, sum(flags_count) AS flags
+        FROM posts WHERE created_at >= :since AND (status <> 'visible' OR flags_count > 0) GROUP BY author_id
+        UNION ALL
+        SELECT author_id, count(*) FILTER (WHERE status <> 'visible'), sum(flags_count)
+        FROM replies WHERE created_at >= :since AND (status <> 'visible' OR flags_count > 0) GROUP BY author_id
+        UNION ALL
+        SELECT author_id, count(*), 0
+        FROM dm_messages WHERE created_at >= :since AND status = 'removed' GROUP BY author_id
+    ) c
+    GROUP BY author_id
+    """
+)
+
+# folded range [from, through) of the most recent run (ties: the one that wrote last)
+_COVERAGE = text(
+    """
+    SELECT (checkpoint->>'through')::timestamptz AS through, (checkpoint->>'from')::timestamptz AS floor
+    FROM jobs WHERE kind = :kind AND checkpoint->>'through' IS NOT NULL
+    ORDER BY (checkpoint->>'through')::timestamptz DESC, heartbeat_at DESC NULLS LAST
+    LIMIT 1
+    """
+)
+
+
+# -- 1. aggregate ---------------------------------------------------------------------------------------------
+
+
+async def _coverage(db: AsyncSession) -> tuple[datetime | None, datetime | None]:
+    # one folding run at a time: a concurrent run waits here, then continues from the moved watermark and floor
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(KIND))))
+    row = (await db.execute(_COVERAGE, {"kind": KIND})).one_or_none()
+    if row is None:
+        return None, None
+    return row.through, row.floor or row.through  # runs from before the floor was recorded: nothing older is known
+
+
+async def _commit_coverage(db: AsyncSession, job_id: UUID, ctx: JobContext, progress: dict, through: datetime, floor: datetime) -> None:
+    # watermark and floor in the same transaction as the window (or prune) they cover
+    checkpoint = dict(ctx.checkpoint, through=through.isoformat(), **{"from": floor.isoformat()})
+    await db.execute(
+        update(Job).where(Job.id == job_id).values(checkpoint=checkpoint, progress=progress, heartbeat_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    ctx.checkpoint, ctx.progress = checkpoint, dict(progress)
+
+
+async def _fold(db: AsyncSession, stmt, lo: datetime, hi: datetime, progress: dict) -> None:
+    t0 = time.perf_counter()
+    edges = (await db.execute(stmt, {"lo": lo, "hi": hi})).rowcount
+    progress["windows"] = progress.get("windows", 0) + 1
+    progress["edges_upserted"] = progress.get("edges_upserted", 0) + edges
+    progress["aggregate_ms"] = round(progress.get("aggregate_ms", 0.0) + (time.perf_counter() - t0) * 1000.0, 1)
+
+
+async def _aggregate_window(job_id: UUID, start: datetime, until: datetime, ctx: JobContext, progress: dict) -> bool:
+    # Folds the next window after the watermark; False once caught up with `until`.
+    async with AsyncSessionLocal() as db:
+        watermark, floor = await _coverage(db)
+        if watermark is None or watermark < start:
+            lo = floor = start  # first run, or a gap longer than the lookback: nothing older is worth folding
+        else:
+            lo = watermark
+        if lo >= until:
+            return False
+        hi = min(lo + timedelta(hours=settings.evasion_window_hours), until)
+        await _fold(db, _AGGREGATE, lo, hi, progress)
+        progress["through"] = hi.isoformat()
+        await _commit_coverage(db, job_id, ctx, progress, hi, floor)
+    return True
+
+
+async def _backfill_window(job_id: UUID, start: datetime, ctx: JobContext, progress: dict) -> bool:
+    # Folds the window just below the floor when the lookback reaches further back; False once the floor is at `start`.
+    async with AsyncSessionLocal() as db:
+        watermark, floor = await _coverage(db)
+        if watermark is None or floor <= start:
+            return False
+        lo = max(start, floor - timedelta(hours=settings.evasion_window_hours))
+        await _fold(db, _BACKFILL, lo, floor, progress)
+        progress["backfilled_from"] = lo.isoformat()
+        await _commit_coverage(db, job_id, ctx, progress, watermark, lo)
+    return True
+
+
+async def _prune(job_id: UUID, since: datetime, ctx: JobContext, progress: dict) -> None:
+    # edges last seen before the lookback go, so the floor moves up to it
+    async with AsyncSessionLocal() as db:
+        watermark, floor = await _coverage(db)
+        progress["edges_pruned"] = (await db.execute(_PRUNE, {"since": since})).rowcount
+        if watermark is not None:
+            await _commit_coverage(db, job_id, ctx, progress, watermark, max(floor, since))
+        else:
+            await db.commit()
+
+
+# -- 2. score -------------------------------------------------------------------------------------------------
+
+
+class _Clusters:
+    """Union-find over user ids (path halving, union by size)."""
+
+    def __init__(self) -> None:
+        self.parent: dict[UUID, UUID] = {}
+        self.size: dict[UUID, int] = {}
+
+    def find(self, u: UUID) -> UUID:
+        parent = self.parent
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    def add(self, u: UUID) -> None:
+        if u not in self.parent:
+            self.parent[u] = u
+            self.size[u] = 1
+
+    def union(self, a: UUID, b: UUID) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size.pop(rb)
+
+    def groups(self) -> dict[UUID, list[UUID]]:
+        out: dict[UUID, list[UUID]] = defaultdict(list)
+        for u in self.parent:
+            out[self.find(u)].append(u)
+        return out
+
+
+async def _link(since: datetime) -> tuple[_Clusters, Counter]:
+    clusters, prefixes = _Clusters(), Counter()
+    first_users: list[UUID] = []
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            _PREFIX_GROUPS.execution_options(yield_per=STREAM_CHUNK), {"since": since, "max_users": settings.evasion_max_users_per_prefix}
+        )
+        async for rows in result.partitions(STREAM_CHUNK):
+            for r in rows:
+                users = r.users
+                clusters.add(users[0])
+                for u in users[1:]:
+                    clusters.add(u)
+                    clusters.union(users[0], u)
+                first_users.append(users[0])
+    # shared prefixes per cluster
+    for u in first_users:
+        prefixes[clusters.find(u)] += 1
+    return clusters, prefixes
+
+
+async def _signals(since: datetime) -> tuple[dict[str, set[UUID]], dict[UUID, tuple[int, int]]]:
+    async with AsyncSessionLocal() as db:
+        sets = {}
+        for name, sql in _USER_SETS.items():
+            sets[name] = set((await db.execute(text(sql), {"since": since} if ":since" in sql else {})).scalars())
+        content = {r.author_id: (int(r.moderated or 0), int(r.flags or 0)) for r in (await db.execute(_CONTENT, {"since": since})).all()}
+    return sets, content
+
+
+def score_clusters(
+    groups: dict[UUID, list[UUID]], prefixes: Counter, sets: dict[str, set[UUID]], content: dict[UUID, tuple[int, int]], progress: dict
+) -> list[tuple[UUID, int, str]]:
+    """(user, priority, notes) for every active member of a suspicious cluster."""
+    out: list[tuple[UUID, int, str]] = []
+    banned_set, deleted, banned_ip_set, cleared = sets["banned"], sets["deleted"], sets["banned_ip"], sets["cleared"]
+    for root, members in groups.items():
+        if len(members) > settings.evasion_max_cluster_size:
+            progress["large_clusters"] = progress.get("large_clusters", 0) + 1
+            continue
+        live = [m for m in members if m not in deleted]  # erased accounts are neither a signal nor a target
+        banned = sum(1 for m in live if m in banned_set)
+        banned_ip = sum(1 for m in live if m in banned_ip_set)
+        moderated = sum(content.get(m, (0, 0))[0] for m in live)
+        flags = sum(content.get(m, (0, 0))[1] for m in live)
+        score = WEIGHTS["banned"] * banned + WEIGHTS["banned_ip"] * banned_ip + WEIGHTS["moderated"] * moderated + WEIGHTS["flags"] * flags
+        active = [m for m in live if m not in banned_set and m not in cleared]
+        if score < settings.evasion_min_score or not active:
+            continue
+        progress["flagged_clusters"] = progress.get("flagged_clusters", 0) + 1
+        priority = 1 if banned or banned_ip else 2
+        notes = (
+            f"ban_evasion: {len(members)} accounts over {prefixes[root]} shared IP prefixes; {banned} banned, "
+            f"{banned_ip} seen on banned IPs, {moderated} hidden/removed items, {flags} flags; score {score:.1f}"
+        )
+        out.extend((m, priority, notes) for m in active)
+    return out
+
+
+# -- job ------------------------------------------------------------------------------------------------------
+
+
+@job_handler(KIND)
+async def run_ban_evasion(job: Job, ctx: JobContext) -> None:
+    days = (job.params or {}).get("lookback_days", settings.evasion_lookback_days)
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(days=days)
+    progress = dict(ctx.progress, lookback_days=days, step="aggregate")
+
+    while await _aggregate_window(job.id, since, now - SAFETY_LAG, ctx, progress):
+        log.info("evasion_window", job_id=str(job.id), through=progress["through"])
+    # a longer lookback than earlier runs folded (e.g. POST /admin/evasion/scan?lookback_days=90)
+    while await _backfill_window(job.id, since, ctx, progress):
+        log.info("evasion_backfill_window", job_id=str(job.id), backfilled_from=progress["backfilled_from"])
+
+    await _prune(job.id, since, ctx, progress)
+    await ctx.save(progress=dict(progress, step="score"))
+
+    t0 = time.perf_counter()
+    clusters, prefixes = await _link(since)
+    sets, content = await _signals(since)
+    groups = clusters.groups()
+    progress.update(linked_users=len(clusters.parent), clusters=len(groups), flagged_clusters=0, large_clusters=0)
+    targets = score_clusters(groups, prefixes, sets, content, progress)
+    progress["score_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    del clusters, groups, sets, content
+
+    # re-running is harmless: one pending item per account, re-enqueueing keeps the higher priority
+    for i in range(0, len(targets), ENQUEUE_CHUNK):
+        async with AsyncSessionLocal() as db:
+            for user_id, priority, notes in targets[i : i + ENQUEUE_CHUNK]:
+                await enqueue_review(db, "user", user_id, priority=priority, notes=notes)
+            await db.commit()
+        progress["queued_users"] = min(i + ENQUEUE_CHUNK, len(targets))
+        await ctx.save(progress=progress)
+
+    await ctx.save(progress=dict(progress, step="done", queued_users=len(targets)))
+    log.info("evasion_done", job_id=str(job.id), **{k: v for k, v in ctx.progress.items() if k != "step"})
+
+
+async def _enqueue_and_run(lookback_days: int | None) -> dict:
+    async with AsyncSessionLocal() as db:
+        job = await enqueue(db, KIND, params={"lookback_days": lookback_days} if lookback_days is not None else None)
+        await db.commit()
+    await run_job(job.id)
+    async with AsyncSessionLocal() as db:
+        job = await db.get(Job, job.id)
+        return {"job_id": str(job.id), "status": job.status, "progress": job.progress}
+
+
+def main() -> None:
+    # python -m app.services.evasion [--lookback-days 30]  (cron entry point; one run, prints the clusters found)
+    parser = argparse.ArgumentParser(description="detect ban evasion / multi-account clusters from session events")
+    parser.add_argument("--lookback-days", type=int, default=None)
+    args = parser.parse_args()
+    configure_logging()
+    print(asyncio.run(_enqueue_and_run(args.lookback_days)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import orjson
+from redis.exceptions import ResponseError
+
+from app.core.logging import configure_logging, log
+from app.core.redis import get_async_redis
+from app.core.settings import settings
+from app.services.outbox import run_relay, stream_key
+
+# Consumers of the outbox streams. A subscriber is a consumer group over one or more event types; every group
+# sees every event, and the processes of one group share its events (scale a group by running more of them).
+# - A handled event is acked; a handler exception leaves it pending.
+# - Pending events idle for EVENTS_RETRY_IDLE_MS (failed, or their consumer died) are claimed and retried.
+# - After EVENTS_MAX_DELIVERIES attempts an event is copied to the events:dead stream (with group and error) and
+#   acked, so one poison event cannot stall its group.
+# Delivery is at-least-once: handlers must be idempotent (event.event_id is stable across redeliveries).
+#
+#   python -m app.services.eventbus relay
+#   python -m app.services.eventbus consume <group> [--name NAME]
+
+DEAD_LETTER_STREAM = "events:dead"
+
+
+@dataclass
+class Event:
+    stream: str
+    message_id: str
+    event_id: str
+    type: str
+    aggregate_id: str
+    payload: dict
+    created_at: str
+    deliveries: int = 1
+
+    @classmethod
+    def from_fields(cls, stream: str, message_id: str, fields: dict, deliveries: int = 1) -> "Event":
+        return cls(
+            stream=stream,
+            message_id=message_id,
+            event_id=fields.get("event_id", ""),
+            type=fields.get("type", ""),
+            aggregate_id=fields.get("aggregate_id", ""),
+            payload=orjson.loads(fields.get("payload") or "{}"),
+            created_at=fields.get("created_at", ""),
+            deliveries=deliveries,
+        )
+
+
+EventHandler = Callable[[Event], Awaitable[None]]
+SUBSCRIBERS: dict[str, tuple[list[str], EventHandler]] = {}
+
+
+def subscriber(group: str, *event_types: str):
+    def deco(fn: EventHandler) -> EventHandler:
+        SUBSCRIBERS[group] = (list(event_types), fn)
+        return fn
+    return deco
+
+
+class Consumer:
+    def __init__(self, group: str, name: str | None = None) -> None:
+        if group not in SUBSCRIBERS:
+            raise KeyError(f"no subscriber registered for group {group!r}")
+        event_types, self.handler = SUBSCRIBERS[group]
+        self.group = group
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.streams = [stream_key(t) for t in event_types]
+        self.redis = get_async_redis()
+
+    async def ensure_groups(self) -> None:
+        # New groups start at the beginning of what the stream still holds.
+        for stream in self.streams:
+            try:
+                await self.redis.xgroup_create(stream, self.group, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def _dead_letter(self, event: Event, fields: dict, error: str) -> None:
+        dead = {**fields, "group": self.group, "stream": event.stream, "deliveries": str(event.deliveries), "error": error[:200]}
+        await self.redis.xadd(DEAD_LETTER_STREAM, dead, maxlen=settings.events_stream_maxlen, approximate=True)
+        await self.redis.xack(event.stream, self.group, event.message_id)
+        log.warning("event_dead_lettered", group=self.group, type=event.type, event_id=event.event_id, deliveries=event.deliveries)
+
+    async def _handle(self, stream: str, message_id: str, fields: dict, deliveries: int = 1) -> None:
+        event = Event.from_fields(stream, message_id, fields, deliveries)
+        try:
+            await self.handler(event)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            log.warning("event_failed", group=self.group, type=event.type, event_id=event.event_id, deliveries=deliveries, error=type(e).__name__)
+            if deliveries >= settings.events_max_deliveries:
+                await self._dead_letter(event, fields, error)
+            return  # left pending: retried once idle
+        await self.redis.xack(stream, self.group, message_id)
+
+    async def read_new(self) -> int:
+        res = await self.redis.xreadgroup(
+            self.group, self.name, {s: ">" for s in self.streams}, count=settings.events_read_batch, block=settings.events_block_ms
+        )
+        n = 0
+        for stream, messages in res or []:
+            for message_id, fields in messages:
+                await self._handle(stream, message_id, fields)
+                n += 1
+        return n
+
+    async def retry_stale(self) -> int:
+        n = 0
+        for stream in self.streams:
+            pending = await self.redis.xpending_range(
+                stream, self.group, min="-", max="+", count=settings.events_read_batch, idle=settings.events_retry_idle_ms
+            )
+            for p in pending:
+                claimed = await self.redis.xclaim(stream, self.group, self.name, settings.events_retry_idle_ms, [p["message_id"]])
+                for message_id, fields in claimed:
+                    if fields is None:  # trimmed from the stream meanwhile
+                        await self.redis.xack(stream, self.group, message_id)
+                        continue
+                    await self._handle(stream, message_id, fields, deliveries=p["times_delivered"] + 1)
+                    n += 1
+        return n
+
+    async def run(self, stop: asyncio.Event | None = None) -> None:
+        await self.ensure_groups()
+        log.info("consumer_start", group=self.group, name=self.name, streams=self.streams)
+        loop = asyncio.get_running_loop()
+        next_retry = 0.0
+        while stop is None or not stop.is_set():
+            try:
+                if loop.time() >= next_retry:
+                    await self.retry_stale()
+                    next_retry = loop.time() + settings.events_retry_idle_ms / 2000.0
+                await self.read_new()
+            except Exception as e:
+                log.warning("consumer_error", group=self.group, error=type(e).__name__)
+                await asyncio.sleep(1.0)
+
+
+def main() -> None:
+    from app.services import subscribers  # noqa: F401  (registers consumer groups)
+
+    parser = argparse.ArgumentParser(description="Entre Nous event bus: outbox relay and stream consumers")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("relay", help="publish outbox rows to Redis Streams")
+    c = sub.add_parser("consume", help="run one consumer of a group")
+    c.add_argument("group", choices=sorted(SUBSCRIBERS))
+    c.add_argument("--name", help="consumer name within the group (default: host-pid)")
+    args = parser.parse_args()
+    configure_logging()
+    if args.cmd == "relay":
+        asyncio.run(run_relay())
+    else:
+        asyncio.run(Consumer(args.group, args.name).run())
+
+
+if __name__ == "__main__":
+    main()
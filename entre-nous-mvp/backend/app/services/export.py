@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID
+
+import orjson
+from sqlalchemy import select
+
+from app.core.settings import settings
+from app.db.session import read_session_factory
+from app.models import Job, User, Post, Reply, DMMessage, ConversationParticipant, SessionEvent
+from app.services.crypto import crypto
+from app.services.jobs import JobContext, job_handler
+
+# GDPR export as a job: each section is streamed with a server-side cursor in chunks, decrypted and
+# serialized off the event loop, and appended to a gzipped NDJSON file (one {"type": ...} object per line).
+# A retried job resumes after the last completed section.
+
+
+def export_path(job_id: UUID) -> Path:
+    return Path(settings.export_dir) / f"{job_id}.ndjson.gz"
+
+
+def export_expired(job: Job) -> bool:
+    return job.finished_at is not None and job.finished_at + timedelta(hours=settings.export_ttl_hours) < datetime.now(timezone.utc)
+
+
+def _dec(ct: bytes | None, nonce: bytes | None) -> str | None:
+    return crypto.decrypt_text(ct, nonce) if ct is not None and nonce is not None else None
+
+
+def _sections(uid: UUID):
+    # (type, stmt, row -> dict); only the columns the export needs.
+    yield "post", select(Post.id, Post.created_at, Post.status, Post.body_ciphertext, Post.body_nonce).where(Post.author_id == uid).order_by(Post.created_at), (
+        lambda r: {"id": str(r.id), "created_at": r.created_at, "status": r.status, "body": _dec(r.body_ciphertext, r.body_nonce)}
+    )
+    yield "reply", select(Reply.id, Reply.post_id, Reply.created_at, Reply.status, Reply.body_ciphertext, Reply.body_nonce).where(Reply.author_id == uid).order_by(Reply.created_at), (
+        lambda r: {"id": str(r.id), "post_id": str(r.post_id), "created_at": r.created_at, "status": r.status, "body": _dec(r.body_ciphertext, r.body_nonce)}
+    )
+    yield "conversation", select(ConversationParticipant.conversation_id, ConversationParticipant.created_at).where(ConversationParticipant.user_id == uid).order_by(ConversationParticipant.created_at), (
+        lambda r: {"conversation_id": str(r.conversation_id), "joined_at": r.created_at}
+    )
+    yield "dm_message", select(DMMessage.id, DMMessage.conversation_id, DMMessage.created_at, DMMessage.status, DMMessage.body_ciphertext, DMMessage.body_nonce).where(DMMessage.author_id == uid).order_by(DMMessage.created_at), (
+        lambda r: {"id": str(r.id), "conversation_id": str(r.conversation_id), "created_at": r.created_at, "status": r.status, "body": _dec(r.body_ciphertext, r.body_nonce)}
+    )
+    yield "session_event", select(SessionEvent.id, SessionEvent.event_type, SessionEvent.created_at, SessionEvent.ip_ciphertext, SessionEvent.ip_nonce).where(SessionEvent.user_id == uid).order_by(SessionEvent.created_at), (
+        lambda r: {"id": str(r.id), "event_type": r.event_type, "created_at": r.created_at, "ip": _dec(r.ip_ciphertext, r.ip_nonce)}
+    )
+
+
+def _write_chunk(out, kind: str, rows, fmt) -> None:
+    # Runs in a worker thread: batch decrypt + serialize + compress.
+    out.write(b"".join(orjson.dumps({"type": kind, **fmt(r)}) + b"\n" for r in rows))
+
+
+@job_handler("export")
+async def run_export(job: Job, ctx: JobContext) -> None:
+    path = export_path(job.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    chunk = settings.export_chunk_size
+
+    # Every section is its own gzip member (readers see one stream); the checkpoint records the sections done and
+    # the file size after the last one, so a retry truncates a half-written section and carries on after it.
+    done: list[str] = list(ctx.checkpoint.get("done", []))
+    offset: int = ctx.checkpoint.get("offset", 0)
+    counts: dict[str, int] = dict(ctx.checkpoint.get("counts", {}))
+    if not done or not tmp.exists() or tmp.stat().st_size < offset:
+        done, offset, counts = [], 0, {}
+    with open(tmp, "r+b" if offset else "wb") as fh:
+        fh.truncate(offset)
+
+    async def section_done(kind: str) -> None:
+        nonlocal offset
+        done.append(kind)
+        offset = tmp.stat().st_size
+        await ctx.save(progress=dict(counts), checkpoint={"done": list(done), "offset": offset, "counts": dict(counts)})
+
+    factory = await read_session_factory()
+    async with factory() as db:
+        if "user" not in done:
+            user = (await db.execute(select(User.id, User.created_at, User.trust_score, User.email_ciphertext, User.email_nonce).where(User.id == job.user_id))).one()
+            with gzip.open(tmp, "ab", compresslevel=6) as out:
+                _write_chunk(out, "user", [user], lambda r: {"id": str(r.id), "created_at": r.created_at, "trust_score": r.trust_score, "email": _dec(r.email_ciphertext, r.email_nonce)})
+            await section_done("user")
+        for kind, stmt, fmt in _sections(job.user_id):
+            if kind in done:
+                continue
+            counts[kind] = 0
+            with gzip.open(tmp, "ab", compresslevel=6) as out:
+                result = await db.stream(stmt.execution_options(yield_per=chunk))
+                async for rows in result.partitions(chunk):
+                    await asyncio.to_thread(_write_chunk, out, kind, rows, fmt)
+                    counts[kind] += len(rows)
+                    await ctx.save(progress=dict(counts))
+            await section_done(kind)
+    os.replace(tmp, path)
+    ctx.progress = counts
+    ctx.result_path = str(path)
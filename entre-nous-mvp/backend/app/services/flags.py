@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import delete, exists, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FlagAggregate, ModerationFlag
+
+# Flag aggregates: one flag_aggregates row per flagged target (post, reply or DM) with the flag count by reason,
+# distinct reporters, first/last flag time and a severity score, kept current in the transaction of each flag
+# so triage reads one indexed row per target instead of scanning moderation_flags.
+# Severity is the sum of the reason weights of each reporter's first flag on the target: repeat flags by the
+# same user are counted but do not escalate. A review decision marks the row resolved; a new flag reopens it.
+
+REASON_WEIGHTS = {
+    "threat": 5.0,
+    "self_harm": 5.0,
+    "hate": 3.0,
+    "harassment": 3.0,
+    "sexual": 3.0,
+    "abuse": 2.0,
+    "spam": 1.0,
+}
+DEFAULT_WEIGHT = 1.0
+
+
+def reason_weight(reason: str) -> float:
+    return REASON_WEIGHTS.get(reason.strip().lower(), DEFAULT_WEIGHT)
+
+
+_UPSERT = text(
+    """
+    INSERT INTO flag_aggregates AS a (target_type, target_id, flags, reporters, reasons, severity, first_flag_at, last_flag_at)
+    VALUES (:target_type, :target_id, 1, :new_reporter, jsonb_build_object(CAST(:reason AS text), 1), :weight, :now, :now)
+    ON CONFLICT (target_type, target_id) DO UPDATE SET
+        flags = a.flags + 1,
+        reporters = a.reporters + excluded.reporters,
+        reasons = a.reasons || jsonb_build_object(CAST(:reason AS text), coalesce((a.reasons ->> CAST(:reason AS text))::int, 0) + 1),
+        severity = a.severity + excluded.severity,
+        last_flag_at = greatest(a.last_flag_at, excluded.last_flag_at),
+        resolved_at = NULL
+    """
+)
+
+
+async def record_flag(db: AsyncSession, flag: ModerationFlag) -> None:
+    # Caller commits; `flag` is already added to the session (and flushed by the query below).
+    # Flags on one target are serialized until commit, so two concurrent first flags of the same reporter cannot both
+    # miss each other in the repeat check (both would count as new reporters). Flaggers of a target already queue on
+    # its aggregate row and content row; the lock only moves that wait before the check.
+    key = f"flag:{flag.target_type}:{flag.target_id}"
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(key))))
+    f = ModerationFlag
+    repeat = (
+        await db.execute(
+            select(
+                exists().where(f.target_type == flag.target_type, f.target_id == flag.target_id, f.reporter_id == flag.reporter_id, f.id != flag.id)
+            )
+        )
+    ).scalar()
+    await db.execute(
+        _UPSERT,
+        {
+            "target_type": flag.target_type,
+            "target_id": flag.target_id,
+            "new_reporter": 0 if repeat else 1,
+            "reason": flag.reason,
+            "weight": 0.0 if repeat else reason_weight(flag.reason),
+            "now": flag.created_at,
+        },
+    )
+
+
+async def resolve(db: AsyncSession, target_type: str, ids: list[UUID]) -> None:
+    await db.execute(
+        update(FlagAggregate)
+        .where(FlagAggregate.target_type == target_type, FlagAggregate.target_id.in_(ids), FlagAggregate.resolved_at.is_(None))
+        .values(resolved_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def drop(db: AsyncSession, target_type: str, ids: list[UUID]) -> int:
+    res = await db.execute(delete(FlagAggregate).where(FlagAggregate.target_type == target_type, FlagAggregate.target_id.in_(ids)))
+    return res.rowcount
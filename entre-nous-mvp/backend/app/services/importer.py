@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import IO, AsyncIterator
+
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import configure_logging, log
+from app.core.process import available_cores
+from app.core.settings import settings
+from app.db.ids import uuid7, uuid7_derived
+from app.db.session import AsyncSessionLocal
+from app.models import Job
+from app.services.crypto import crypto
+from app.services.jobs import JobContext, enqueue, job_handler, run_job
+from app.services.moderation import quick_moderation
+from app.services.search import token_hmac, tokenize
+from app.services.threads import refresh_summaries
+
+# Bulk import of users, posts and replies from another platform (NDJSON, optionally gzipped), one record per line:
+#   {"type": "user",  "ref": "u1", "email": "a@b.c", "created_at": "2024-05-01T10:00:00Z"}
+#   {"type": "post",  "ref": "p1", "author": "u1", "body": "...", "created_at": "..."}
+#   {"type": "reply", "ref": "r1", "post": "p1", "author": "u1", "body": "...", "created_at": "...", "kindness_votes": 3}
+# Parents must come before their children in the file (users, then posts, then replies is the simple way).
+# created_at is required on every record.
+#
+# Pipeline: the file is read in batches of IMPORT_BATCH_SIZE lines. A pool of processes does the CPU work per
+# batch (parse, quick_moderation, encryption, search tokens, ids) while the job loads earlier batches, in order.
+# Each batch is one transaction: COPY into temp staging tables, then one INSERT ... SELECT per kind that resolves
+# source references through import_refs, and writes the review queue items and search tokens of the inserted
+# rows. The transaction also advances the checkpoint (last line loaded).
+# Ids derive from (source, kind, ref, created_at), so a batch replayed after a crash inserts nothing twice.
+# Imported users cannot log in until they claim their account: `--claim-tokens` prints one reset token per
+# unclaimed user of a source (keyed by its ref, for the operator to send through the old platform), redeemed
+# with POST /auth/reset. A user whose email already has an account is not merged into it: the record is
+# reported as rejected (email_exists), and its content as unresolved_ref.
+
+KINDS = ("user", "post", "reply")
+MAX_REJECT_SAMPLES = 20
+
+_STAGING = [
+    "CREATE TEMP TABLE IF NOT EXISTS import_users_s (id uuid, ref text, email_lookup_hmac text, email_ciphertext bytea, "
+    "email_nonce bytea, created_at timestamptz, line int) ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS import_posts_s (id uuid, ref text, author_ref text, body_ciphertext bytea, body_nonce bytea, "
+    "created_at timestamptz, toxicity_score float8, review_id uuid) ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS import_replies_s (id uuid, ref text, post_ref text, author_ref text, body_ciphertext bytea, "
+    "body_nonce bytea, created_at timestamptz, toxicity_score float8, kindness_votes int, review_id uuid) ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS import_tokens_s (token_hmac text, target_type text, target_id uuid, created_at timestamptz) "
+    "ON COMMIT DELETE ROWS",
+]
+
+COLUMNS = {
+    "import_users_s": ["id", "ref", "email_lookup_hmac", "email_ciphertext", "email_nonce", "created_at", "line"],
+    "import_posts_s": ["id", "ref", "author_ref", "body_ciphertext", "body_nonce", "created_at", "toxicity_score", "review_id"],
+    "import_replies_s": ["id", "ref", "post_ref", "author_ref", "body_ciphertext", "body_nonce", "created_at", "toxicity_score", "kindness_votes", "review_id"],
+    "import_tokens_s": ["token_hmac", "target_type", "target_id", "created_at"],
+}
+
+# A ref only maps onto the user it created: inserted now, or by an earlier (replayed) run. Anything else lost the
+# email to another account (existing, or earlier in the batch) and is reported, never merged into it.
+_LOAD_USERS = text(
+    """
+    WITH ins AS (
+        INSERT INTO users (id, password_hash, email_lookup_hmac, email_ciphertext, email_nonce, trust_score, is_banned, created_at)
+        SELECT s.id, :unusable, s.email_lookup_hmac, s.email_ciphertext, s.email_nonce, 0, false, s.created_at FROM import_users_s s
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    ), own AS (
+        SELECT s.ref, s.id FROM import_users_s s
+        WHERE s.id IN (SELECT id FROM ins) OR EXISTS (SELECT 1 FROM users u WHERE u.id = s.id)
+    ), refs AS (
+        INSERT INTO import_refs (source, kind, ref, id)
+        SELECT :source, 'user', ref, id FROM own
+        ON CONFLICT DO NOTHING
+    ), lost AS (
+        SELECT s.line FROM import_users_s s WHERE s.id NOT IN (SELECT id FROM own)
+    )
+    SELECT (SELECT count(*) FROM ins) AS inserted, (SELECT count(*) FROM lost) AS collisions,
+           (SELECT array_agg(line ORDER BY line) FROM (SELECT line FROM lost ORDER BY line LIMIT :samples) l) AS collision_lines
+    """
+)
+
+# Shared tail of the content statements: refs, review queue items (risky rows) and search tokens of the new rows.
+_CONTENT_TAIL = """
+    , refs AS (
+        INSERT INTO import_refs (source, kind, ref, id)
+        SELECT :source, '{kind}', s.ref, s.id FROM {staging} s JOIN ins ON ins.id = s.id
+        ON CONFLICT DO NOTHING
+    ), q AS (
+        INSERT INTO moderation_queue (id, target_type, target_id, priority, status, created_at)
+        SELECT s.review_id, '{kind}', s.id, 3, 'pending', now() FROM {staging} s JOIN ins ON ins.id = s.id WHERE s.review_id IS NOT NULL
+        ON CONFLICT (target_type, target_id) WHERE status = 'pending' DO NOTHING
+        RETURNING 1
+    ), t AS (
+        INSERT INTO search_tokens (token_hmac, target_type, target_id, created_at)
+        SELECT k.token_hmac, k.target_type, k.target_id, k.created_at FROM import_tokens_s k JOIN ins ON ins.id = k.target_id
+        WHERE k.target_type = '{kind}'
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+"""
+
+_AUTHOR = "JOIN import_refs a ON a.source = :source AND a.kind = 'user' AND a.ref = s.author_ref JOIN users u ON u.id = a.id"
+
+# imported users still holding the unusable password hash
+_UNCLAIMED = text(
+    """
+    SELECT r.ref, u.id, u.password_hash FROM import_refs r JOIN users u ON u.id = r.id
+    WHERE r.source = :source AND r.kind = 'user' AND r.ref > :after
+      AND u.password_hash = :unusable AND u.deleted_at IS NULL AND NOT u.is_banned
+    ORDER BY r.ref LIMIT :n
+    """
+)
+
+# staged rows whose author (or post) ref does not resolve, e.g. the content of a user rejected as email_exists
+_UNRESOLVED = "NOT EXISTS (SELECT 1 FROM import_refs a WHERE a.source = :source AND a.kind = '{kind}' AND a.ref = s.{field})"
+
+_LOAD_POSTS = text(
+    f"""
+    WITH ins AS (
+        INSERT INTO posts (id, author_id, body_ciphertext, body_nonce, created_at, status, toxicity_score, flags_count,
+                           reply_count, top_reply_votes)
+        SELECT s.id, u.id, s.body_ciphertext, s.body_nonce, s.created_at, 'visible', s.toxicity_score, 0, 0, 0
+        FROM import_posts_s s {_AUTHOR}
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    ) {_CONTENT_TAIL.format(kind="post", staging="import_posts_s")}
+    SELECT (SELECT count(*) FROM ins) AS inserted, (SELECT count(*) FROM q) AS review_items, (SELECT count(*) FROM t) AS search_tokens,
+           (SELECT count(*) FROM import_posts_s s WHERE {_UNRESOLVED.format(kind="user", field="author_ref")}) AS unresolved
+    """
+)
+
+_LOAD_REPLIES = text(
+    f"""
+    WITH ins AS (
+        INSERT INTO replies (id, post_id, author_id, body_ciphertext, body_nonce, created_at, status, toxicity_score, flags_count, kindness_votes)
+        SELECT s.id, p.id, u.id, s.body_ciphertext, s.body_nonce, s.created_at, 'visible', s.toxicity_score, 0, s.kindness_votes
+        FROM import_replies_s s
+        JOIN import_refs p ON p.source = :source AND p.kind = 'post' AND p.ref = s.post_ref
+        {_AUTHOR}
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id, post_id
+    ) {_CONTENT_TAIL.format(kind="reply", staging="import_replies_s")}
+    SELECT (SELECT count(*) FROM ins) AS inserted, (SELECT count(*) FROM q) AS review_items, (SELECT count(*) FROM t) AS search_tokens,
+           (SELECT count(*) FROM import_replies_s s
+            WHERE {_UNRESOLVED.format(kind="user", field="author_ref")} OR {_UNRESOLVED.format(kind="post", field="post_ref")}) AS unresolved,
+           (SELECT array_agg(DISTINCT post_id) FROM ins) AS post_ids
+    """
+)
+
+
+# -- preparation (runs in the pool processes) ---------------------------------------------------------------
+
+
+def _created_at(value) -> datetime:
+    # ids derive from the timestamp, so it must come from the file for replays to be idempotent (a user whose id
+    # changed between runs would collide with itself as email_exists)
+    if value is None:
+        raise ValueError("missing_created_at")
+    try:
+        ts = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError("bad_created_at") from None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _ref(rec: dict, field: str) -> str:
+    v = rec.get(field)
+    if v is None or v == "":
+        raise ValueError(f"missing_{field}")
+    v = str(v)
+    if len(v) > 128:
+        raise ValueError(f"{field}_too_long")
+    return v
+
+
+def prepare_batch(source: str, first_line: int, lines: list[str]) -> dict:
+    """Parse, moderate, encrypt and tokenize one batch; returns COPY-ready records per staging table."""
+    started = time.perf_counter()
+    out: dict = {name: [] for name in COLUMNS}
+    staged: Counter = Counter()
+    rejected: Counter = Counter()
+    samples: list[tuple[int, str]] = []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+            kind = rec.get("type")
+            if kind not in KINDS:
+                raise ValueError("unknown_type")
+            ref = _ref(rec, "ref")
+            ts = _created_at(rec.get("created_at"))
+            rid = uuid7_derived(ts, f"{source}\0{kind}\0{ref}")
+            if kind == "user":
+                email = str(rec.get("email") or "").strip()
+                if "@" not in email:
+                    raise ValueError("invalid_email")
+                ct, nonce = crypto.encrypt_text(email)
+                out["import_users_s"].append((rid, ref, crypto.email_lookup(email), ct, nonce, ts, first_line + i + 1))
+            else:
+                body = str(rec.get("body") or "")
+                mod = quick_moderation(body)
+                if not mod.allow:
+                    raise ValueError("blocked_" + "_".join(mod.reasons))
+                ct, nonce = crypto.encrypt_text(body)
+                review_id = uuid7() if mod.risk >= 0.6 else None
+                if kind == "post":
+                    out["import_posts_s"].append((rid, ref, _ref(rec, "author"), ct, nonce, ts, mod.risk, review_id))
+                else:
+                    votes = rec.get("kindness_votes") or 0
+                    if not isinstance(votes, int) or votes < 0:
+                        raise ValueError("bad_kindness_votes")
+                    out["import_replies_s"].append((rid, ref, _ref(rec, "post"), _ref(rec, "author"), ct, nonce, ts, mod.risk, votes, review_id))
+                out["import_tokens_s"].extend((token_hmac(t), kind, rid, ts) for t in tokenize(body))
+        except json.JSONDecodeError:
+            reason = "invalid_json"
+        except AttributeError:  # valid JSON, but not an object
+            reason = "not_an_object"
+        except ValueError as e:
+            reason = str(e)
+        else:
+            staged[kind] += 1
+            continue
+        rejected[reason] += 1
+        if len(samples) < MAX_REJECT_SAMPLES:
+            samples.append((first_line + i + 1, reason))
+    out.update(lines=len(lines), staged=dict(staged), rejected=dict(rejected), samples=samples, prepare_ms=(time.perf_counter() - started) * 1000.0)
+    return out
+
+
+# -- loading (the job's event loop) -------------------------------------------------------------------------
+
+
+async def _copy(db: AsyncSession, table: str, records: list[tuple]) -> None:
+    if not records:
+        return
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table, records=records, columns=COLUMNS[table])
+
+
+async def _load_batch(job_id, source: str, batch: dict, checkpoint: dict, progress: dict) -> tuple[dict[str, int], dict[str, int], list]:
+    """Load one prepared batch; returns inserted counts, rows rejected at load time and their samples (line, reason)."""
+    from app.services.auth import UNUSABLE_PASSWORD
+
+    counts: Counter = Counter()
+    rejected: Counter = Counter()
+    samples: list[list] = []
+    async with AsyncSessionLocal() as db:
+        for ddl in _STAGING:
+            await db.execute(text(ddl))
+        for table in COLUMNS:
+            await _copy(db, table, batch[table])
+        if batch["import_users_s"]:
+            r = (await db.execute(_LOAD_USERS, {"source": source, "unusable": UNUSABLE_PASSWORD, "samples": MAX_REJECT_SAMPLES})).one()
+            counts["user"] = r.inserted
+            rejected["email_exists"] += r.collisions
+            samples = [[line, "email_exists"] for line in r.collision_lines or []]
+        if batch["import_posts_s"]:
+            r = (await db.execute(_LOAD_POSTS, {"source": source})).one()
+            counts.update(post=r.inserted, review_items=r.review_items, search_tokens=r.search_tokens)
+            rejected["unresolved_ref"] += r.unresolved
+        if batch["import_replies_s"]:
+            r = (await db.execute(_LOAD_REPLIES, {"source": source})).one()
+            counts.update(reply=r.inserted, review_items=r.review_items, search_tokens=r.search_tokens)
+            rejected["unresolved_ref"] += r.unresolved
+            await refresh_summaries(db, r.post_ids or [])
+        # checkpoint in the same transaction as the rows it covers
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(checkpoint=checkpoint, progress=progress, heartbeat_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+    return counts, +rejected, samples
+
+
+def _open(path: str) -> IO[str]:
+    with open(path, "rb") as fh:
+        gz = fh.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rt", encoding="utf-8") if gz else open(path, "r", encoding="utf-8")
+
+
+def _read(fh: IO[str], n: int) -> list[str]:
+    out = []
+    for line in fh:
+        out.append(line)
+        if len(out) >= n:
+            break
+    return out
+
+
+def _skip(fh: IO[str], n: int) -> None:
+    for _ in range(n):
+        if not fh.readline():
+            return
+
+
+def _merge(progress: dict, key: str, counts: dict) -> None:
+    acc = Counter(progress.get(key, {}))
+    acc.update(counts)
+    progress[key] = dict(acc)
+
+
+@job_handler("import")
+async def run_import(job: Job, ctx: JobContext) -> None:
+    path, source = job.params["path"], job.params["source"]
+    n = settings.import_batch_size
+    workers = settings.import_workers or max(1, available_cores() - 1)
+    line = int(ctx.checkpoint.get("line", 0))
+    progress = dict(ctx.progress, source=source, workers=workers)
+    started, first_line = time.monotonic(), line
+    loop = asyncio.get_running_loop()
+
+    fh = await asyncio.to_thread(_open, path)
+    # spawn, not fork: the job may share its process with an event loop, pools and threads
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        await asyncio.to_thread(_skip, fh, line)
+        inflight: deque[asyncio.Future] = deque()
+        offset, eof = line, False  # offset: first line of the next batch read
+        while inflight or not eof:
+            # keep every preparation process busy while earlier batches load
+            while not eof and len(inflight) < workers * 2:
+                lines = await asyncio.to_thread(_read, fh, n)
+                if not lines:
+                    eof = True
+                    break
+                inflight.append(loop.run_in_executor(pool, prepare_batch, source, offset, lines))
+                offset += len(lines)
+            if not inflight:
+                break
+            batch = await inflight.popleft()
+            line += batch["lines"]
+            t0 = time.perf_counter()
+            _merge(progress, "staged", batch["staged"])
+            _merge(progress, "rejected", batch["rejected"])
+            progress["reject_samples"] = (progress.get("reject_samples", []) + [list(s) for s in batch["samples"]])[:MAX_REJECT_SAMPLES]
+            elapsed = time.monotonic() - started
+            progress.update(line=line, elapsed_s=round(elapsed, 1), lines_per_s=round((line - first_line) / elapsed, 1) if elapsed else None)
+            counts, rejected, samples = await _load_batch(job.id, source, batch, {"line": line}, progress)
+            _merge(progress, "inserted", counts)
+            if rejected:
+                _merge(progress, "rejected", rejected)
+                progress["reject_samples"] = (progress["reject_samples"] + samples)[:MAX_REJECT_SAMPLES]
+            load_ms = (time.perf_counter() - t0) * 1000.0
+            progress["prepare_ms"] = round(progress.get("prepare_ms", 0.0) + batch["prepare_ms"], 1)
+            progress["load_ms"] = round(progress.get("load_ms", 0.0) + load_ms, 1)
+            ctx.checkpoint, ctx.progress = {"line": line}, dict(progress)
+            log.info("import_batch", job_id=str(job.id), line=line, lines_per_s=progress["lines_per_s"], load_ms=round(load_ms, 1), **counts)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        fh.close()
+
+    # inserted counts are written with the next batch; persist the final ones
+    await ctx.save(progress=dict(progress, step="done"))
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(settings.import_dir):
+        os.remove(path)  # uploaded through /admin/import; files given to the CLI stay where they are
+    log.info("import_done", job_id=str(job.id), **{k: v for k, v in progress.items() if k != "reject_samples"})
+
+
+async def _enqueue_and_run(path: str, source: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        job = await enqueue(db, "import", params={"path": path, "source": source})
+        await db.commit()
+    await run_job(job.id)
+    async with AsyncSessionLocal() as db:
+        job = await db.get(Job, job.id)
+        return {"job_id": str(job.id), "status": job.status, "progress": job.progress}
+
+
+async def claim_tokens(source: str, n: int = 1000) -> AsyncIterator[dict]:
+    """One claim token per imported user of `source` that has not set a password yet, in ref order."""
+    from app.services.auth import UNUSABLE_PASSWORD, create_reset_token
+
+    ttl = timedelta(days=settings.import_claim_token_days)
+    after = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_UNCLAIMED, {"source": source, "after": after, "unusable": UNUSABLE_PASSWORD, "n": n})).all()
+        for r in rows:
+            yield {"ref": r.ref, "token": create_reset_token(str(r.id), r.password_hash, ttl)}
+        if len(rows) < n:
+            return
+        after = rows[-1].ref
+
+
+async def _print_claim_tokens(source: str) -> None:
+    async for claim in claim_tokens(source):
+        print(json.dumps(claim))
+
+
+def main() -> None:
+    # python -m app.services.importer FILE --source NAME  (one run; resume a failed one with `python -m app.worker --kind import`)
+    # python -m app.services.importer --source NAME --claim-tokens > claims.ndjson  (one {"ref", "token"} line per unclaimed user)
+    parser = argparse.ArgumentParser(description="bulk import users, posts and replies from NDJSON")
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--source", required=True, help="name of the source platform (scopes the record refs)")
+    parser.add_argument("--claim-tokens", action="store_true", help="print claim tokens for the source's unclaimed users instead of importing")
+    args = parser.parse_args()
+    if not args.claim_tokens and not args.path:
+        parser.error("path is required unless --claim-tokens is given")
+    configure_logging()
+    if args.claim_tokens:
+        asyncio.run(_print_claim_tokens(args.source))
+    else:
+        print(json.dumps(asyncio.run(_enqueue_and_run(args.path, args.source)), default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import log
+from app.core.settings import settings
+from app.db.ids import uuid7
+from app.db.session import AsyncSessionLocal
+from app.models import Job
+
+# Minimal DB-backed job runner. A job row is the source of truth for status, progress and the resume
+# checkpoint; it runs either inline in the API process (BackgroundTasks) or in `python -m app.worker`.
+# A job whose heartbeat is older than the lease is considered orphaned and is reclaimed by a worker.
+# Inline runs retry in place with backoff (there may be no worker to pick a requeued job up); endpoints that
+# reuse an in-flight job check is_stale() first, so a job orphaned by a crashed API process is replaced.
+
+JobHandler = Callable[[Job, "JobContext"], Awaitable[None]]
+HANDLERS: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    def deco(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        return fn
+    return deco
+
+
+class JobContext:
+    def __init__(self, job: Job) -> None:
+        self.job_id = job.id
+        self.progress: dict = dict(job.progress or {})
+        self.checkpoint: dict = dict(job.checkpoint or {})
+        self.result_path: str | None = None
+
+    async def save(self, progress: dict | None = None, checkpoint: dict | None = None) -> None:
+        # Short transaction of its own: doubles as the lease heartbeat.
+        if progress is not None:
+            self.progress = progress
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == self.job_id)
+                .values(progress=self.progress, checkpoint=self.checkpoint, heartbeat_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+
+async def enqueue(db: AsyncSession, kind: str, user_id: UUID | None = None, params: dict | None = None) -> Job:
+    # Caller commits (so the job can share the transaction that motivated it).
+    job = Job(id=uuid7(), kind=kind, user_id=user_id, status="queued", params=params or {}, progress={}, checkpoint={}, attempts=0, created_at=datetime.now(timezone.utc))
+    db.add(job)
+    return job
+
+
+async def _claim(job_id: UUID | None = None, kinds: list[str] | None = None) -> Job | None:
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.jobs_lease_seconds)
+    async with AsyncSessionLocal() as db:
+        q = select(Job.id).where(
+            or_(Job.status == "queued", and_(Job.status == "running", Job.heartbeat_at < stale)),
+            Job.attempts < settings.jobs_max_attempts,
+        )
+        if job_id is not None:
+            q = q.where(Job.id == job_id)
+        if kinds:
+            q = q.where(Job.kind.in_(kinds))
+        q = q.order_by(Job.created_at.asc()).limit(1).with_for_update(skip_locked=True)
+        jid = (await db.execute(q)).scalar_one_or_none()
+        if jid is None:
+            return None
+        job = (
+            await db.execute(
+                update(Job)
+                .where(Job.id == jid)
+                .values(status="running", started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+                .returning(Job)
+            )
+        ).scalar_one()
+        await db.commit()
+        return job
+
+
+async def _finish(job_id: UUID, status: str, ctx: JobContext, error: str | None = None) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status=status,
+                progress=ctx.progress,
+                checkpoint=ctx.checkpoint,
+                result_path=ctx.result_path,
+                error=error,
+                finished_at=datetime.now(timezone.utc),
+                heartbeat_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+
+
+def is_stale(job: Job, now: datetime | None = None) -> bool:
+    """Queued or running, but nothing has touched it within the lease: its runner is gone."""
+    if job.status not in ("queued", "running"):
+        return False
+    now = now or datetime.now(timezone.utc)
+    return (job.heartbeat_at or job.created_at) < now - timedelta(seconds=settings.jobs_lease_seconds)
+
+
+async def abandon(db: AsyncSession, job: Job) -> None:
+    # Caller commits. Only flips a job that is still stale, so a runner that just woke up keeps it.
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.jobs_lease_seconds)
+    await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status.in_(("queued", "running")), or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale))
+        .values(status="failed", error="abandoned", finished_at=datetime.now(timezone.utc))
+    )
+
+
+def _backoff(attempts: int) -> float:
+    # stays under the lease so a job waiting for its retry never looks stale
+    return min(settings.jobs_retry_backoff_seconds * 2 ** max(attempts - 1, 0), settings.jobs_lease_seconds / 2)
+
+
+async def _execute(job: Job) -> str:
+    handler = HANDLERS.get(job.kind)
+    ctx = JobContext(job)
+    if handler is None:
+        await _finish(job.id, "failed", ctx, error=f"no handler for {job.kind}")
+        return "failed"
+    try:
+        await handler(job, ctx)
+    except Exception as e:
+        log.warning("job_failed", job_id=str(job.id), kind=job.kind, attempt=job.attempts, error=type(e).__name__)
+        # Back to queued so it is retried (inline or by a worker) from its checkpoint, until attempts run out.
+        status = "failed" if job.attempts >= settings.jobs_max_attempts else "queued"
+        await _finish(job.id, status, ctx, error=type(e).__name__)
+        return status
+    await _finish(job.id, "done", ctx)
+    return "done"
+
+
+async def run_job(job_id: UUID) -> None:
+    # Inline entrypoint (BackgroundTasks). No-op if a worker already claimed it; a failed attempt is retried here
+    # after a backoff, unless a worker claims it first, and ends in "failed" once attempts run out.
+    while (job := await _claim(job_id=job_id)) is not None:
+        if await _execute(job) != "queued":
+            return
+        await asyncio.sleep(_backoff(job.attempts))
+
+
+async def run_worker(kinds: list[str] | None = None, poll_seconds: float = 1.0, stop: asyncio.Event | None = None) -> None:
+    while stop is None or not stop.is_set():
+        job = await _claim(kinds=kinds)
+        if job is None:
+            await asyncio.sleep(poll_seconds)
+            continue
+        await _execute(job)
+
+
+async def sweep(kinds: list[str], stop: asyncio.Event | None = None) -> None:
+    # For API processes when no worker may be deployed: once per lease, run the jobs of `kinds` still queued or
+    # whose runner died (stale heartbeat). Claims skip jobs another process holds.
+    while stop is None or not stop.is_set():
+        try:
+            while (job := await _claim(kinds=kinds)) is not None:
+                await _execute(job)
+        except Exception as e:
+            log.warning("job_sweep_failed", kinds=kinds, error=type(e).__name__)
+        await asyncio.sleep(settings.jobs_lease_seconds)
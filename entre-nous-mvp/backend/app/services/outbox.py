@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import orjson
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import log
+from app.core.redis import get_async_redis
+from app.core.settings import settings
+from app.db.ids import uuid7
+from app.db.session import AsyncSessionLocal
+from app.models import OutboxEvent
+
+# Transactional outbox. Handlers call emit() in the transaction of the change, so an event exists iff the change
+# committed. The relay moves unpublished rows, oldest first, to one Redis stream per event type (events:<type>)
+# and marks them published; a crash between XADD and the commit publishes a batch twice, so consumers get
+# at-least-once delivery and dedupe on `event_id` where it matters. Several relays can run (SKIP LOCKED), at the
+# cost of strict ordering across batches.
+
+STREAM_PREFIX = "events:"
+
+
+def stream_key(event_type: str) -> str:
+    return f"{STREAM_PREFIX}{event_type}"
+
+
+async def emit(db: AsyncSession, event_type: str, aggregate_id: UUID, **payload) -> None:
+    # Caller commits. Payload values must be JSON-serialisable; UUIDs are stringified.
+    db.add(
+        OutboxEvent(
+            id=uuid7(),
+            event_type=event_type,
+            aggregate_id=aggregate_id,
+            payload={k: str(v) if isinstance(v, UUID) else v for k, v in payload.items()},
+            created_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+async def relay_once(n: int | None = None) -> int:
+    n = n or settings.outbox_relay_batch
+    async with AsyncSessionLocal() as db:
+        rows = (
+            await db.execute(
+                select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.aggregate_id, OutboxEvent.payload, OutboxEvent.created_at)
+                .where(OutboxEvent.published_at.is_(None))
+                .order_by(OutboxEvent.id)
+                .limit(n)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not rows:
+            return 0
+        pipe = get_async_redis().pipeline(transaction=False)
+        for r in rows:
+            fields = {
+                "event_id": str(r.id),
+                "type": r.event_type,
+                "aggregate_id": str(r.aggregate_id),
+                "payload": orjson.dumps(r.payload).decode("utf-8"),
+                "created_at": r.created_at.isoformat(),
+            }
+            pipe.xadd(stream_key(r.event_type), fields, maxlen=settings.events_stream_maxlen, approximate=True)
+        await pipe.execute()
+        await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([r.id for r in rows]))
+            .values(published_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return len(rows)
+
+
+async def prune_published(n: int = 5000) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.outbox_retention_hours)
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = select(OutboxEvent.id).where(OutboxEvent.published_at < cutoff).limit(n).scalar_subquery()
+            deleted = (await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))).rowcount
+            await db.commit()
+        total += deleted
+        if deleted < n:
+            return total
+
+
+async def expire_unpublished(n: int = 5000) -> int:
+    # Hard cap for deployments without a relay: rows nobody published within OUTBOX_UNPUBLISHED_MAX_HOURS are dropped
+    # (the purge logs how many). Rows a relay is publishing right now are skipped.
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.outbox_unpublished_max_hours)
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (
+                select(OutboxEvent.id)
+                .where(OutboxEvent.published_at.is_(None), OutboxEvent.created_at < cutoff)
+                .order_by(OutboxEvent.id)
+                .limit(n)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            deleted = (await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))).rowcount
+            await db.commit()
+        total += deleted
+        if deleted < n:
+            return total
+
+
+async def run_relay(stop: asyncio.Event | None = None, prune_every_seconds: float = 300.0) -> None:
+    poll = settings.outbox_relay_poll_ms / 1000.0
+    next_prune = 0.0
+    loop = asyncio.get_running_loop()
+    while stop is None or not stop.is_set():
+        try:
+            sent = await relay_once()
+            if loop.time() >= next_prune:
+                pruned = await prune_published()
+                if pruned:
+                    log.info("outbox_pruned", rows=pruned)
+                next_prune = loop.time() + prune_every_seconds
+        except Exception as e:
+            # Postgres or Redis away: nothing was marked published, retry after a pause
+            log.warning("outbox_relay_failed", error=type(e).__name__)
+            sent = 0
+            await asyncio.sleep(1.0)
+        if sent < settings.outbox_relay_batch:
+            await asyncio.sleep(poll)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import configure_logging, log
+from app.core.settings import settings
+from app.db.session import AsyncSessionLocal
+from app.models import DMMessage, Job, ModerationFlag, ModerationQueueItem, Post, Reply
+from app.services.export import export_expired
+from app.services.flags import drop as drop_flag_aggregates
+from app.services.jobs import JobContext, enqueue, job_handler, run_job
+from app.services.outbox import expire_unpublished, prune_published
+from app.services.search import deindex
+
+# Retention purge: hard-deletes content that has been in status "removed" for more than PURGE_RETENTION_DAYS
+# (counted from removed_at, so freshly removed old content still gets the full window for appeals), together
+# with everything that points at it (flags and their aggregates, queue items, search index entries). Each table is
+# walked in id order over a partial index on removed rows, PURGE_CHUNK_SIZE rows per short transaction with a pause
+# in between; the checkpoint is the last id per table. Replies go first, so a post batch only has to take along the
+# (rare) still-visible replies of a removed post, which the FK cascade would otherwise delete without their dependents.
+# Expired export files, published outbox rows past OUTBOX_RETENTION_HOURS and unpublished ones past
+# OUTBOX_UNPUBLISHED_MAX_HOURS are cleaned up at the end of the run.
+
+STEPS: list[tuple[str, type]] = [("reply", Reply), ("dm", DMMessage), ("post", Post)]
+
+
+async def _drop_dependents(db: AsyncSession, target_type: str, ids: list[UUID]) -> dict[str, int]:
+    flags = await db.execute(delete(ModerationFlag).where(ModerationFlag.target_type == target_type, ModerationFlag.target_id.in_(ids)))
+    queue = await db.execute(delete(ModerationQueueItem).where(ModerationQueueItem.target_type == target_type, ModerationQueueItem.target_id.in_(ids)))
+    aggregates = await drop_flag_aggregates(db, target_type, ids)
+    if target_type in ("post", "reply"):
+        await deindex(db, target_type, ids)
+    return {"flags": flags.rowcount, "flag_aggregates": aggregates, "queue_items": queue.rowcount}
+
+
+async def _purge_chunk(kind: str, model, cutoff: datetime, after: str | None, n: int) -> tuple[list[UUID], dict[str, int]]:
+    counts = {"flags": 0, "flag_aggregates": 0, "queue_items": 0, "cascaded_replies": 0}
+    async with AsyncSessionLocal() as db:
+        q = select(model.id).where(model.status == "removed", model.removed_at < cutoff).order_by(model.id).limit(n)
+        if after:
+            q = q.where(model.id > UUID(after))
+        ids = list((await db.execute(q)).scalars())
+        if ids:
+            for k, v in (await _drop_dependents(db, kind, ids)).items():
+                counts[k] += v
+            if kind == "post":
+                orphans = list((await db.execute(delete(Reply).where(Reply.post_id.in_(ids)).returning(Reply.id))).scalars())
+                if orphans:
+                    for k, v in (await _drop_dependents(db, "reply", orphans)).items():
+                        counts[k] += v
+                    counts["cascaded_replies"] = len(orphans)
+            await db.execute(delete(model).where(model.id.in_(ids)))
+            await db.commit()
+    return ids, counts
+
+
+async def _purge_expired_exports() -> int:
+    async with AsyncSessionLocal() as db:
+        jobs = (await db.execute(select(Job).where(Job.kind == "export", Job.result_path.is_not(None)))).scalars().all()
+        expired = [j for j in jobs if export_expired(j)]
+        for j in expired:
+            try:
+                os.remove(j.result_path)
+            except FileNotFoundError:
+                pass
+        if expired:
+            await db.execute(update(Job).where(Job.id.in_([j.id for j in expired])).values(result_path=None))
+            await db.commit()
+    return len(expired)
+
+
+@job_handler("purge")
+async def run_purge(job: Job, ctx: JobContext) -> None:
+    days = (job.params or {}).get("retention_days", settings.purge_retention_days)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    n = settings.purge_chunk_size
+    pause = settings.purge_pause_ms / 1000.0
+    progress = dict(ctx.progress, retention_days=days)
+
+    for kind, model in STEPS:
+        last = ctx.checkpoint.get(kind)
+        while last != "done":
+            ids, counts = await _purge_chunk(kind, model, cutoff, last, n)
+            progress[kind] = progress.get(kind, 0) + len(ids)
+            for k, v in counts.items():
+                progress[k] = progress.get(k, 0) + v
+            last = str(ids[-1]) if len(ids) == n else "done"
+            await ctx.save(progress=progress, checkpoint=dict(ctx.checkpoint, **{kind: last}))
+            if last != "done":
+                await asyncio.sleep(pause)
+
+    progress["export_files"] = await _purge_expired_exports()
+    # the relay prunes published rows too; where no relay runs nothing gets published, so unpublished rows past
+    # OUTBOX_UNPUBLISHED_MAX_HOURS are dropped to keep the outbox bounded
+    progress["outbox_events"] = await prune_published()
+    progress["outbox_unpublished_dropped"] = await expire_unpublished()
+    if progress["outbox_unpublished_dropped"]:
+        log.warning("outbox_unpublished_dropped", rows=progress["outbox_unpublished_dropped"])
+    ctx.progress = progress
+    log.info("purge_done", job_id=str(job.id), **progress)
+
+
+async def _enqueue_and_run(retention_days: int | None) -> dict:
+    async with AsyncSessionLocal() as db:
+        job = await enqueue(db, "purge", params={"retention_days": retention_days} if retention_days is not None else None)
+        await db.commit()
+    await run_job(job.id)
+    async with AsyncSessionLocal() as db:
+        job = await db.get(Job, job.id)
+        return {"job_id": str(job.id), "status": job.status, "progress": job.progress}
+
+
+def main() -> None:
+    # python -m app.services.purge [--retention-days 30]  (cron entry point; one run, prints rows purged)
+    parser = argparse.ArgumentParser(description="hard-delete removed content past its retention")
+    parser.add_argument("--retention-days", type=int, default=None)
+    args = parser.parse_args()
+    configure_logging()
+    print(asyncio.run(_enqueue_and_run(args.retention_days)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlalchemy import Table, bindparam, func, or_, select, update
+from sqlalchemy.sql import ColumnElement
+
+from app.core.settings import settings
+from app.db.session import AsyncSessionLocal
+from app.models import Job, User, Post, Reply, DMMessage, SessionEvent, IpBan
+from app.services.crypto import crypto
+from app.services.envelope import ENVELOPE_V2
+from app.services.jobs import JobContext, job_handler
+
+# Online re-encryption: rewrites every encrypted column into the current envelope under the active key
+# (envelope upgrades and key rotation alike). Each (table, column pair) is walked in primary-key order in
+# chunks; a chunk is batch-decrypted + re-encrypted in a worker thread and written back with one executemany
+# UPDATE guarded on the old ciphertext, so a row changed concurrently (e.g. last_ip on login) is simply left
+# for the next pass. The checkpoint is the last id per column, and the walk is throttled to
+# REENCRYPT_ROWS_PER_SECOND so it can run under full traffic.
+
+
+@dataclass(frozen=True)
+class EncryptedColumn:
+    name: str
+    table: Table
+    ct: str
+    nonce: str
+
+    def stale(self, kid: int) -> ColumnElement[bool]:
+        # legacy rows keep their nonce in the side column; envelopes leave it empty (NULL = no value at all).
+        # Anything that is not a v2 envelope under `kid` needs rewriting.
+        ct = self.table.c[self.ct]
+        return or_(
+            func.octet_length(self.table.c[self.nonce]) > 0,
+            func.get_byte(ct, 0) != ENVELOPE_V2,
+            func.get_byte(ct, 1) != kid,
+        )
+
+
+ENCRYPTED_COLUMNS: list[EncryptedColumn] = [
+    EncryptedColumn("users.email", User.__table__, "email_ciphertext", "email_nonce"),
+    EncryptedColumn("users.last_ip", User.__table__, "last_ip_ciphertext", "last_ip_nonce"),
+    EncryptedColumn("posts.body", Post.__table__, "body_ciphertext", "body_nonce"),
+    EncryptedColumn("replies.body", Reply.__table__, "body_ciphertext", "body_nonce"),
+    EncryptedColumn("dm_messages.body", DMMessage.__table__, "body_ciphertext", "body_nonce"),
+    EncryptedColumn("session_events.ip", SessionEvent.__table__, "ip_ciphertext", "ip_nonce"),
+    EncryptedColumn("ip_bans.ip", IpBan.__table__, "ip_ciphertext", "ip_nonce"),
+]
+
+
+def _reencode(rows) -> list[dict]:
+    out = []
+    for rid, ct, nonce in rows:
+        new_ct, new_nonce = crypto.encrypt_text(crypto.decrypt_text(ct, nonce))
+        out.append({"_id": rid, "_old": ct, "_ct": new_ct, "_nonce": new_nonce})
+    return out
+
+
+async def rewrite_column(col: EncryptedColumn, ctx: JobContext, needs_rewrite: ColumnElement[bool]) -> None:
+    t = col.table
+    chunk = settings.reencrypt_chunk_size
+    rate = settings.reencrypt_rows_per_second
+    stmt = (
+        update(t)
+        .where(t.c.id == bindparam("_id"), t.c[col.ct] == bindparam("_old"))
+        .values({col.ct: bindparam("_ct"), col.nonce: bindparam("_nonce")})
+    )
+    last = ctx.checkpoint.get(col.name)
+    while last != "done":
+        started = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            q = select(t.c.id, t.c[col.ct], t.c[col.nonce]).where(needs_rewrite).order_by(t.c.id).limit(chunk)
+            if last:
+                q = q.where(t.c.id > UUID(last))
+            rows = (await db.execute(q)).all()
+            if rows:
+                params = await asyncio.to_thread(_reencode, rows)
+                await db.execute(stmt, params)
+                await db.commit()
+        ctx.progress[col.name] = ctx.progress.get(col.name, 0) + len(rows)
+        last = str(rows[-1][0]) if len(rows) == chunk else "done"
+        await ctx.save(checkpoint=dict(ctx.checkpoint, **{col.name: last}))
+        if last != "done" and rate > 0:
+            # keep the average at `rate` rows/s: a chunk of n rows "costs" n / rate seconds
+            await asyncio.sleep(max(0.0, len(rows) / rate - (time.monotonic() - started)))
+
+
+@job_handler("reencrypt")
+async def run_reencrypt(job: Job, ctx: JobContext) -> None:
+    kid = crypto.active_kid
+    ctx.progress["target_kid"] = kid
+    for col in ENCRYPTED_COLUMNS:
+        await rewrite_column(col, ctx, col.stale(kid))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.settings import settings
+from app.db.ids import uuid7
+from app.models import DMMessage, ModerationQueueItem, Post, Reply, User
+from app.services import flags
+from app.services.crypto import crypto
+from app.services.outbox import emit
+from app.services.search import deindex, index_content
+from app.services.threads import refresh_summaries
+
+# Human review queue (layer 3).
+# - One pending item per target (partial unique index); re-enqueueing only raises its priority.
+# - Reviewers claim batches with SELECT ... FOR UPDATE SKIP LOCKED and hold them under a lease, so parallel
+#   reviewers never see the same items; an expired lease puts the items back up for grabs.
+# - Decisions are applied in bulk, one UPDATE per (target table, outcome), in the caller's transaction, together
+#   with the search index, the thread summaries of affected posts, the targets' flag aggregates (resolved) and one
+#   moderation.decided event per item.
+# - Items can also target an account ("user", from the ban-evasion job): rejecting one bans the account.
+
+CONTENT_MODELS = {"post": Post, "reply": Reply, "dm": DMMessage}
+
+
+async def enqueue_review(db: AsyncSession, target_type: str, target_id: UUID, priority: int, notes: str | None = None) -> None:
+    stmt = insert(ModerationQueueItem).values(
+        id=uuid7(),
+        target_type=target_type,
+        target_id=target_id,
+        priority=priority,
+        status="pending",
+        notes=notes,
+        created_at=datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ModerationQueueItem.target_type, ModerationQueueItem.target_id],
+        index_where=text("status = 'pending'"),
+        set_={
+            "priority": func.least(ModerationQueueItem.priority, stmt.excluded.priority),
+            "notes": func.coalesce(stmt.excluded.notes, ModerationQueueItem.notes),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def claim(db: AsyncSession, reviewer: str, n: int) -> list[ModerationQueueItem]:
+    now = datetime.now(timezone.utc)
+    candidates = (
+        select(ModerationQueueItem.id)
+        .where(
+            ModerationQueueItem.status == "pending",
+            or_(ModerationQueueItem.lease_expires_at.is_(None), ModerationQueueItem.lease_expires_at < now),
+        )
+        .order_by(ModerationQueueItem.priority.asc(), ModerationQueueItem.created_at.asc())
+        .limit(n)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    res = await db.execute(
+        update(ModerationQueueItem)
+        .where(ModerationQueueItem.id.in_(candidates))
+        .values(claimed_by=reviewer, lease_expires_at=now + timedelta(seconds=settings.moderation_lease_seconds))
+        .returning(ModerationQueueItem)
+        .execution_options(synchronize_session=False)
+    )
+    items = list(res.scalars().all())
+    items.sort(key=lambda i: (i.priority, i.created_at))
+    return items
+
+
+async def apply_decisions(db: AsyncSession, decisions: dict[UUID, str], reviewer: str | None) -> tuple[dict[str, list], set[UUID]]:
+    """Apply approve/reject outcomes; caller commits.
+
+    Returns the applied/skipped item ids and the posts whose threads changed (for cache invalidation after commit).
+    """
+    now = datetime.now(timezone.utc)
+    items = (
+        await db.execute(
+            select(ModerationQueueItem)
+            .where(ModerationQueueItem.id.in_(list(decisions)), ModerationQueueItem.status == "pending")
+            .with_for_update()
+        )
+    ).scalars().all()
+
+    applied: list[ModerationQueueItem] = []
+    skipped: dict[str, str] = {str(i): "not_pending" for i in decisions}
+    for item in items:
+        leased_to_other = item.claimed_by not in (None, reviewer) and item.lease_expires_at is not None and item.lease_expires_at > now
+        if leased_to_other:
+            skipped[str(item.id)] = "leased_to_other_reviewer"
+            continue
+        skipped.pop(str(item.id), None)
+        applied.append(item)
+
+    # target ids per (type, outcome) and queue ids per outcome -> one UPDATE each
+    targets: dict[tuple[str, str], list[UUID]] = defaultdict(list)
+    queue_ids: dict[str, list[UUID]] = defaultdict(list)
+    for item in applied:
+        d = decisions[item.id]
+        targets[(item.target_type, d)].append(item.target_id)
+        queue_ids[d].append(item.id)
+
+    threads: set[UUID] = set()
+    for (target_type, d), ids in targets.items():
+        if target_type == "user":
+            # account items (ban evasion): reject bans the account, approve clears it
+            if d == "reject":
+                await db.execute(
+                    update(User).where(User.id.in_(ids), User.deleted_at.is_(None)).values(is_banned=True).execution_options(synchronize_session=False)
+                )
+            continue
+        model = CONTENT_MODELS.get(target_type)
+        if model is None:
+            continue
+        await flags.resolve(db, target_type, ids)
+        # removed_at starts the purge window; approving (e.g. on appeal) takes the item back out of it
+        if d == "approve":
+            stmt = update(model).where(model.id.in_(ids)).values(status="visible", removed_at=None)
+        else:
+            stmt = update(model).where(model.id.in_(ids)).values(status="removed", removed_at=func.now())
+        if target_type == "reply":
+            threads.update((await db.execute(stmt.returning(Reply.post_id).execution_options(synchronize_session=False))).scalars())
+        else:
+            await db.execute(stmt.execution_options(synchronize_session=False))
+        if target_type in ("post", "reply"):
+            await _sync_search_index(db, target_type, model, ids, d)
+    await refresh_summaries(db, threads)
+
+    for item in applied:
+        await emit(db, "moderation.decided", item.target_id, target_type=item.target_type, decision=decisions[item.id], item_id=item.id)
+
+    for d, ids in queue_ids.items():
+        await db.execute(
+            update(ModerationQueueItem)
+            .where(ModerationQueueItem.id.in_(ids))
+            .values(status="approved" if d == "approve" else "rejected", decided_at=now, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    return {"applied": [str(i.id) for i in applied], "skipped": [{"id": k, "reason": v} for k, v in skipped.items()]}, threads
+
+
+async def _sync_search_index(db: AsyncSession, target_type: str, model, ids: list[UUID], decision: str) -> None:
+    # Removed content leaves the search index; approved content is (re)indexed.
+    if decision != "approve":
+        await deindex(db, target_type, ids)
+        return
+    rows = (await db.execute(select(model.id, model.body_ciphertext, model.body_nonce, model.created_at).where(model.id.in_(ids)))).all()
+    for r in rows:
+        await index_content(db, target_type, r.id, crypto.decrypt_text(r.body_ciphertext, r.body_nonce), r.created_at)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import re
+import unicodedata
+from datetime import datetime
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import and_, select, delete, func, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.settings import settings
+from app.db.session import AsyncSessionLocal
+from app.models import Job, Post, Reply, SearchToken, User
+from app.services.crypto import crypto
+from app.services.jobs import JobContext, job_handler
+
+# Blind-index keyword search. Bodies are tokenized (lowercased, accents folded), each token is HMAC'd with a
+# dedicated pepper and stored in `search_tokens`. A query is tokenized the same way; posting lists are
+# intersected in SQL, filtered by content status and author, and only the requested page is fetched and decrypted.
+# Leaks: which items share a token and posting-list sizes (to someone holding the DB, not the pepper).
+
+MAX_TOKENS_PER_DOC = 200
+MAX_QUERY_TOKENS = 8
+
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "ou", "en", "au", "aux", "ce", "ces", "je", "tu", "il",
+    "elle", "on", "nous", "vous", "ils", "elles", "que", "qui", "ne", "pas", "se", "sa", "son", "ses", "mon", "ma",
+    "mes", "pour", "par", "sur", "dans", "avec", "est", "the", "and", "or", "of", "to", "in", "is", "it", "an",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    seen: dict[str, None] = {}
+    for w in _WORD.findall(folded):
+        if len(w) < 2 or w in STOPWORDS:
+            continue
+        seen.setdefault(w, None)
+        if len(seen) >= MAX_TOKENS_PER_DOC:
+            break
+    return list(seen)
+
+
+def token_hmac(token: str) -> str:
+    pepper = settings.search_index_pepper.encode("utf-8")
+    return hmac.new(pepper, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+async def index_content(db: AsyncSession, target_type: str, target_id: UUID, text: str, created_at: datetime) -> None:
+    # Caller commits, so the index row lands in the same transaction as the content.
+    rows = [{"token_hmac": token_hmac(t), "target_type": target_type, "target_id": target_id, "created_at": created_at} for t in tokenize(text)]
+    if rows:
+        await db.execute(insert(SearchToken).values(rows).on_conflict_do_nothing())
+
+
+async def deindex(db: AsyncSession, target_type: str, target_ids: Iterable[UUID]) -> None:
+    ids = list(target_ids)
+    if ids:
+        await db.execute(delete(SearchToken).where(SearchToken.target_type == target_type, SearchToken.target_id.in_(ids)))
+
+
+async def search(db: AsyncSession, q: str, statuses: tuple[str, ...], limit: int, offset: int, active_authors_only: bool = True) -> list[dict]:
+    tokens = tokenize(q)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+    hashes = [token_hmac(t) for t in tokens]
+    # Intersect posting lists (items carrying every query token), keep those whose content is in `statuses` (and,
+    # like the feed, whose author is neither banned nor deleted), then page newest first: the filters apply before
+    # LIMIT/OFFSET, so pages are never short. Only this page is decrypted.
+    matches = (
+        select(SearchToken.target_type, SearchToken.target_id, SearchToken.created_at)
+        .where(SearchToken.token_hmac.in_(hashes))
+        .group_by(SearchToken.target_type, SearchToken.target_id, SearchToken.created_at)
+        .having(func.count() == len(hashes))
+        .subquery()
+    )
+    branches = []
+    for target_type, model in (("post", Post), ("reply", Reply)):
+        b = (
+            select(matches.c.target_type, matches.c.target_id, matches.c.created_at)
+            .join(model, and_(matches.c.target_type == target_type, model.id == matches.c.target_id))
+            .where(model.status.in_(statuses))
+        )
+        if active_authors_only:
+            b = b.join(User, User.id == model.author_id).where(User.deleted_at.is_(None), User.is_banned.is_(False))
+        branches.append(b)
+    hits = union_all(*branches).subquery()
+    page = (await db.execute(select(hits).order_by(hits.c.created_at.desc(), hits.c.target_id).limit(limit).offset(offset))).all()
+    post_ids = [r.target_id for r in page if r.target_type == "post"]
+    reply_ids = [r.target_id for r in page if r.target_type == "reply"]
+    found: dict[tuple[str, UUID], dict] = {}
+    if post_ids:
+        for p in (await db.execute(select(Post.id, Post.body_ciphertext, Post.body_nonce, Post.created_at, Post.status).where(Post.id.in_(post_ids)))).all():
+            found[("post", p.id)] = {"type": "post", "id": p.id, "post_id": p.id, "body": crypto.decrypt_text(p.body_ciphertext, p.body_nonce), "created_at": p.created_at, "status": p.status}
+    if reply_ids:
+        for r in (await db.execute(select(Reply.id, Reply.post_id, Reply.body_ciphertext, Reply.body_nonce, Reply.created_at, Reply.status).where(Reply.id.in_(reply_ids)))).all():
+            found[("reply", r.id)] = {"type": "reply", "id": r.id, "post_id": r.post_id, "body": crypto.decrypt_text(r.body_ciphertext, r.body_nonce), "created_at": r.created_at, "status": r.status}
+    return [found[(r.target_type, r.target_id)] for r in page if (r.target_type, r.target_id) in found]
+
+
+@job_handler("search_reindex")
+async def run_reindex(job: Job, ctx: JobContext) -> None:
+    # Backfill for content created before the index existed: keyset walk, one short transaction per chunk.
+    chunk = settings.export_chunk_size
+    for kind, model in (("post", Post), ("reply", Reply)):
+        if ctx.checkpoint.get(kind) == "done":
+            continue
+        last = ctx.checkpoint.get(kind)
+        while True:
+            async with AsyncSessionLocal() as db:
+                q = select(model.id, model.body_ciphertext, model.body_nonce, model.created_at).where(model.status != "removed").order_by(model.id).limit(chunk)
+                if last:
+                    q = q.where(model.id > UUID(last))
+                rows = (await db.execute(q)).all()
+                for r in rows:
+                    await index_content(db, kind, r.id, crypto.decrypt_text(r.body_ciphertext, r.body_nonce), r.created_at)
+                await db.commit()
+            if rows:
+                last = str(rows[-1].id)
+            ctx.progress[kind] = ctx.progress.get(kind, 0) + len(rows)
+            done = len(rows) < chunk
+            await ctx.save(checkpoint=dict(ctx.checkpoint, **{kind: "done" if done else last}))
+            if done:
+                break
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import orjson
+from redis.exceptions import RedisError
+
+from app.core.redis import get_async_redis
+from app.core.settings import settings
+
+# Single-flight read coalescing for hot, user-independent reads (feed page, thread replies).
+#
+# - Concurrent identical reads in a process share one in-flight computation (one query + one decrypt loop).
+# - Results are kept for a short TTL; after that, for a bounded stale window, the old value is served while
+#   exactly one background refresh runs, so expiry never causes a stampede.
+# - Optionally (SINGLEFLIGHT_REDIS_LEASE) the computation is also coordinated across workers: the worker that
+#   wins a short Redis lease computes and publishes the value, the others wait briefly for it.
+#
+# Computations must return JSON-serializable data and open their own DB session (they outlive any one request).
+
+Compute = Callable[[], Awaitable[Any]]
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float) -> None:
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class SingleFlight:
+    def __init__(self, max_entries: int = 2048) -> None:
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._max_entries = max_entries
+
+    def forget(self, key: str) -> None:
+        # Local invalidation after a write in this process; other workers converge within the TTL.
+        self._cache.pop(key, None)
+
+    async def get(self, key: str, compute: Compute, ttl_ms: int) -> Any:
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None:
+            if now < entry.fresh_until:
+                self._cache.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self._start(key, compute, ttl_ms)  # no-op if a refresh is already running
+                return entry.value
+        # shield: a disconnecting client must not cancel the computation other waiters share
+        return await asyncio.shield(self._start(key, compute, ttl_ms))
+
+    def _start(self, key: str, compute: Compute, ttl_ms: int) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, compute, ttl_ms))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; waiters already got it, background refreshes just retry next time
+
+    async def _run(self, key: str, compute: Compute, ttl_ms: int) -> Any:
+        value = await (self._compute_leased(key, compute, ttl_ms) if settings.singleflight_redis_lease else compute())
+        now = time.monotonic()
+        self._cache[key] = _Entry(value, now + ttl_ms / 1000.0, now + (ttl_ms + settings.singleflight_stale_ms) / 1000.0)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return value
+
+    async def _compute_leased(self, key: str, compute: Compute, ttl_ms: int) -> Any:
+        r = get_async_redis()
+        vkey, lkey = f"sf:val:{key}", f"sf:lease:{key}"
+        lease_ms = settings.singleflight_lease_ms
+        try:
+            cached = await r.get(vkey)
+            if cached is not None:
+                return orjson.loads(cached)
+            owner = await r.set(lkey, uuid.uuid4().hex, nx=True, px=lease_ms)
+        except RedisError:
+            return await compute()
+
+        if owner:
+            value = await compute()
+            try:
+                await r.set(vkey, orjson.dumps(value), px=ttl_ms)
+                await r.delete(lkey)
+            except RedisError:
+                pass
+            return value
+
+        # Another worker holds the lease: wait for its value, but never longer than the lease itself.
+        deadline = time.monotonic() + lease_ms / 1000.0
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                cached = await r.get(vkey)
+                if cached is not None:
+                    return orjson.loads(cached)
+        except RedisError:
+            pass
+        return await compute()
+
+
+coalescer = SingleFlight(max_entries=settings.singleflight_max_entries)
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from app.core.redis import get_async_redis
+from app.services.eventbus import Event, subscriber
+
+# Downstream consumer groups of the content lifecycle events (run with `python -m app.services.eventbus consume
+# <group>`). Handlers must be idempotent: events can be delivered more than once.
+
+EVENT_TYPES = ("post.created", "reply.created", "reply.voted", "content.flagged", "moderation.decided", "user.deleted", "user.erased")
+
+
+@subscriber("stats", *EVENT_TYPES)
+async def count_events(event: Event) -> None:
+    # Event counts per type for the admin overview (approximate: a redelivery counts twice).
+    await get_async_redis().hincrby("metrics:events", event.type, 1)
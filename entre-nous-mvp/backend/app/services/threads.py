@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Post, Reply
+
+# Denormalized thread summary on `posts` (visible replies only): reply_count, last_reply_at and the top
+# kindness reply. Every write runs in the caller's transaction, next to the change it reflects:
+# - a new reply is a single-row increment;
+# - a kindness vote can only promote the voted reply;
+# - anything that changes reply visibility (moderation, erasure) recomputes the affected posts from `replies`.
+
+
+async def on_reply_created(db: AsyncSession, post_id: UUID, created_at: datetime) -> None:
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(reply_count=Post.reply_count + 1, last_reply_at=func.greatest(func.coalesce(Post.last_reply_at, created_at), created_at))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def on_kindness_vote(db: AsyncSession, post_id: UUID, reply_id: UUID) -> None:
+    # Run after the vote increment; reads the new count in the same statement.
+    votes = select(Reply.kindness_votes).where(Reply.id == reply_id, Reply.status == "visible").scalar_subquery()
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id, votes.is_not(None), or_(Post.top_reply_id.is_(None), Post.top_reply_id == reply_id, Post.top_reply_votes < votes))
+        .values(top_reply_id=reply_id, top_reply_votes=votes)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def refresh_summaries(db: AsyncSession, post_ids: Iterable[UUID]) -> None:
+    ids = list(set(post_ids))
+    if not ids:
+        return
+    visible = (Reply.post_id == Post.id, Reply.status == "visible")
+    top = select(Reply.id, Reply.kindness_votes).where(*visible).order_by(Reply.kindness_votes.desc(), Reply.created_at.asc(), Reply.id.asc()).limit(1)
+    await db.execute(
+        update(Post)
+        .where(Post.id.in_(ids))
+        .values(
+            reply_count=select(func.count()).where(*visible).scalar_subquery(),
+            last_reply_at=select(func.max(Reply.created_at)).where(*visible).scalar_subquery(),
+            top_reply_id=top.with_only_columns(Reply.id).scalar_subquery(),
+            top_reply_votes=func.coalesce(top.with_only_columns(Reply.kindness_votes).scalar_subquery(), 0),
+        )
+        .execution_options(synchronize_session=False)
+    )
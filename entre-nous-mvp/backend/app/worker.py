@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from app.core.logging import configure_logging, log
+from app.services.jobs import run_worker
+from app.services import export, erasure, search, reencrypt, purge, importer, evasion  # noqa: F401  (registers job handlers)
+
+# Dedicated job worker: python -m app.worker [--kind export ...]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entre Nous background job worker")
+    parser.add_argument("--kind", action="append", help="only run these job kinds (repeatable)")
+    parser.add_argument("--poll", type=float, default=1.0, help="idle poll interval in seconds")
+    args = parser.parse_args()
+    configure_logging()
+    log.info("worker_start", kinds=args.kind)
+    asyncio.run(run_worker(kinds=args.kind, poll_seconds=args.poll))
+
+
+if __name__ == "__main__":
+    main()
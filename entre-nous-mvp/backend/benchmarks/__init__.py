@@ -0,0 +1,6 @@
+"""In-process load and benchmark suite (see README "Benchmarks").
+
+    python -m benchmarks seed --scale small --seed 42 --reset
+    python -m benchmarks run --scenario all --duration 20 --concurrency 16 --out bench-results.json
+    python -m benchmarks compare before.json after.json
+"""
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks import compression, importcost, projections, serving
+from benchmarks.datagen import SCALES, seed
+from benchmarks.report import compare, run_metadata
+from benchmarks.scenarios import SCENARIOS, load_fixture, run_scenario
+
+
+def use_redis_standin() -> str:
+    """Point the app's Redis clients at an in-process fakeredis server (needs the `bench` extra for Lua)."""
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("fakeredis is not installed: pip install -e '.[bench]' or pass --redis real")
+    import app.core.redis as redis_mod
+
+    server = fakeredis.FakeServer()
+    redis_mod._client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_mod._async_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    return "fakeredis"
+
+
+async def _run(args) -> dict:
+    from app.main import create_app
+
+    app = create_app()
+    fixture = await load_fixture()
+    if not fixture.users or not fixture.posts:
+        raise SystemExit("no seeded data: run `python -m benchmarks seed` first")
+    names = list(SCENARIOS) if args.scenario == ["all"] else args.scenario
+    results = {}
+    # the ASGI transport does not send lifespan events: run startup (warm-up) and shutdown explicitly
+    async with app.router.lifespan_context(app):
+        for name in names:
+            rec, seconds = await run_scenario(app, name, fixture, args.duration, args.concurrency, args.seed)
+            results[name] = rec.summary(seconds)
+            print(f"{name}: " + ", ".join(f"{label} {s['rps']} rps p50={s['p50_ms']}ms p99={s['p99_ms']}ms" for label, s in results[name].items()), file=sys.stderr)
+    return results
+
+
+def _write(text: str, path: str | None) -> None:
+    if path:
+        with open(path, "w") as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Entre Nous load & benchmark suite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("seed", help="load a seeded synthetic dataset (DATABASE_URL, migrated to head)")
+    s.add_argument("--scale", choices=sorted(SCALES), default="small")
+    s.add_argument("--seed", type=int, default=42)
+    s.add_argument("--reset", action="store_true", help="truncate all app tables first")
+
+    r = sub.add_parser("run", help="run scenarios in process and write p50/p99 JSON")
+    r.add_argument("--scenario", nargs="+", default=["all"], choices=["all", *SCENARIOS])
+    r.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    r.add_argument("--concurrency", type=int, default=16, help="virtual users per scenario")
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--redis", choices=["standin", "real"], default="standin", help="fakeredis in process, or REDIS_URL")
+    r.add_argument("--out", help="write the JSON result here (default: stdout)")
+
+    i = sub.add_parser("importtime", help="profile import / create_app() cost in a fresh interpreter")
+    i.add_argument("--top", type=int, default=15)
+
+    p = sub.add_parser("projections", help="entity loads vs column projections on the hot read queries (time + memory)")
+    p.add_argument("--iterations", type=int, default=200)
+
+    w = sub.add_parser("serve", help="throughput of python -m app.serve over TCP, per worker count (real Redis)")
+    w.add_argument("--workers", type=int, nargs="+", help="worker counts to compare (default: 1 and one per core)")
+    w.add_argument("--duration", type=float, default=20.0, help="seconds per worker count")
+    w.add_argument("--clients", type=int, default=4, help="load-generator processes")
+    w.add_argument("--concurrency", type=int, default=32, help="connections per load-generator process")
+    w.add_argument("--seed", type=int, default=42)
+    w.add_argument("--port", type=int, default=8100)
+    w.add_argument("--url", help="load an already running server instead of starting one")
+    w.add_argument("--out", help="write the JSON result here (default: stdout)")
+
+    z = sub.add_parser("compression", help="CPU cost vs bytes saved per response encoding and level")
+    z.add_argument("--source", choices=["synthetic", "db"], default="synthetic", help="synthetic pages, or the seeded database")
+    z.add_argument("--repeats", type=int, default=50)
+
+    c = sub.add_parser("compare", help="diff two result files")
+    c.add_argument("before")
+    c.add_argument("after")
+
+    args = parser.parse_args()
+    if args.cmd == "seed":
+        print(json.dumps(asyncio.run(seed(args.scale, args.seed, wipe=args.reset))))
+    elif args.cmd == "run":
+        redis = use_redis_standin() if args.redis == "standin" else "real"
+        scenarios = asyncio.run(_run(args))
+        result = {
+            "meta": run_metadata(duration_s=args.duration, concurrency=args.concurrency, seed=args.seed, redis=redis),
+            "scenarios": scenarios,
+        }
+        _write(json.dumps(result, indent=2), args.out)
+    elif args.cmd == "importtime":
+        print(json.dumps(importcost.run(args.top), indent=2))
+    elif args.cmd == "serve":
+        from app.core.process import available_cores
+
+        fixture = asyncio.run(load_fixture(sample=200))
+        tokens = [fixture.token(u) for u in fixture.users]
+        if args.url:
+            results = {"external": serving.load(args.url, tokens, args.duration, args.clients, args.concurrency, args.seed)}
+        else:
+            counts = args.workers or sorted({1, available_cores()})
+            results = serving.run(counts, tokens, args.duration, args.clients, args.concurrency, args.seed, args.port)
+        meta = run_metadata(duration_s=args.duration, clients=args.clients, concurrency=args.concurrency, seed=args.seed, cores=available_cores())
+        _write(json.dumps({"meta": meta, "workers": results}, indent=2), args.out)
+    elif args.cmd == "compression":
+        payloads = compression.synthetic() if args.source == "synthetic" else asyncio.run(compression.from_db())
+        print(json.dumps(compression.measure(payloads, args.repeats), indent=2))
+    elif args.cmd == "projections":
+        print(json.dumps(asyncio.run(projections.run(args.iterations)), indent=2))
+    else:
+        with open(args.before) as a, open(args.after) as b:
+            print("\n".join(compare(json.load(a), json.load(b))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import gzip
+import json
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+import zstandard
+
+from app.core.compression import brotli
+from benchmarks.datagen import SCALES, Generator
+
+# CPU cost vs bytes saved of response compression, per encoding and level, on JSON payloads shaped like the big
+# responses (feed page, 200-reply thread, 200-message DM page). `--source db` uses the real feed and the biggest
+# thread from the seeded database instead of synthetic pages; note the seeded text comes from a small vocabulary,
+# so it compresses better than real posts do.
+
+LEVELS = {"gzip": (1, 6, 9), "zstd": (1, 3, 10), "br": (1, 4, 8)}
+
+
+def _codec(name: str, level: int):
+    if name == "gzip":
+        return lambda b: gzip.compress(b, compresslevel=level, mtime=0)
+    if name == "zstd":
+        c = zstandard.ZstdCompressor(level=level)
+        return c.compress
+    return lambda b: brotli.compress(b, mode=brotli.MODE_TEXT, quality=level)
+
+
+def _dumps(content) -> bytes:
+    # what the JSON response renders
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def synthetic(seed: int = 42) -> dict[str, bytes]:
+    g = Generator(SCALES["small"], seed)
+
+    def ts():
+        return g.ts().isoformat()
+
+    feed = [
+        {
+            "post": {"id": str(uuid.uuid4()), "body": g.body(5, 60), "created_at": ts(), "flags_count": g.rng.randint(0, 3)},
+            "score": round(g.rng.random() * 10, 4),
+            "thread": {
+                "reply_count": g.rng.randint(0, 50),
+                "last_reply_at": ts(),
+                "top_reply": {"id": str(uuid.uuid4()), "body": g.body(3, 30), "kindness_votes": g.rng.randint(0, 40)},
+            },
+        }
+        for _ in range(100)
+    ]
+    post_id = str(uuid.uuid4())
+    replies = [
+        {"id": str(uuid.uuid4()), "post_id": post_id, "body": g.body(3, 40), "created_at": ts(), "flags_count": 0, "kindness_votes": g.rng.randint(0, 10)}
+        for _ in range(200)
+    ]
+    start = g.now - timedelta(days=1)
+    dms = [
+        {"id": str(uuid.uuid4()), "author_is_me": g.rng.random() < 0.5, "body": g.body(1, 25), "created_at": g.ts(start).isoformat()}
+        for _ in range(200)
+    ]
+    return {"feed": _dumps(feed), "replies_200": _dumps(replies), "dm_200": _dumps(dms)}
+
+
+async def from_db() -> dict[str, bytes]:
+    from sqlalchemy import func, select
+
+    from app.api.feed import _load_feed, _load_replies
+    from app.db.session import AsyncSessionLocal
+    from app.models import Reply
+
+    async with AsyncSessionLocal() as db:
+        post_id = (await db.execute(select(Reply.post_id).group_by(Reply.post_id).order_by(func.count().desc()).limit(1))).scalar()
+    out = {"feed": _dumps(await _load_feed())}
+    if post_id is not None:
+        out["replies"] = _dumps(await _load_replies(post_id))
+    return out
+
+
+def measure(payloads: dict[str, bytes], repeats: int = 50) -> dict:
+    out: dict[str, dict] = {}
+    for name, body in payloads.items():
+        rows = {}
+        for codec, levels in LEVELS.items():
+            if codec == "br" and brotli is None:
+                continue
+            for level in levels:
+                fn = _codec(codec, level)
+                packed = fn(body)
+                times = []
+                for _ in range(repeats):
+                    t0 = time.perf_counter()
+                    fn(body)
+                    times.append(time.perf_counter() - t0)
+                us = statistics.median(times) * 1e6
+                saved = len(body) - len(packed)
+                rows[f"{codec}-{level}"] = {
+                    "bytes": len(packed),
+                    "ratio": round(len(body) / len(packed), 2),
+                    "saved_bytes": saved,
+                    "cpu_us": round(us, 1),
+                    "mb_per_s": round(len(body) / us, 1),
+                    "us_per_kib_saved": round(us / (saved / 1024), 2) if saved > 0 else None,
+                }
+        out[name] = {"raw_bytes": len(body), "codecs": rows}
+    return out
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.settings import settings
+from app.db.ids import uuid7_floor
+from app.db.session import AsyncSessionLocal, engine
+from app.models import (
+    Conversation,
+    ConversationParticipant,
+    DMMessage,
+    IpBan,
+    ModerationFlag,
+    Post,
+    Reply,
+    SearchToken,
+    SessionEvent,
+    User,
+)
+from app.services.auth import hash_password
+from app.services.crypto import crypto
+from app.services.search import token_hmac, tokenize
+from app.services.threads import refresh_summaries
+
+# Seeded synthetic data: the same (scale, seed) always produces the same rows, so runs are comparable across
+# commits. Rows go in through multi-row INSERTs on one connection, BATCH rows per statement, with bodies
+# encrypted by the real ContentCrypto and ids/timestamps spread over the last DAYS days.
+
+BATCH = 1000
+DAYS = 30
+BENCH_PASSWORD = "bench-password-1"
+
+WORDS = (
+    "merci soutien journee difficile travail famille ami ecoute parler besoin courage fatigue stress sommeil "
+    "espoir calme respirer pause marcher lire musique conseil groupe partage confiance doute peur joie colere "
+    "temps semaine matin soir enfant parent ecole etude examen projet equipe collegue chef message reponse "
+    "help thanks today tired week friend listen talk hope better sleep work stress anxious proud small step"
+).split()
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    posts: int
+    replies_per_post: int
+    conversations: int
+    messages_per_conversation: int
+    flags: int
+    bans: int
+
+
+SCALES = {
+    "small": Scale(users=200, posts=1_000, replies_per_post=5, conversations=100, messages_per_conversation=20, flags=300, bans=50),
+    "medium": Scale(users=5_000, posts=50_000, replies_per_post=6, conversations=5_000, messages_per_conversation=30, flags=10_000, bans=1_000),
+    "large": Scale(users=50_000, posts=500_000, replies_per_post=8, conversations=50_000, messages_per_conversation=40, flags=100_000, bans=10_000),
+}
+
+TABLES = ["search_tokens", "moderation_queue", "moderation_flags", "ip_bans", "session_events", "dm_messages",
+          "conversation_participants", "conversations", "replies", "posts", "jobs", "users"]
+
+
+def bench_email(i: int) -> str:
+    return f"bench{i}@example.test"
+
+
+def bench_ip(i: int) -> str:
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+class Generator:
+    def __init__(self, scale: Scale, seed: int) -> None:
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def ts(self, after: datetime | None = None) -> datetime:
+        start = after or self.now - timedelta(days=DAYS)
+        span = max(1.0, (self.now - start).total_seconds())
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def id_at(self, ts: datetime) -> uuid.UUID:
+        # UUIDv7 for a past timestamp, so ids sort like the timestamps they were "created" at
+        return uuid.UUID(int=uuid7_floor(ts).int | (self.rng.getrandbits(12) << 64) | self.rng.getrandbits(62))
+
+    def body(self, lo: int, hi: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(lo, hi)))
+
+    def status(self) -> str:
+        r = self.rng.random()
+        return "visible" if r < 0.9 else ("hidden" if r < 0.95 else "removed")
+
+
+async def _insert(conn: AsyncConnection, model, rows: Iterator[dict], on_conflict_nothing: bool = False) -> int:
+    stmt = pg_insert(model).on_conflict_do_nothing() if on_conflict_nothing else insert(model)
+    n, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            await conn.execute(stmt, batch)
+            n, batch = n + len(batch), []
+    if batch:
+        await conn.execute(stmt, batch)
+        n += len(batch)
+    return n
+
+
+async def reset(conn: AsyncConnection) -> None:
+    if settings.env == "prod":
+        raise SystemExit("refusing to reset a prod database")
+    await conn.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+
+
+async def seed(scale_name: str, seed_value: int, wipe: bool = False) -> dict[str, int]:
+    scale = SCALES[scale_name]
+    g = Generator(scale, seed_value)
+    counts: dict[str, int] = {}
+    password_hash = hash_password(BENCH_PASSWORD)  # one argon2 hash shared by all users: logins still verify it
+
+    users: list[tuple[uuid.UUID, datetime]] = []
+    posts: list[tuple[uuid.UUID, datetime, str]] = []
+    replies: list[tuple[uuid.UUID, uuid.UUID]] = []
+
+    def user_rows():
+        for i in range(scale.users):
+            created = g.ts()
+            uid = g.id_at(created)
+            users.append((uid, created))
+            ct, nonce = crypto.encrypt_text(bench_email(i))
+            ip = bench_ip(i)
+            ip_ct, ip_nonce = crypto.encrypt_text(ip)
+            yield {
+                "id": uid, "password_hash": password_hash, "email_lookup_hmac": crypto.email_lookup(bench_email(i)),
+                "email_ciphertext": ct, "email_nonce": nonce, "last_ip_lookup_hmac": crypto.ip_lookup(ip),
+                "last_ip_ciphertext": ip_ct, "last_ip_nonce": ip_nonce, "trust_score": round(g.rng.random(), 2),
+                "is_banned": g.rng.random() < 0.01, "created_at": created,
+            }
+
+    def post_rows():
+        for _ in range(scale.posts):
+            author, joined = g.rng.choice(users)
+            created = g.ts(joined)
+            pid = g.id_at(created)
+            body = g.body(8, 80)
+            status = g.status()
+            posts.append((pid, created, body if status != "removed" else ""))
+            ct, nonce = crypto.encrypt_text(body)
+            yield {"id": pid, "author_id": author, "body_ciphertext": ct, "body_nonce": nonce, "created_at": created,
+                   "status": status, "toxicity_score": round(g.rng.random() * 0.7, 2), "flags_count": 0}
+
+    def reply_rows():
+        for pid, post_created, _ in posts:
+            for _ in range(g.rng.randint(0, 2 * scale.replies_per_post)):
+                created = g.ts(post_created)
+                rid = g.id_at(created)
+                replies.append((rid, pid))
+                ct, nonce = crypto.encrypt_text(g.body(3, 40))
+                yield {"id": rid, "post_id": pid, "author_id": g.rng.choice(users)[0], "body_ciphertext": ct,
+                       "body_nonce": nonce, "created_at": created, "status": g.status(), "toxicity_score": 0.1,
+                       "flags_count": 0, "kindness_votes": g.rng.choice((0, 0, 0, 1, 2, 5))}
+
+    def token_rows():
+        for pid, created, body in posts:
+            for t in tokenize(body):
+                yield {"token_hmac": token_hmac(t), "target_type": "post", "target_id": pid, "created_at": created}
+
+    async with engine.begin() as conn:
+        if wipe:
+            await reset(conn)
+        counts["users"] = await _insert(conn, User, user_rows())
+        counts["posts"] = await _insert(conn, Post, post_rows())
+        counts["replies"] = await _insert(conn, Reply, reply_rows())
+        counts["search_tokens"] = await _insert(conn, SearchToken, token_rows(), on_conflict_nothing=True)
+
+        conversations: list[tuple[uuid.UUID, datetime, uuid.UUID, uuid.UUID]] = []
+        for _ in range(scale.conversations):
+            (a, _), (b, _) = g.rng.sample(users, 2)
+            created = g.ts()
+            conversations.append((g.id_at(created), created, a, b))
+        counts["conversations"] = await _insert(conn, Conversation, ({"id": c, "created_at": t} for c, t, _, _ in conversations))
+        counts["conversation_participants"] = await _insert(conn, ConversationParticipant, (
+            {"id": g.id_at(t), "conversation_id": c, "user_id": u, "created_at": t} for c, t, a, b in conversations for u in (a, b)
+        ))
+
+        def dm_rows():
+            for c, started, a, b in conversations:
+                for _ in range(g.rng.randint(1, 2 * scale.messages_per_conversation)):
+                    created = g.ts(started)
+                    ct, nonce = crypto.encrypt_text(g.body(2, 30))
+                    yield {"id": g.id_at(created), "conversation_id": c, "author_id": g.rng.choice((a, b)), "body_ciphertext": ct,
+                           "body_nonce": nonce, "created_at": created, "status": "visible" if g.rng.random() < 0.98 else "removed"}
+
+        counts["dm_messages"] = await _insert(conn, DMMessage, dm_rows())
+
+        def flag_rows():
+            for _ in range(scale.flags):
+                if replies and g.rng.random() < 0.4:
+                    target_type, target = "reply", g.rng.choice(replies)[0]
+                else:
+                    target_type, target = "post", g.rng.choice(posts)[0]
+                created = g.ts()
+                yield {"id": g.id_at(created), "reporter_id": g.rng.choice(users)[0], "target_type": target_type,
+                       "target_id": target, "reason": g.rng.choice(("harassment", "spam", "self_harm", "other")),
+                       "details": None, "created_at": created}
+
+        counts["moderation_flags"] = await _insert(conn, ModerationFlag, flag_rows())
+
+        def ban_rows():
+            for i in range(scale.bans):
+                ip = f"172.{16 + (i >> 16) % 16}.{(i >> 8) & 255}.{i & 255}"
+                ct, nonce = crypto.encrypt_text(ip)
+                created = g.ts()
+                yield {"id": g.id_at(created), "ip_lookup_hmac": crypto.ip_lookup(ip), "ip_ciphertext": ct, "ip_nonce": nonce,
+                       "reason": "bench", "created_at": created}
+
+        counts["ip_bans"] = await _insert(conn, IpBan, ban_rows(), on_conflict_nothing=True)
+
+        def event_rows():
+            for i, (uid, joined) in enumerate(users):
+                ip = bench_ip(i)
+                key = crypto.ip_lookup(ip)
+                for _ in range(g.rng.randint(1, 5)):
+                    created = g.ts(joined)
+                    ct, nonce = crypto.encrypt_text(ip)
+                    yield {"id": g.id_at(created), "user_id": uid, "event_type": g.rng.choice(("login", "post", "reply", "dm")),
+                           "ip_lookup_hmac": key, "ip_ciphertext": ct, "ip_nonce": nonce, "created_at": created}
+
+        counts["session_events"] = await _insert(conn, SessionEvent, event_rows())
+
+    # thread summaries and flag counters, as the write paths would have maintained them
+    async with AsyncSessionLocal() as db:
+        for i in range(0, len(posts), BATCH):
+            await refresh_summaries(db, [p[0] for p in posts[i:i + BATCH]])
+        for model, kind in ((Post, "post"), (Reply, "reply")):
+            n = select(func.count()).where(ModerationFlag.target_type == kind, ModerationFlag.target_id == model.id)
+            await db.execute(update(model).values(flags_count=n.scalar_subquery()).execution_options(synchronize_session=False))
+        await db.commit()
+    await engine.dispose()
+    return counts
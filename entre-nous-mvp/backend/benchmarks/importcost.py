@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+import time
+
+# Import-time profile of the API process, via `python -X importtime` in a fresh interpreter. Reports the
+# cumulative cost of the slowest modules for two stages: `import app.main` (what every worker, the job worker and
+# CLI tools pay) and `create_app()` (routers, models, settings, crypto, engine).
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+STAGES = {
+    "import": "import app.main",
+    "create_app": "import app.main; app.main.create_app()",
+}
+
+
+def profile(code: str, top: int = 15) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1] if proc.stderr else f"exit {proc.returncode}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((int(m.group(2)), len(m.group(3)), m.group(4)))
+    toplevel = [(us, name) for us, depth, name in rows if depth <= 1]
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "imports_ms": round(sum(us for us, _ in toplevel) / 1000.0, 1),
+        "modules": len(rows),
+        "slowest": [{"module": name, "cumulative_ms": round(us / 1000.0, 1)} for us, name in sorted(toplevel, reverse=True)[:top]],
+    }
+
+
+def run(top: int = 15) -> dict:
+    return {stage: profile(code, top) for stage, code in STAGES.items()}
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Callable
+
+from sqlalchemy import and_, desc, func, select
+from sqlalchemy.orm import aliased
+
+from app.api.dm import messages_stmt
+from app.api.feed import REPLIES_PAGE_SIZE, feed_stmt, replies_stmt
+from app.db.session import AsyncSessionLocal
+from app.models import DMMessage, Post, Reply, User
+
+# Entity loads vs the column projections the read paths use, on the seeded dataset: the same rows fetched both
+# ways, timed per load (execute + materialize, decryption excluded since it is identical) and measured with
+# tracemalloc while one result set is held. The thread and conversation used are the biggest ones seeded.
+
+
+def _orm_feed():
+    top = aliased(Reply)
+    return (
+        select(Post, User.trust_score, top)
+        .join(User, User.id == Post.author_id)
+        .outerjoin(top, and_(top.id == Post.top_reply_id, top.status == "visible"))
+        .where(Post.status == "visible", User.deleted_at.is_(None), User.is_banned.is_(False))
+        .order_by(desc(Post.created_at))
+        .limit(100)
+    )
+
+
+# same filters and (created_at, id) order as replies_stmt / messages_stmt, so both sides use the same plan
+def _orm_replies(post_id):
+    return (
+        select(Reply)
+        .where(Reply.post_id == post_id, Reply.status == "visible")
+        .order_by(Reply.created_at.asc(), Reply.id.asc())
+        .limit(REPLIES_PAGE_SIZE)
+    )
+
+
+def _orm_messages(conversation_id):
+    return (
+        select(DMMessage)
+        .where(DMMessage.conversation_id == conversation_id, DMMessage.status == "visible")
+        .order_by(desc(DMMessage.created_at), desc(DMMessage.id))
+        .limit(200)
+    )
+
+
+async def _busiest(col) -> object | None:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(col).group_by(col).order_by(func.count().desc()).limit(1))).scalar()
+
+
+async def _measure(build: Callable, iterations: int) -> dict:
+    # fresh session per load, as in the handlers (no identity map reuse between loads)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(build())).all()  # warm the statement caches
+    n = len(rows)
+    del rows
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(build())).all()
+    per_load_ms = (time.perf_counter() - start) * 1000.0 / iterations
+    del rows
+
+    tracemalloc.start()
+    try:
+        async with AsyncSessionLocal() as db:
+            held = (await db.execute(build())).all()
+            current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del held
+    return {"rows": n, "ms_per_load": round(per_load_ms, 3), "loads_per_s": round(1000.0 / per_load_ms, 1) if per_load_ms else None, "held_kib": round(current / 1024, 1), "peak_kib": round(peak / 1024, 1)}
+
+
+async def run(iterations: int = 200) -> dict:
+    post_id = await _busiest(Reply.post_id)
+    conversation_id = await _busiest(DMMessage.conversation_id)
+    cases = {"feed": (_orm_feed, feed_stmt)}
+    if post_id is not None:
+        cases["replies"] = (lambda: _orm_replies(post_id), lambda: replies_stmt(post_id))
+    if conversation_id is not None:
+        cases["dm_messages"] = (lambda: _orm_messages(conversation_id), lambda: messages_stmt(conversation_id))
+
+    out: dict[str, dict] = {}
+    for name, (orm, projection) in cases.items():
+        a = await _measure(orm, iterations)
+        b = await _measure(projection, iterations)
+        out[name] = {
+            "orm": a,
+            "projection": b,
+            "speedup": round(a["ms_per_load"] / b["ms_per_load"], 2) if b["ms_per_load"] else None,
+            "memory_ratio": round(b["peak_kib"] / a["peak_kib"], 2) if a["peak_kib"] else None,
+        }
+    return out
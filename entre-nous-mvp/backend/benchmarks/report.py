@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import platform
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+
+def percentile(sorted_ms: list[float], p: float) -> float | None:
+    if not sorted_ms:
+        return None
+    k = min(len(sorted_ms) - 1, max(0, round(p / 100.0 * (len(sorted_ms) - 1))))
+    return round(sorted_ms[k], 3)
+
+
+class Recorder:
+    """Per-label latency samples and status codes for one scenario run."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def add(self, label: str, ms: float, status: int) -> None:
+        self.samples[label].append(ms)
+        self.statuses[label][status] += 1
+
+    def summary(self, seconds: float) -> dict:
+        out = {}
+        for label, ms in sorted(self.samples.items()):
+            ms = sorted(ms)
+            codes = self.statuses[label]
+            out[label] = {
+                "count": len(ms),
+                "rps": round(len(ms) / seconds, 1) if seconds else None,
+                "p50_ms": percentile(ms, 50),
+                "p99_ms": percentile(ms, 99),
+                "max_ms": round(ms[-1], 3) if ms else None,
+                "errors": sum(n for code, n in codes.items() if code >= 500),
+                "status": {str(k): v for k, v in sorted(codes.items())},
+            }
+        return out
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_metadata(**extra) -> dict:
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **extra,
+    }
+
+
+def compare(before: dict, after: dict) -> list[str]:
+    """Human-readable p50/p99/throughput deltas for every (scenario, label) present in both results."""
+    lines = [f"before={before['meta'].get('commit')} after={after['meta'].get('commit')}"]
+    for scenario, labels in after["scenarios"].items():
+        for label, b in labels.items():
+            a = before["scenarios"].get(scenario, {}).get(label)
+            if not a:
+                continue
+            parts = []
+            for key in ("rps", "p50_ms", "p99_ms"):
+                if a.get(key) and b.get(key) is not None:
+                    parts.append(f"{key} {a[key]} -> {b[key]} ({(b[key] - a[key]) / a[key] * 100:+.1f}%)")
+            lines.append(f"{scenario}/{label}: " + ", ".join(parts))
+    return lines
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.models import ConversationParticipant, Post, Reply, User
+from app.services.auth import create_access_token
+from benchmarks.datagen import BENCH_PASSWORD, bench_email, bench_ip
+from benchmarks.report import Recorder
+
+# Scripted scenarios, driven in process through httpx's ASGI transport (no sockets, no server): every request
+# still goes through the full middleware stack, dependencies, Postgres and Redis. Each virtual user gets its own
+# client address so IP-keyed paths (bans, auth rate limit) behave as they would with real traffic.
+
+
+@dataclass
+class Fixture:
+    """Ids sampled from the seeded database that scenarios pick from."""
+
+    users: list[uuid.UUID] = field(default_factory=list)
+    posts: list[uuid.UUID] = field(default_factory=list)
+    replies: list[uuid.UUID] = field(default_factory=list)
+    conversations: list[tuple[uuid.UUID, uuid.UUID]] = field(default_factory=list)  # (conversation, member)
+    tokens: dict[uuid.UUID, str] = field(default_factory=dict)
+
+    def token(self, uid: uuid.UUID) -> str:
+        t = self.tokens.get(uid)
+        if t is None:
+            t = self.tokens[uid] = create_access_token(str(uid))
+        return t
+
+
+async def load_fixture(sample: int = 5000) -> Fixture:
+    async with AsyncSessionLocal() as db:
+        f = Fixture()
+        f.users = list((await db.execute(select(User.id).where(User.is_banned.is_(False), User.deleted_at.is_(None)).limit(sample))).scalars())
+        f.posts = list((await db.execute(select(Post.id).where(Post.status == "visible").order_by(Post.id.desc()).limit(sample))).scalars())
+        f.replies = list((await db.execute(select(Reply.id).where(Reply.status == "visible").order_by(Reply.id.desc()).limit(sample))).scalars())
+        members = await db.execute(
+            select(ConversationParticipant.conversation_id, ConversationParticipant.user_id).join(User, User.id == ConversationParticipant.user_id)
+            .where(User.is_banned.is_(False), User.deleted_at.is_(None)).limit(sample)
+        )
+        f.conversations = [(c, u) for c, u in members.all()]
+    return f
+
+
+class VirtualUser:
+    def __init__(self, app, n: int, rec: Recorder, rng: random.Random) -> None:
+        transport = httpx.ASGITransport(app=app, client=(bench_ip(100_000 + n), 40000 + n % 20000))
+        self.http = httpx.AsyncClient(transport=transport, base_url="http://bench")
+        self.rec = rec
+        self.rng = rng
+        self.n = n
+
+    async def call(self, label: str, method: str, url: str, token: str | None = None, **kw) -> httpx.Response:
+        headers = kw.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        started = time.perf_counter()
+        res = await self.http.request(method, url, headers=headers, **kw)
+        self.rec.add(label, (time.perf_counter() - started) * 1000.0, res.status_code)
+        return res
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+Step = Callable[[VirtualUser, Fixture], Awaitable[None]]
+
+
+async def feed_polling(vu: VirtualUser, f: Fixture) -> None:
+    await vu.call("GET /feed", "GET", "/feed", f.token(vu.rng.choice(f.users)))
+
+
+async def thread_reads(vu: VirtualUser, f: Fixture) -> None:
+    await vu.call("GET /posts/{id}/replies", "GET", f"/posts/{vu.rng.choice(f.posts)}/replies", f.token(vu.rng.choice(f.users)))
+
+
+async def dm_chat(vu: VirtualUser, f: Fixture) -> None:
+    cid, uid = vu.rng.choice(f.conversations)
+    token = f.token(uid)
+    await vu.call("POST /dm/{id}/send", "POST", f"/dm/{cid}/send", token, json={"body": "ok merci, on en reparle demain"})
+    await vu.call("GET /dm/{id}/messages", "GET", f"/dm/{cid}/messages", token)
+
+
+async def flag_storm(vu: VirtualUser, f: Fixture) -> None:
+    # many reporters piling onto a handful of targets (brigading / a genuinely bad post)
+    targets = f.posts[:5] or f.posts
+    body = {"target_type": "post", "target_id": str(vu.rng.choice(targets)), "reason": "harassment"}
+    await vu.call("POST /moderation/flag", "POST", "/moderation/flag", f.token(vu.rng.choice(f.users)), json=body)
+
+
+async def login_burst(vu: VirtualUser, f: Fixture) -> None:
+    i = vu.rng.randrange(len(f.users))
+    await vu.call("POST /auth/login", "POST", "/auth/login", json={"email": bench_email(i), "password": BENCH_PASSWORD})
+
+
+SCENARIOS: dict[str, Step] = {
+    "feed_polling": feed_polling,
+    "thread_reads": thread_reads,
+    "dm_chat": dm_chat,
+    "flag_storm": flag_storm,
+    "login_burst": login_burst,
+}
+
+
+async def run_scenario(app, name: str, fixture: Fixture, duration: float, concurrency: int, seed: int) -> tuple[Recorder, float]:
+    step = SCENARIOS[name]
+    rec = Recorder()
+    deadline = time.perf_counter() + duration
+    users = [VirtualUser(app, n, rec, random.Random(seed * 1000 + n)) for n in range(concurrency)]
+
+    async def loop(vu: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            await step(vu, fixture)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(loop(vu) for vu in users))
+    finally:
+        for vu in users:
+            await vu.aclose()
+    return rec, time.perf_counter() - started
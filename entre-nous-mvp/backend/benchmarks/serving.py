@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from benchmarks.report import Recorder
+
+# Throughput of the real server (python -m app.serve) over TCP, for each worker count asked for: start the server,
+# wait for /ready, drive it from several load-generator processes (one event loop each, so the client is not the
+# bottleneck), then SIGTERM it. Unlike `run`, this needs a real Redis (REDIS_URL) since the workers are separate
+# processes. For numbers you can publish, run the load generator on another machine with `--url`.
+
+PATHS = ("/health", "/feed")
+
+
+def _drive(url: str, tokens: list[str], paths: tuple[str, ...], duration: float, concurrency: int, seed: int) -> tuple[dict, dict]:
+    # one load-generator process: `concurrency` keep-alive connections issuing requests back to back
+    rec = Recorder()
+    rng = random.Random(seed)
+
+    async def user(client: httpx.AsyncClient, deadline: float) -> None:
+        while time.monotonic() < deadline:
+            path = rng.choice(paths)
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"} if path != "/health" and tokens else {}
+            start = time.perf_counter()
+            try:
+                status = (await client.get(path, headers=headers)).status_code
+            except httpx.HTTPError:
+                status = 599
+            rec.add(path, (time.perf_counter() - start) * 1000.0, status)
+
+    async def main() -> None:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            deadline = time.monotonic() + duration
+            await asyncio.gather(*(user(client, deadline) for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return dict(rec.samples), dict(rec.statuses)
+
+
+def _wait_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"server at {url} not ready after {timeout:.0f}s")
+
+
+def load(url: str, tokens: list[str], duration: float, clients: int, concurrency: int, seed: int) -> dict:
+    rec = Recorder()
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(_drive, url, tokens, PATHS, duration, concurrency, seed + i) for i in range(clients)]
+        for fut in futures:
+            samples, statuses = fut.result()
+            for label, ms in samples.items():
+                rec.samples[label].extend(ms)
+            for label, codes in statuses.items():
+                rec.statuses[label].update(codes)
+    routes = rec.summary(duration)
+    return {"total_rps": round(sum(s["rps"] or 0 for s in routes.values()), 1), "routes": routes}
+
+
+def run(worker_counts: list[int], tokens: list[str], duration: float, clients: int, concurrency: int, seed: int, port: int) -> dict:
+    results: dict[str, dict] = {}
+    for n in worker_counts:
+        # recycling would restart workers mid-run and skew the comparison
+        env = {**os.environ, "SERVE_MAX_REQUESTS": "0"}
+        server = subprocess.Popen([sys.executable, "-m", "app.serve", "--workers", str(n), "--host", "127.0.0.1", "--port", str(port)], env=env)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            _wait_ready(url, timeout=60.0)
+            results[str(n)] = load(url, tokens, duration, clients, concurrency, seed)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        print(f"workers={n}: {results[str(n)]['total_rps']} rps", file=sys.stderr)
+    base = results.get(str(worker_counts[0]), {}).get("total_rps")
+    for r in results.values():
+        r["speedup"] = round(r["total_rps"] / base, 2) if base else None
+    return results